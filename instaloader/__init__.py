@@ -16,7 +16,9 @@ from .exceptions import *
 from .instaloader import Instaloader as Instaloader
 from .instaloadercontext import (InstaloaderContext as InstaloaderContext,
                                  RateController as RateController)
+from .adaptiveratecontroller import AdaptiveRateController as AdaptiveRateController
 from .lateststamps import LatestStamps as LatestStamps
+from .sqliteratecontroller import SQLiteRateController as SQLiteRateController
 from .nodeiterator import (NodeIterator as NodeIterator,
                            FrozenNodeIterator as FrozenNodeIterator,
                            resumable_iteration as resumable_iteration)
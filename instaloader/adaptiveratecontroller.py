@@ -0,0 +1,119 @@
+import time
+from typing import Any, Dict
+
+from . import metrics
+from .instaloadercontext import InstaloaderContext, RateController
+
+# label of the accumulated budget of all GraphQL queries in the budgets and metrics
+_GRAPHQL = 'graphql'
+
+# sliding windows of RateController.count_per_sliding_window and graphql_count_per_sliding_window
+_PER_TYPE_WINDOW = 660
+_GRAPHQL_WINDOW = 600
+
+
+class AdaptiveRateController(RateController):
+    """
+    :class:`RateController` that learns the rate limits from 429 responses instead of using fixed ones (AIMD).
+
+    Budgets start at the limits of :class:`RateController`, separately for each query type and for all GraphQL
+    queries together. While a budget is nearly used up within its sliding window, each query raises it by
+    ``increase / budget``, i.e. by `increase` per sliding window full of queries. A 429 response multiplies the budgets
+    of the affected query type (and, for GraphQL queries, the accumulated one) by `decrease`. Further 429 responses
+    within `decrease_holdoff` seconds do not cut the budgets again. Budgets stay within `min_factor` and `max_factor`
+    times the initial limits.
+
+    The learned budgets are part of :meth:`RateController.get_state`, so they are persisted along with the request
+    history. They are exported as the ``instaloader_rate_budget_requests`` metric, labeled with the account (the
+    context's username) and query type::
+
+       L = instaloader.Instaloader(rate_controller=lambda ctx: instaloader.AdaptiveRateController(ctx))
+
+    Keyword arguments are passed on to the next class in the MRO, so the controller can be combined with other
+    RateController subclasses.
+
+    .. versionadded:: 4.16
+    """
+
+    def __init__(self, context: InstaloaderContext, *args, increase: float = 1.0, decrease: float = 0.5,
+                 min_factor: float = 0.25, max_factor: float = 2.0, decrease_holdoff: float = 60.0, **kwargs):
+        super().__init__(context, *args, **kwargs)
+        self.increase = increase
+        self.decrease = decrease
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.decrease_holdoff = decrease_holdoff
+        self._budgets: Dict[str, float] = dict()
+        self._last_decrease: Dict[str, float] = dict()
+
+    def _initial_budget(self, key: str) -> int:
+        if key == _GRAPHQL:
+            return super().graphql_count_per_sliding_window()
+        return super().count_per_sliding_window(key)
+
+    def _budget(self, key: str) -> float:
+        if key not in self._budgets:
+            self._budgets[key] = float(self._initial_budget(key))
+        return self._budgets[key]
+
+    def _set_budget(self, key: str, budget: float) -> None:
+        initial = self._initial_budget(key)
+        self._budgets[key] = min(initial * self.max_factor, max(initial * self.min_factor, budget))
+        metrics.RATE_BUDGET.labels(self._context.username or '', key).set(self._budgets[key])
+
+    def budgets(self) -> Dict[str, float]:
+        """Return the current budgets by query type, ``'graphql'`` being the accumulated one."""
+        with self._lock:
+            return dict(self._budgets)
+
+    def count_per_sliding_window(self, query_type: str) -> int:
+        with self._lock:
+            return max(1, int(self._budget(query_type)))
+
+    def graphql_count_per_sliding_window(self) -> int:
+        with self._lock:
+            return max(1, int(self._budget(_GRAPHQL)))
+
+    def _record_query(self, query_type: str) -> None:
+        with self._lock:
+            super()._record_query(query_type)
+            current_time = time.monotonic()
+            keys = [(query_type, _PER_TYPE_WINDOW)]
+            if query_type not in ['iphone', 'other']:
+                keys.append((_GRAPHQL, _GRAPHQL_WINDOW))
+            for key, window in keys:
+                budget = self._budget(key)
+                count, _ = self._sliding_window(None if key == _GRAPHQL else key, current_time, window)
+                # only raise a budget that is actually being used up
+                if count >= 0.9 * budget:
+                    self._set_budget(key, budget + self.increase / budget)
+
+    def _decrease_budgets(self, query_type: str) -> None:
+        with self._lock:
+            current_time = time.monotonic()
+            keys = [query_type] if query_type in ['iphone', 'other'] else [query_type, _GRAPHQL]
+            for key in keys:
+                if current_time - self._last_decrease.get(key, float('-inf')) < self.decrease_holdoff:
+                    continue
+                self._last_decrease[key] = current_time
+                budget = self._budget(key)
+                self._set_budget(key, budget * self.decrease)
+                self._context.log("Lowering budget for {} queries from {:.0f} to {:.0f}."
+                                  .format(key, budget, self._budgets[key]))
+
+    def _after_429_waittime(self, query_type: str) -> float:
+        # common path of handle_429 and of AsyncRateController.handle_429
+        self._decrease_budgets(query_type)
+        return super()._after_429_waittime(query_type)
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._lock:
+            state = super().get_state()
+            state['budgets'] = dict(self._budgets)
+            return state
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        with self._lock:
+            super().set_state(state)
+            for key, budget in state.get('budgets', {}).items():
+                self._set_budget(key, budget)
@@ -5,6 +5,9 @@ Re-export selected helpers from the implementation module `api.py` so that
 importing `instaloader.api` as a module.
 """
 from .medialoader import (
+    MediaStream,
+    open_media,
+    open_media_async,
     make_loader,
     get_profile_json,
     get_post_json,
@@ -12,9 +15,13 @@ from .medialoader import (
     get_stories_for_user,
     get_story_media,
     get_profile_picture,
+    get_profile_picture_url,
 )
 
 __all__ = [
+    'MediaStream',
+    'open_media',
+    'open_media_async',
     'make_loader',
     'get_profile_json',
     'get_post_json',
@@ -22,4 +29,5 @@ __all__ = [
     'get_stories_for_user',
     'get_story_media',
     'get_profile_picture',
+    'get_profile_picture_url',
 ]
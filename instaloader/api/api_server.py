@@ -1,7 +1,11 @@
-from fastapi import FastAPI, HTTPException, Response, Depends
+from fastapi import FastAPI, HTTPException, Response, Depends, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from instaloader import TwoFactorAuthRequiredException, BadCredentialsException
+from typing import List
+import json
+from instaloader import (TwoFactorAuthRequiredException, BadCredentialsException,
+                         QueryReturnedBadRequestException, TooManyRequestsException)
+from instaloader import metrics as instaloader_metrics
 
 from instaloader.services.instagram_service import get_service_dep
 import os
@@ -10,6 +14,52 @@ from instaloader.instaloader import get_default_session_filename
 app = FastAPI()
 
 
+# request headers that are forwarded to the CDN for media endpoints; with the conditional ones, the CDN's
+# 304 Not Modified is passed on to the client
+_FORWARDED_MEDIA_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+
+
+def _media_request_headers(request: Request):
+    headers = {name: request.headers[name] for name in _FORWARDED_MEDIA_HEADERS if name in request.headers}
+    return headers or None
+
+
+def _ndjson_response(results) -> StreamingResponse:
+    """Stream an async iterator of dicts as newline-delimited JSON."""
+    async def _lines():
+        async for result in results:
+            yield json.dumps(result) + '\n'
+    return StreamingResponse(_lines(), media_type='application/x-ndjson')
+
+
+class _MediaResponse(StreamingResponse):
+    """Streams a MediaStream, and releases its upstream response however the transfer ends, also if the client
+    goes away before the body is started."""
+
+    def __init__(self, media, headers):
+        super().__init__(media.chunks, status_code=media.status_code, media_type=media.mime, headers=headers)
+        self.media = media
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.media.aclose()
+
+
+async def _media_response(media) -> StreamingResponse:
+    """Stream a MediaStream to the client chunk by chunk."""
+    try:
+        headers = dict(media.headers or {})
+        if media.content_length is not None:
+            headers['Content-Length'] = str(media.content_length)
+        return _MediaResponse(media, headers)
+    except BaseException:
+        # never handed to the server, so not released by the response
+        await media.aclose()
+        raise
+
+
 # A simple in-memory way to keep a logged-in Instaloader for reuse across requests.
 # In production you should persist the session securely and consider thread-safety.
 def get_shared_loader(app: FastAPI):
@@ -25,12 +75,19 @@ async def startup_load_saved_session():
         # underlying factory directly for startup actions.
         from instaloader.services.instagram_service import get_global_service
 
-        username = await get_global_service().load_saved_session_if_any()
-        if username:
-            print(f'Loaded saved session for {username} from config dir')
+        usernames = await get_global_service().load_saved_sessions()
+        if usernames:
+            print(f'Loaded saved sessions for {", ".join(usernames)} from config dir')
     except Exception:
         # don't fail startup on session loading
         pass
+    try:
+        from instaloader.services.instagram_service import get_global_service
+
+        # keep the rate limit budget across restarts (RATE_CONTROLLER_STATE_FILE)
+        get_global_service().start_rate_state_snapshots()
+    except Exception:
+        pass
     # Also run the supermarket worker once to seed DB (optional)
     try:
         # lazy import DB and worker to avoid hard dependency at import time
@@ -50,6 +107,16 @@ async def startup_load_saved_session():
         pass
 
 
+@app.on_event('shutdown')
+async def shutdown_close_service():
+    from instaloader.services.instagram_service import get_global_service
+
+    try:
+        await get_global_service().close()
+    except Exception:
+        pass
+
+
 class LoginBody(BaseModel):
     username: str
     password: str
@@ -102,7 +169,16 @@ async def logout(service=Depends(get_service_dep)):
 def login_status(service=Depends(get_service_dep)):
     if not service.is_logged_in():
         return {"logged_in": False}
-    return {"logged_in": True, "username": service.get_username()}
+    return {"logged_in": True, "username": service.get_username(), "accounts": service.get_accounts()}
+
+
+@app.get('/metrics')
+def metrics():
+    """Prometheus metrics of the requests made to Instagram (requires prometheus_client)."""
+    if not instaloader_metrics.available():
+        raise HTTPException(status_code=501, detail='prometheus_client is not installed')
+    data, content_type = instaloader_metrics.render()
+    return Response(content=data, media_type=content_type)
 
 
 @app.get('/profile/{username}')
@@ -115,30 +191,58 @@ async def profile(username: str, service=Depends(get_service_dep)):
 
 
 
+class ProfilesBody(BaseModel):
+    usernames: List[str]
+
+
+@app.post('/profiles')
+async def profiles(body: ProfilesBody, service=Depends(get_service_dep)):
+    """Fetch many profiles; one NDJSON line per unique username, in completion order."""
+    return _ndjson_response(service.iter_profiles(body.usernames))
+
+
+@app.get('/profile/{username}/picture')
+async def profile_picture(username: str, service=Depends(get_service_dep)):
+    try:
+        media = await service.get_profile_picture(username)
+        return await _media_response(media)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @app.get('/stories/{username}')
 async def stories(username: str, service=Depends(get_service_dep)):
     try:
-        items = await service.get_stories_for_user(username)
-        for it in items:
-            it.pop('get_bytes', None)
-        return items
+        return await service.get_stories_for_user(username)
     except RuntimeError as e:
         raise HTTPException(status_code=401, detail=str(e))
+    except TooManyRequestsException as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.delete('/stories/{username}/cache')
+async def invalidate_stories(username: str, service=Depends(get_service_dep)):
+    await service.invalidate_stories(username)
+    return {"status": "invalidated", "username": username}
+
+
 @app.get('/stories/{username}/media/{index}')
-async def story_media(username: str, index: int = 1, service=Depends(get_service_dep)):
+async def story_media(request: Request, username: str, index: int = 1, service=Depends(get_service_dep)):
     try:
-        content, mime = await service.get_story_media(username, index)
-        return Response(content, media_type=mime)
+        media = await service.get_story_media(username, index, _media_request_headers(request))
+        return await _media_response(media)
     except IndexError:
         raise HTTPException(status_code=404, detail='story index out of range')
+    except QueryReturnedBadRequestException as e:
+        raise HTTPException(status_code=416, detail=str(e))
     except RuntimeError as e:
         raise HTTPException(status_code=401, detail=str(e))
+    except TooManyRequestsException as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -154,13 +258,25 @@ async def post(shortcode: str, service=Depends(get_service_dep)):
         raise HTTPException(status_code=404, detail=str(e))
 
 
+class PostsBody(BaseModel):
+    shortcodes: List[str]
+
+
+@app.post('/posts')
+async def posts(body: PostsBody, service=Depends(get_service_dep)):
+    """Fetch many posts; one NDJSON line per unique shortcode, in completion order."""
+    return _ndjson_response(service.iter_posts(body.shortcodes))
+
+
 @app.get('/post/{shortcode}/media/{index}')
-async def post_media(shortcode: str, index: int = 1, service=Depends(get_service_dep)):
+async def post_media(request: Request, shortcode: str, index: int = 1, service=Depends(get_service_dep)):
     try:
-        content, mime = await service.get_post_media_bytes(shortcode, index)
-        return Response(content, media_type=mime)
+        media = await service.open_post_media(shortcode, index, _media_request_headers(request))
+        return await _media_response(media)
     except IndexError:
         raise HTTPException(status_code=404, detail='media index out of range')
+    except QueryReturnedBadRequestException as e:
+        raise HTTPException(status_code=416, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
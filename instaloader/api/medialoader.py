@@ -1,8 +1,94 @@
-from typing import Dict, List, Optional, Tuple
+import inspect
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Union
 
 from ..instaloader import Instaloader
+from ..instaloadercontext import InstaloaderContext, RateController
 from ..structures import Profile, Post, StoryItem, TitlePic
 
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+# upstream response headers that are passed on to the client
+PASSTHROUGH_RESPONSE_HEADERS = ('Content-Range', 'ETag', 'Last-Modified')
+
+
+class MediaStream(NamedTuple):
+    chunks: Union[Iterator[bytes], AsyncIterator[bytes]]
+    mime: str
+    content_length: Optional[int]
+    status_code: int = 200
+    # response headers passed on to the client; None for none
+    headers: Optional[Dict[str, str]] = None
+    # closes the upstream response, possibly returning an awaitable; safe to call more than once
+    release: Optional[Callable[[], Any]] = None
+
+    async def aclose(self) -> None:
+        """Close the chunk iterator and release the upstream response, whether the body was transferred
+        completely, partly or not at all."""
+        if hasattr(self.chunks, 'aclose'):
+            await self.chunks.aclose()
+        elif hasattr(self.chunks, 'close'):
+            self.chunks.close()
+        if self.release is not None:
+            result = self.release()
+            if inspect.isawaitable(result):
+                await result
+
+
+def open_media(loader: Instaloader, url: str, request_headers: Optional[Dict[str, str]] = None) -> MediaStream:
+    """Open a media URL and return an iterator over its body in chunks.
+
+    The upstream response is read lazily (``get_raw`` requests it with
+    ``stream=True``) and closed once the iterator is exhausted or closed, or
+    by :meth:`MediaStream.aclose` if the body is never read.
+    `request_headers` (e.g. ``Range``, ``If-Range``) are forwarded to the CDN,
+    so a range request only transfers the requested bytes. Conditional
+    requests (``If-None-Match``, ``If-Modified-Since``) may yield a body-less
+    ``304 Not Modified`` stream."""
+    resp = loader.context.get_raw(url, headers=request_headers)
+    content_length = None
+    if (resp.status_code != 304 and resp.headers.get('Content-Encoding', 'identity') == 'identity' and
+            'Content-Length' in resp.headers):
+        # only trustworthy if the body is not decoded on the fly
+        content_length = int(resp.headers['Content-Length'])
+    headers = {name: resp.headers[name] for name in PASSTHROUGH_RESPONSE_HEADERS if name in resp.headers}
+    headers['Accept-Ranges'] = 'bytes'
+
+    def _chunks():
+        try:
+            yield from resp.iter_content(MEDIA_CHUNK_SIZE)
+        finally:
+            resp.close()
+
+    return MediaStream(_chunks(), resp.headers.get('Content-Type', 'application/octet-stream'), content_length,
+                       resp.status_code, headers, resp.close)
+
+
+async def open_media_async(actx, url: str, request_headers: Optional[Dict[str, str]] = None) -> MediaStream:
+    """Like :func:`open_media`, but transfers the body over an
+    :class:`~instaloader.asyncinstaloadercontext.AsyncInstaloaderContext`,
+    so streaming it to a client does not occupy a worker thread."""
+    resp = await actx.get_raw(url, headers=request_headers)
+    content_length = None
+    if (resp.status_code != 304 and resp.headers.get('Content-Encoding', 'identity') == 'identity' and
+            'Content-Length' in resp.headers):
+        content_length = int(resp.headers['Content-Length'])
+    headers = {name: resp.headers[name] for name in PASSTHROUGH_RESPONSE_HEADERS if name in resp.headers}
+    headers['Accept-Ranges'] = 'bytes'
+
+    async def _chunks():
+        try:
+            async for chunk in resp.aiter_bytes(MEDIA_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await resp.aclose()
+
+    return MediaStream(_chunks(), resp.headers.get('Content-Type', 'application/octet-stream'), content_length,
+                       resp.status_code, headers, resp.aclose)
+
+
+def _make_opener(loader: Instaloader, url: str) -> Callable[..., MediaStream]:
+    return lambda request_headers=None: open_media(loader, url, request_headers)
+
 
 def get_stories_for_user(loader: Instaloader, username: str):
     profile = Profile.from_username(loader.context, username)
@@ -11,34 +97,30 @@ def get_stories_for_user(loader: Instaloader, username: str):
     for story in stories:
         for item in story.get_items():
             url = item.video_url if item.is_video else item.url
-
-            def make_getter(u: str):
-                def _get():
-                    resp = loader.context.get_raw(u)
-                    return resp.content, resp.headers.get('Content-Type', 'application/octet-stream')
-                return _get
-
             items.append({
                 'mediaid': item.mediaid,
                 'shortcode': item.shortcode,
                 'is_video': item.is_video,
                 'url': url,
                 'date': item.date_utc.isoformat(),
-                'get_bytes': make_getter(url),
+                'expiring': item.expiring_utc.isoformat(),
+                'open_stream': _make_opener(loader, url),
             })
     return items
 
 
-def get_story_media(loader: Instaloader, username: str, index: int = 1):
+def get_story_media(loader: Instaloader, username: str, index: int = 1,
+                    request_headers: Optional[Dict[str, str]] = None) -> MediaStream:
     items = get_stories_for_user(loader, username)
     if index < 1 or index > len(items):
         raise IndexError('story index out of range')
-    return items[index - 1]['get_bytes']()
+    return items[index - 1]['open_stream'](request_headers)
 
 
-def make_loader(sleep: bool = False, quiet: bool = True, sanitize_paths: bool = True) -> Instaloader:
+def make_loader(sleep: bool = False, quiet: bool = True, sanitize_paths: bool = True,
+                rate_controller: Optional[Callable[[InstaloaderContext], RateController]] = None) -> Instaloader:
     
-    return Instaloader(sleep=sleep, quiet=quiet, sanitize_paths=sanitize_paths)
+    return Instaloader(sleep=sleep, quiet=quiet, sanitize_paths=sanitize_paths, rate_controller=rate_controller)
 
 
 def get_profile_json(loader: Instaloader, username: str) -> Dict:
@@ -55,16 +137,14 @@ def get_post_json(loader: Instaloader, shortcode: str) -> Dict:
     return post._asdict()
 
 
-def get_profile_picture(loader: Instaloader, username: str) -> Tuple[bytes, str]:
-    
-    profile = Profile.from_username(loader.context, username)
-    url = profile.profile_pic_url
-    resp = loader.context.get_raw(url)
+def get_profile_picture_url(loader: Instaloader, username: str) -> str:
     
-    mime = resp.headers.get('Content-Type', 'application/octet-stream')
+    return Profile.from_username(loader.context, username).profile_pic_url
+
+
+def get_profile_picture(loader: Instaloader, username: str) -> MediaStream:
     
-    content = resp.content
-    return content, mime
+    return open_media(loader, get_profile_picture_url(loader, username))
 
 
 def get_post_media(loader: Instaloader, shortcode: str) -> List[Dict]:
@@ -81,17 +161,11 @@ def get_post_media(loader: Instaloader, shortcode: str) -> List[Dict]:
             is_video = node.is_video
             suggested_name = f"{shortcode}_{idx + 1}"
 
-            def make_getter(u: str):
-                def _get():
-                    resp = loader.context.get_raw(u)
-                    return resp.content, resp.headers.get('Content-Type', 'application/octet-stream')
-                return _get
-
             media_items.append({
                 'is_video': is_video,
                 'url': url,
                 'filename': suggested_name,
-                'get_bytes': make_getter(url),
+                'open_stream': _make_opener(loader, url),
             })
     else:
     
@@ -99,15 +173,11 @@ def get_post_media(loader: Instaloader, shortcode: str) -> List[Dict]:
         url = post.video_url if is_video else post.url
         suggested_name = f"{shortcode}_1"
 
-        def _get_single():
-            resp = loader.context.get_raw(url)
-            return resp.content, resp.headers.get('Content-Type', 'application/octet-stream')
-
         media_items.append({
             'is_video': is_video,
             'url': url,
             'filename': suggested_name,
-            'get_bytes': _get_single,
+            'open_stream': _make_opener(loader, url),
         })
 
     return media_items
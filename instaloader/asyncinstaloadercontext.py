@@ -0,0 +1,376 @@
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+from contextlib import suppress
+from typing import Any, Dict, Optional
+
+import httpx
+import requests.utils
+
+from . import jsonbackend, metrics
+from .exceptions import *
+from .instaloadercontext import InstaloaderContext, RateController, is_conditional_request
+
+
+class AsyncRateController:
+    """Awaitable wait paths on top of a :class:`RateController`.
+
+    Wait times are computed and requests are recorded by the wrapped controller, so synchronous and asynchronous
+    requests share one request history. The controller is called in a worker thread, as it takes a lock shared with
+    threads and may do I/O (:class:`SQLiteRateController`). Unless the controller overrides
+    :meth:`RateController.sleep`, the waiting itself is done with :func:`asyncio.sleep`, so a waiting request does not
+    block a thread. An overridden :meth:`RateController.handle_429` is called as is, in a worker thread. Tasks waiting
+    for a query of the same type proceed in FIFO order.
+
+    .. versionadded:: 4.16
+    """
+
+    def __init__(self, rate_controller: RateController):
+        self.rate_controller = rate_controller
+        self._turns: Dict[str, asyncio.Lock] = dict()
+
+    def _overrides(self, name: str) -> bool:
+        # whether the wrapped controller customizes the RateController method `name`
+        return getattr(type(self.rate_controller), name) is not getattr(RateController, name)
+
+    async def sleep(self, secs: float):
+        """Wait given number of seconds, by calling the wrapped controller's :meth:`RateController.sleep` if it is
+        overridden."""
+        if self._overrides('sleep'):
+            await asyncio.to_thread(self.rate_controller.sleep, secs)
+            return
+        metrics.RATE_CONTROLLER_SLEEP.observe(secs)
+        await asyncio.sleep(secs)
+
+    async def wait_before_query(self, query_type: str) -> None:
+        """Awaitable counterpart of :meth:`RateController.wait_before_query`."""
+        # pylint:disable=protected-access
+        # asyncio.Lock wakes its waiters in FIFO order
+        async with self._turns.setdefault(query_type, asyncio.Lock()):
+            # queries of other types may use up the accumulated GraphQL budget while sleeping, so the query is only
+            # recorded by a reservation that needs no wait
+            while (waittime := await asyncio.to_thread(self.rate_controller._reserve_query, query_type)) > 0:
+                await self.sleep(waittime)
+
+    async def handle_429(self, query_type: str) -> None:
+        """Awaitable counterpart of :meth:`RateController.handle_429`."""
+        # pylint:disable=protected-access
+        if self._overrides('handle_429'):
+            await asyncio.to_thread(self.rate_controller.handle_429, query_type)
+            return
+        waittime = await asyncio.to_thread(self.rate_controller._after_429_waittime, query_type)
+        if waittime > 0:
+            await self.sleep(waittime)
+
+
+class AsyncInstaloaderContext:
+    """Asyncio counterpart of the low-level request routines of :class:`InstaloaderContext`, based on
+    :class:`httpx.AsyncClient`.
+
+    It takes session cookies, headers and login state from the given :class:`InstaloaderContext` and shares its
+    :class:`RateController`, so it can be used alongside the synchronous context. Logging and error handling is
+    delegated to the synchronous context. Cookies set by responses are kept in this object only.
+
+    Requires the optional dependency ``httpx``.
+
+    :param context: The synchronous context to take state from.
+    :param max_connections: Maximum number of concurrent connections of the underlying connection pool.
+
+    .. versionadded:: 4.16
+    """
+
+    def __init__(self, context: InstaloaderContext, max_connections: int = 100):
+        # pylint:disable=protected-access
+        self.context = context
+        self._cookies: Dict[str, str] = requests.utils.dict_from_cookiejar(context._session.cookies)
+        self._headers = httpx.Headers(dict(context._session.headers))
+        self._rate_controller = AsyncRateController(context._rate_controller)
+        self._client = httpx.AsyncClient(timeout=context.request_timeout,
+                                         limits=httpx.Limits(max_connections=max_connections),
+                                         follow_redirects=False)
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def do_sleep(self):
+        """Sleep a short time if sleeping is enabled in the context. Called before each request to instagram.com."""
+        if self.context.sleep:
+            await asyncio.sleep(min(random.expovariate(0.6), 15.0))
+
+    @staticmethod
+    def _response_error(resp: httpx.Response) -> str:
+        extra_from_json: Optional[str] = None
+        with suppress(json.decoder.JSONDecodeError, UnicodeDecodeError):
+            resp_json = resp.json()
+            if "status" in resp_json:
+                extra_from_json = (
+                    f"\"{resp_json['status']}\" status, message \"{resp_json['message']}\""
+                    if "message" in resp_json
+                    else f"\"{resp_json['status']}\" status"
+                )
+        return (
+            f"{resp.status_code} {resp.reason_phrase}"
+            f"{f' - {extra_from_json}' if extra_from_json is not None else ''}"
+            f" when accessing {resp.url}"
+        )
+
+    async def _request(self, method: str, url: str, headers: httpx.Headers, cookies: Dict[str, str],
+                       **kwargs) -> httpx.Response:
+        request_headers = httpx.Headers(headers)
+        if cookies:
+            request_headers['Cookie'] = '; '.join('{}={}'.format(k, v) for k, v in cookies.items())
+        resp = await self._client.request(method, url, headers=request_headers, **kwargs)
+        if cookies is self._cookies:
+            self._cookies.update(dict(resp.cookies))
+        return resp
+
+    async def get_json(self, path: str, params: Dict[str, Any], host: str = 'www.instagram.com',
+                       headers: Optional[httpx.Headers] = None, cookies: Optional[Dict[str, str]] = None,
+                       _attempt=1, response_headers: Optional[Dict[str, Any]] = None,
+                       use_post: bool = False) -> Dict[str, Any]:
+        """Awaitable counterpart of :meth:`InstaloaderContext.get_json`.
+
+        :param headers: Request headers, or None to use the context's session headers
+        :param cookies: Cookies to send, or None to use the context's session cookies
+        """
+        is_graphql_query = 'query_hash' in params and 'graphql/query' in path
+        is_doc_id_query = 'doc_id' in params and 'graphql/query' in path
+        is_iphone_query = host == 'i.instagram.com'
+        is_other_query = not is_graphql_query and not is_doc_id_query and host == "www.instagram.com"
+        query_type = (params['query_hash'] if is_graphql_query else params['doc_id'] if is_doc_id_query else
+                      'iphone' if is_iphone_query else 'other')
+        hdrs = headers if headers is not None else self._headers
+        cks = cookies if cookies is not None else self._cookies
+        start_time = time.monotonic()
+        try:
+            await self.do_sleep()
+            with metrics.timed(metrics.RATE_LIMIT_WAIT, query_type, 'query'):
+                if is_graphql_query:
+                    await self._rate_controller.wait_before_query(params['query_hash'])
+                if is_doc_id_query:
+                    await self._rate_controller.wait_before_query(params['doc_id'])
+                if is_iphone_query:
+                    await self._rate_controller.wait_before_query('iphone')
+                if is_other_query:
+                    await self._rate_controller.wait_before_query('other')
+            with metrics.timed(metrics.REQUEST_DURATION, query_type):
+                if use_post:
+                    resp = await self._request('POST', 'https://{0}/{1}'.format(host, path), hdrs, cks, data=params)
+                else:
+                    resp = await self._request('GET', 'https://{0}/{1}'.format(host, path), hdrs, cks,
+                                               params=params)
+            if resp.status_code in self.context.fatal_status_codes:
+                redirect = " redirect to {}".format(resp.headers['location']) if 'location' in resp.headers else ""
+                body = ""
+                if resp.headers.get('Content-Type', '').startswith('application/json'):
+                    body = ': ' + resp.text[:500] + ('…' if len(resp.text) > 501 else '')
+                raise AbortDownloadException("Query to https://{}/{} responded with \"{} {}\"{}{}".format(
+                    host, path, resp.status_code, resp.reason_phrase, redirect, body
+                ))
+            while resp.is_redirect:
+                redirect_url = resp.headers['location']
+                self.context.log('\nHTTP redirect from https://{0}/{1} to {2}'.format(host, path, redirect_url))
+                if (redirect_url.startswith('https://www.instagram.com/accounts/login') or
+                    redirect_url.startswith('https://i.instagram.com/accounts/login')):
+                    if not self.context.is_logged_in:
+                        raise LoginRequiredException("Redirected to login page. Use --login or --load-cookies.")
+                    raise AbortDownloadException("Redirected to login page. You've been logged out, please wait " +
+                                                 "some time, recreate the session and try again")
+                if redirect_url.startswith('https://{}/'.format(host)):
+                    with metrics.timed(metrics.REQUEST_DURATION, query_type):
+                        resp = await self._request('GET',
+                                                   redirect_url if redirect_url.endswith('/') else redirect_url + '/',
+                                                   hdrs, cks, params=params)
+                else:
+                    break
+            metrics.RESPONSE_BYTES.labels(query_type).inc(len(resp.content))
+            if response_headers is not None:
+                response_headers.clear()
+                response_headers.update(resp.headers)
+            if resp.status_code == 400:
+                with suppress(json.decoder.JSONDecodeError):
+                    if jsonbackend.loads(resp.content).get("message") in [
+                        "feedback_required",
+                        "checkpoint_required",
+                        "challenge_required",
+                    ]:
+                        # Raise AbortDownloadException in case of substantial Instagram
+                        # requirements to stop producing more requests
+                        raise AbortDownloadException(self._response_error(resp))
+                raise QueryReturnedBadRequestException(self._response_error(resp))
+            if resp.status_code == 404:
+                raise QueryReturnedNotFoundException(self._response_error(resp))
+            if resp.status_code == 429:
+                raise TooManyRequestsException(self._response_error(resp))
+            if resp.status_code != 200:
+                raise ConnectionException(self._response_error(resp))
+            else:
+                resp_json = jsonbackend.loads(resp.content)
+            if 'status' in resp_json and resp_json['status'] != "ok":
+                raise ConnectionException(self._response_error(resp))
+            metrics.QUERY_DURATION.labels(query_type).observe(time.monotonic() - start_time)
+            return resp_json
+        except (ConnectionException, json.decoder.JSONDecodeError, httpx.HTTPError) as err:
+            metrics.QUERY_DURATION.labels(query_type).observe(time.monotonic() - start_time)
+            if isinstance(err, TooManyRequestsException):
+                metrics.TOO_MANY_REQUESTS.labels(query_type).inc()
+            error_string = "JSON Query to {}: {}".format(path, err)
+            if _attempt == self.context.max_connection_attempts:
+                if isinstance(err, QueryReturnedNotFoundException):
+                    raise QueryReturnedNotFoundException(error_string) from err
+                else:
+                    raise ConnectionException(error_string) from err
+            self.context.error(error_string + " [retrying; skip with ^C]", repeat_at_end=False)
+            metrics.RETRIES.labels(query_type).inc()
+            if isinstance(err, TooManyRequestsException):
+                with metrics.timed(metrics.RATE_LIMIT_WAIT, query_type, '429'):
+                    if is_graphql_query:
+                        await self._rate_controller.handle_429(params['query_hash'])
+                    if is_doc_id_query:
+                        await self._rate_controller.handle_429(params['doc_id'])
+                    if is_iphone_query:
+                        await self._rate_controller.handle_429('iphone')
+                    if is_other_query:
+                        await self._rate_controller.handle_429('other')
+            return await self.get_json(path=path, params=params, host=host, headers=hdrs, cookies=cks,
+                                       _attempt=_attempt + 1, response_headers=response_headers,
+                                       use_post=use_post)
+
+    def _graphql_headers(self, referer: Optional[str]) -> httpx.Headers:
+        # pylint:disable=protected-access
+        headers = httpx.Headers(self._headers)
+        headers.update(self.context._default_http_header(empty_session_only=True))
+        headers.pop('Connection', None)
+        headers.pop('Content-Length', None)
+        headers['authority'] = 'www.instagram.com'
+        headers['scheme'] = 'https'
+        headers['accept'] = '*/*'
+        if referer is not None:
+            headers['referer'] = urllib.parse.quote(referer)
+        return headers
+
+    async def graphql_query(self, query_hash: str, variables: Dict[str, Any],
+                            referer: Optional[str] = None) -> Dict[str, Any]:
+        """Awaitable counterpart of :meth:`InstaloaderContext.graphql_query`."""
+        resp_json = await self.get_json('graphql/query',
+                                        params={'query_hash': query_hash,
+                                                'variables': json.dumps(variables, separators=(',', ':'))},
+                                        headers=self._graphql_headers(referer))
+        if 'status' not in resp_json:
+            self.context.error("GraphQL response did not contain a \"status\" field.")
+        return resp_json
+
+    async def doc_id_graphql_query(self, doc_id: str, variables: Dict[str, Any],
+                                   referer: Optional[str] = None) -> Dict[str, Any]:
+        """Awaitable counterpart of :meth:`InstaloaderContext.doc_id_graphql_query`."""
+        resp_json = await self.get_json('graphql/query',
+                                        params={'variables': json.dumps(variables, separators=(',', ':')),
+                                                'doc_id': doc_id,
+                                                'server_timestamps': 'true'},
+                                        headers=self._graphql_headers(referer),
+                                        use_post=True)
+        if 'status' not in resp_json:
+            self.context.error("GraphQL response did not contain a \"status\" field.")
+        return resp_json
+
+    async def get_iphone_json(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Awaitable counterpart of :meth:`InstaloaderContext.get_iphone_json`."""
+        headers = httpx.Headers(self._headers)
+        cookies = dict(self._cookies)
+        # Set headers to simulate an API request from iPad
+        headers['ig-intended-user-id'] = str(self.context.user_id)
+        headers['x-pigeon-rawclienttime'] = '{:.6f}'.format(time.time())
+
+        # Add headers obtained from previous iPad request
+        headers.update(self.context.iphone_headers)
+
+        # Map the cookie value to the matching HTTP request header
+        header_cookies_mapping = {'x-mid': 'mid',
+                                  'ig-u-ds-user-id': 'ds_user_id',
+                                  'x-ig-device-id': 'ig_did',
+                                  'x-ig-family-device-id': 'ig_did',
+                                  'family_device_id': 'ig_did'}
+        for key, value in header_cookies_mapping.items():
+            if value in self._cookies:
+                if key not in headers:
+                    headers[key] = self._cookies[value]
+                else:
+                    # Remove the cookie value if it's already specified as a header
+                    cookies.pop(value, None)
+
+        # Edge case for ig-u-rur header due to special string encoding in cookie
+        if 'rur' in self._cookies:
+            if 'ig-u-rur' not in headers:
+                headers['ig-u-rur'] = self._cookies['rur'].strip('\"').encode('utf-8').decode('unicode_escape')
+            else:
+                cookies.pop('rur', None)
+
+        # Remove headers specific to Desktop version
+        for header in ['Host', 'Origin', 'X-Instagram-AJAX', 'X-Requested-With', 'Referer']:
+            headers.pop(header, None)
+
+        # No need for cookies if we have a bearer token
+        if 'authorization' in headers:
+            cookies.clear()
+
+        response_headers: Dict[str, Any] = dict()
+        response = await self.get_json(path, params, 'i.instagram.com', headers=headers, cookies=cookies,
+                                       response_headers=response_headers)
+
+        # Extract the ig-set-* headers and use them in the next request
+        for key, value in response_headers.items():
+            if key.startswith('ig-set-'):
+                self.context.iphone_headers[key.replace('ig-set-', '')] = value
+            elif key.startswith('x-ig-set-'):
+                self.context.iphone_headers[key.replace('x-ig-set-', 'x-ig-')] = value
+
+        return response
+
+    async def get_raw(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """Awaitable counterpart of :meth:`InstaloaderContext.get_raw`.
+
+        The returned response is streamed; read it with :meth:`httpx.Response.aiter_bytes` and close it with
+        :meth:`httpx.Response.aclose`.
+
+        :raises QueryReturnedNotFoundException: When the server responds with a 404.
+        :raises QueryReturnedForbiddenException: When the server responds with a 403.
+        :raises QueryReturnedBadRequestException: When the server responds with a 416 to a range request.
+        :raises ConnectionException: When download failed.
+        """
+        # pylint:disable=protected-access
+        is_range_request = headers is not None and 'Range' in headers
+        request_headers = httpx.Headers(self.context._default_http_header(empty_session_only=True))
+        request_headers.pop('Content-Length', None)
+        if headers is not None:
+            request_headers.update(headers)
+        try:
+            with metrics.timed(metrics.REQUEST_DURATION, 'raw'):
+                resp = await self._client.send(self._client.build_request('GET', url, headers=request_headers),
+                                               stream=True, follow_redirects=True)
+        except httpx.HTTPError as err:
+            raise ConnectionException("GET {}: {}".format(url, err)) from err
+        if (resp.status_code == 200 or (is_range_request and resp.status_code == 206) or
+                (is_conditional_request(headers) and resp.status_code == 304)):
+            if 'Content-Length' in resp.headers:
+                metrics.RESPONSE_BYTES.labels('raw').inc(int(resp.headers['Content-Length']))
+            return resp
+        await resp.aread()
+        await resp.aclose()
+        if is_range_request and resp.status_code == 416:
+            raise QueryReturnedBadRequestException(self._response_error(resp))
+        if resp.status_code == 403:
+            # suspected invalid URL signature
+            raise QueryReturnedForbiddenException(self._response_error(resp))
+        if resp.status_code == 404:
+            # 404 not worth retrying.
+            raise QueryReturnedNotFoundException(self._response_error(resp))
+        raise ConnectionException(self._response_error(resp))
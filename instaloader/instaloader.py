@@ -2,29 +2,34 @@ import getpass
 import json
 import os
 import platform
+import queue
 import re
 import shutil
 import string
 import sys
 import tempfile
+import threading
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
 from contextlib import contextmanager, suppress
 from datetime import datetime, timezone
 from functools import wraps
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Callable, IO, Iterator, List, Optional, Set, Union, cast
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Set, Tuple, Union, cast
 from urllib.parse import urlparse
 
 import requests
 import urllib3  # type: ignore
 
+from . import jsonbackend
 from .exceptions import *
 from .instaloadercontext import InstaloaderContext, RateController
 from .lateststamps import LatestStamps
-from .nodeiterator import NodeIterator, resumable_iteration
+from .nodeiterator import FrozenNodeIterator, NodeIterator, resumable_iteration
 from .sectioniterator import SectionIterator
 from .structures import (Hashtag, Highlight, JsonExportable, Post, PostLocation, Profile, Story, StoryItem,
-                         load_structure_from_file, save_structure_to_file, PostSidecarNode, TitlePic)
+                         load_structure_from_file, save_structure_to_file, PostSidecarNode, TitlePic,
+                         JSON_COMPRESSIONS)
 
 
 def _get_config_dir() -> str:
@@ -189,6 +194,9 @@ class Instaloader:
     :param download_comments: :option:`--comments`
     :param save_metadata: not :option:`--no-metadata-json`
     :param compress_json: not :option:`--no-compress-json`
+    :param json_compression: Compression of metadata JSON and resume files if `compress_json` is set, ``'xz'`` (the
+       default), ``'gz'`` or ``'zst'``. gzip and zstd write small metadata files several times faster than LZMA at a
+       similar size; zstd needs the ``zstandard`` package. :func:`load_structure_from_file` reads all of them.
     :param post_metadata_txt_pattern:
        :option:`--post-metadata-txt`, default is ``{caption}``. Set to empty string to avoid creation of post metadata
        txt file.
@@ -202,6 +210,18 @@ class Instaloader:
     :param fatal_status_codes: :option:`--abort-on`
     :param iphone_support: not :option:`--no-iphone`
     :param sanitize_paths: :option:`--sanitize-paths`
+    :param cdn_pool_connections: Number of CDN hosts whose media download connections are kept alive
+    :param cdn_pool_maxsize: Number of keep-alive media download connections per CDN host
+    :param max_parallel_downloads: Number of media files of a post that :meth:`download_post` transfers in parallel;
+       1 (the default) downloads them one after another
+    :param pipeline_workers: Number of threads downloading posts in :meth:`posts_download_loop` while another
+       thread fetches the next posts; 0 (the default) disables this pipelining
+    :param prefetch_pages: Number of pages a :class:`NodeIterator` requests ahead in the background, see its `prefetch`
+       parameter; 0 (the default) disables read-ahead
+
+    .. versionchanged:: 4.16
+       Added `json_compression`, `cdn_pool_connections`, `cdn_pool_maxsize`, `max_parallel_downloads`,
+       `pipeline_workers` and `prefetch_pages` parameters.
 
     .. attribute:: context
 
@@ -221,6 +241,7 @@ class Instaloader:
                  download_comments: bool = False,
                  save_metadata: bool = True,
                  compress_json: bool = True,
+                 json_compression: str = 'xz',
                  post_metadata_txt_pattern: Optional[str] = None,
                  storyitem_metadata_txt_pattern: Optional[str] = None,
                  max_connection_attempts: int = 3,
@@ -232,11 +253,17 @@ class Instaloader:
                  fatal_status_codes: Optional[List[int]] = None,
                  iphone_support: bool = True,
                  title_pattern: Optional[str] = None,
-                 sanitize_paths: bool = False):
+                 sanitize_paths: bool = False,
+                 cdn_pool_connections: int = 10,
+                 cdn_pool_maxsize: int = 10,
+                 max_parallel_downloads: int = 1,
+                 pipeline_workers: int = 0,
+                 prefetch_pages: int = 0):
 
         self.context = InstaloaderContext(sleep, quiet, user_agent, max_connection_attempts,
                                           request_timeout, rate_controller, fatal_status_codes,
-                                          iphone_support)
+                                          iphone_support, cdn_pool_connections, cdn_pool_maxsize,
+                                          prefetch_pages)
 
         # configuration parameters
         self.dirname_pattern = dirname_pattern or "{target}"
@@ -257,12 +284,24 @@ class Instaloader:
         self.download_comments = download_comments
         self.save_metadata = save_metadata
         self.compress_json = compress_json
+        if json_compression not in JSON_COMPRESSIONS:
+            raise InvalidArgumentException("json_compression must be one of {} ('zst' requires the zstandard "
+                                           "package).".format(', '.join(JSON_COMPRESSIONS)))
+        self.json_compression = json_compression
         self.post_metadata_txt_pattern = '{caption}' if post_metadata_txt_pattern is None \
             else post_metadata_txt_pattern
         self.storyitem_metadata_txt_pattern = '' if storyitem_metadata_txt_pattern is None \
             else storyitem_metadata_txt_pattern
         self.resume_prefix = resume_prefix
         self.check_resume_bbd = check_resume_bbd
+        self.max_parallel_downloads = max_parallel_downloads
+        self.pipeline_workers = pipeline_workers
+        # set to let the profiles of a parallel download_profiles() stop before their next download
+        self._stop_downloads = threading.Event()
+        self._download_executor: Optional[ThreadPoolExecutor] = None
+        if max_parallel_downloads > 1:
+            self._download_executor = ThreadPoolExecutor(max_workers=max_parallel_downloads,
+                                                         thread_name_prefix='instaloader-download')
 
         self.slide = slide or ""
         self.slide_start = 0
@@ -305,6 +344,7 @@ class Instaloader:
             download_comments=self.download_comments,
             save_metadata=self.save_metadata,
             compress_json=self.compress_json,
+            json_compression=self.json_compression,
             post_metadata_txt_pattern=self.post_metadata_txt_pattern,
             storyitem_metadata_txt_pattern=self.storyitem_metadata_txt_pattern,
             max_connection_attempts=self.context.max_connection_attempts,
@@ -314,7 +354,12 @@ class Instaloader:
             slide=self.slide,
             fatal_status_codes=self.context.fatal_status_codes,
             iphone_support=self.context.iphone_support,
-            sanitize_paths=self.sanitize_paths)
+            sanitize_paths=self.sanitize_paths,
+            cdn_pool_connections=self.context.cdn_pool_connections,
+            cdn_pool_maxsize=self.context.cdn_pool_maxsize,
+            max_parallel_downloads=self.max_parallel_downloads,
+            pipeline_workers=self.pipeline_workers,
+            prefetch_pages=self.context.prefetch_pages)
         yield new_loader
         self.context.error_log.extend(new_loader.context.error_log)
         new_loader.context.error_log = []  # avoid double-printing of errors
@@ -322,6 +367,8 @@ class Instaloader:
 
     def close(self):
         """Close associated session objects and repeat error log."""
+        if self._download_executor is not None:
+            self._download_executor.shutdown(wait=True)
         self.context.close()
 
     def __enter__(self):
@@ -334,7 +381,11 @@ class Instaloader:
     def download_pic(self, filename: str, url: str, mtime: datetime,
                      filename_suffix: Optional[str] = None, _attempt: int = 1) -> bool:
         """Downloads and saves picture with given url under given directory with given timestamp.
-        Returns true, if file was actually downloaded, i.e. updated."""
+        Returns true, if file was actually downloaded, i.e. updated.
+
+        :raises AbortDownloadException: If another profile of a parallel :meth:`download_profiles` has failed or
+           been interrupted."""
+        self._raise_if_downloads_stopped(filename)
         if filename_suffix is not None:
             filename += '_' + filename_suffix
         urlmatch = re.search('\\.[a-z0-9]*\\?', url)
@@ -352,6 +403,7 @@ class Instaloader:
             filename = nominal_filename
         if filename != nominal_filename and os.path.isfile(filename):
             self.context.log(filename + ' exists', end=' ', flush=True)
+            resp.close()
             return False
         self.context.write_raw(resp, filename)
         os.utime(filename, (datetime.now().timestamp(), mtime.timestamp()))
@@ -360,7 +412,7 @@ class Instaloader:
     def save_metadata_json(self, filename: str, structure: JsonExportable) -> None:
         """Saves metadata JSON file of a structure."""
         if self.compress_json:
-            filename += '.json.xz'
+            filename += '.json.' + self.json_compression
         else:
             filename += '.json'
         os.makedirs(os.path.dirname(filename), exist_ok=True)
@@ -411,14 +463,14 @@ class Instaloader:
             unique_comments = get_unique_comments(extended_comments, combine_answers=True)
             answer_ids = set(int(answer['id']) for comment in unique_comments for answer in comment.get('answers', []))
             with open(filename, 'w') as file:
-                file.write(json.dumps(list(filter(lambda t: int(t['id']) not in answer_ids, unique_comments)),
-                                      indent=4))
+                file.write(jsonbackend.dumps(list(filter(lambda t: int(t['id']) not in answer_ids, unique_comments)),
+                                             indent=4))
 
         base_filename = filename
         filename += '_comments.json'
         try:
-            with open(filename) as fp:
-                comments = json.load(fp)
+            with open(filename, 'rb') as fp:
+                comments = jsonbackend.loads(fp.read())
         except (FileNotFoundError, json.decoder.JSONDecodeError):
             comments = list()
 
@@ -429,7 +481,8 @@ class Instaloader:
                     iterator=comments_iterator,
                     load=load_structure_from_file,
                     save=save_structure_to_file,
-                    format_path=lambda magic: "{}_{}_{}.json.xz".format(base_filename, self.resume_prefix, magic),
+                    format_path=lambda magic: "{}_{}_{}.json.{}".format(base_filename, self.resume_prefix, magic,
+                                                                        self.json_compression),
                     check_bbd=self.check_resume_bbd,
                     enabled=self.resume_prefix is not None
             ) as (_is_resuming, start_index):
@@ -543,6 +596,7 @@ class Instaloader:
                                          (content_length is not None and
                                           os.path.getsize(filename) >= int(content_length))):
             self.context.log(filename + ' already exists')
+            http_response.close()
             return
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         self.context.write_raw(pic_bytes if pic_bytes else http_response, filename)
@@ -692,8 +746,26 @@ class Instaloader:
         :param post: Post to download.
         :param target: Target name, i.e. profile name, #hashtag, :feed; for filename.
         :return: True if something was downloaded, False otherwise, i.e. file was already there
+
+        .. versionchanged:: 4.16
+           With `max_parallel_downloads` > 1, pictures and videos are transferred in parallel, while caption,
+           geotags, comments and metadata are written. The method returns once all transfers are complete.
         """
 
+        # results of download_pic; Futures if transferred in parallel
+        transfers: List[Union[bool, Future]] = []
+
+        def _download(func: Callable[..., bool], **kwargs) -> None:
+            if self._download_executor is None:
+                transfers.append(func(**kwargs))
+            else:
+                transfers.append(self._download_executor.submit(func, **kwargs))
+
+        def _download_video_thumbnail(**kwargs) -> bool:
+            with self.context.error_catcher("Video thumbnail of {}".format(post)):
+                return self.download_pic(**kwargs)
+            return True
+
         def _already_downloaded(path: str) -> bool:
             if not os.path.isfile(path):
                 return False
@@ -743,28 +815,31 @@ class Instaloader:
                             sidecar_filename = self.__prepare_filename(filename_template,
                                                                        lambda: sidecar_node.display_url)
                             # Download sidecar picture or video thumbnail (--no-pictures implies --no-video-thumbnails)
-                            downloaded &= self.download_pic(filename=sidecar_filename, url=sidecar_node.display_url,
-                                                            mtime=post.date_local, filename_suffix=suffix)
+                            _download(self.download_pic, filename=sidecar_filename, url=sidecar_node.display_url,
+                                      mtime=post.date_local, filename_suffix=suffix)
                         if video_url is not None and self.download_videos:
                             # pylint:disable=cell-var-from-loop
                             sidecar_filename = self.__prepare_filename(filename_template,
                                                                        lambda: video_url)
                             # Download sidecar video if desired
-                            downloaded &= self.download_pic(filename=sidecar_filename, url=video_url,
-                                                            mtime=post.date_local, filename_suffix=suffix)
+                            _download(self.download_pic, filename=sidecar_filename, url=video_url,
+                                      mtime=post.date_local, filename_suffix=suffix)
                 else:
                     downloaded = False
         elif post.typename == 'GraphImage':
             # Download picture
             if self.download_pictures:
-                downloaded = (not _already_downloaded(filename + ".jpg") and
-                              self.download_pic(filename=filename, url=post.url, mtime=post.date_local))
+                if _already_downloaded(filename + ".jpg"):
+                    downloaded = False
+                else:
+                    _download(self.download_pic, filename=filename, url=post.url, mtime=post.date_local)
         elif post.typename == 'GraphVideo':
             # Download video thumbnail (--no-pictures implies --no-video-thumbnails)
             if self.download_pictures and self.download_video_thumbnails:
-                with self.context.error_catcher("Video thumbnail of {}".format(post)):
-                    downloaded = (not _already_downloaded(filename + ".jpg") and
-                                  self.download_pic(filename=filename, url=post.url, mtime=post.date_local))
+                if _already_downloaded(filename + ".jpg"):
+                    downloaded = False
+                else:
+                    _download(_download_video_thumbnail, filename=filename, url=post.url, mtime=post.date_local)
         else:
             self.context.error("Warning: {0} has unknown typename: {1}".format(post, post.typename))
 
@@ -775,8 +850,10 @@ class Instaloader:
 
         # Download video if desired
         if post.is_video and self.download_videos:
-            downloaded &= (not _already_downloaded(filename + ".mp4") and
-                           self.download_pic(filename=filename, url=post.video_url, mtime=post.date_local))
+            if _already_downloaded(filename + ".mp4"):
+                downloaded = False
+            else:
+                _download(self.download_pic, filename=filename, url=post.video_url, mtime=post.date_local)
 
         # Download geotags if desired
         if self.download_geotags and post.location:
@@ -790,6 +867,11 @@ class Instaloader:
         if self.save_metadata:
             self.save_metadata_json(filename, post)
 
+        # Wait for all parallel transfers before reporting the first error, so no .temp file is left behind
+        wait([transfer for transfer in transfers if isinstance(transfer, Future)])
+        for transfer in transfers:
+            downloaded &= transfer.result() if isinstance(transfer, Future) else transfer
+
         self.context.log()
         return downloaded
 
@@ -888,7 +970,10 @@ class Instaloader:
         :param item: Story item, as in story['items'] for story in :meth:`get_stories`
         :param target: Replacement for {target} in dirname_pattern and filename_pattern
         :return: True if something was downloaded, False otherwise, i.e. file was already there
+        :raises AbortDownloadException: If another profile of a parallel :meth:`download_profiles` has failed or
+           been interrupted.
         """
+        self._raise_if_downloads_stopped(target)
 
         def _already_downloaded(path: str) -> bool:
             if not os.path.isfile(path):
@@ -1032,57 +1117,185 @@ class Instaloader:
             sanitized_target = _PostPathFormatter.sanitize_path(target, self.sanitize_paths)
         if takewhile is None:
             takewhile = lambda _: True
+        # iterator states to resume from, for posts that the pipeline has produced but not yet downloaded
+        pending: Dict[int, Optional[FrozenNodeIterator]] = {}
+
+        def _resume_state() -> FrozenNodeIterator:
+            # resume from the oldest post the pipeline has not downloaded yet
+            frozen = pending[min(pending)] if pending else None
+            return frozen if frozen is not None else cast(NodeIterator, posts).freeze()
+
         with resumable_iteration(
                 context=self.context,
                 iterator=posts,
                 load=load_structure_from_file,
                 save=save_structure_to_file,
                 format_path=lambda magic: self.format_filename_within_target_path(
-                    sanitized_target, owner_profile, self.resume_prefix or '', magic, 'json.xz'
+                    sanitized_target, owner_profile, self.resume_prefix or '', magic, 'json.' + self.json_compression
                 ),
                 check_bbd=self.check_resume_bbd,
-                enabled=self.resume_prefix is not None
+                enabled=self.resume_prefix is not None,
+                freeze=_resume_state if self.pipeline_workers > 0 else None
         ) as (is_resuming, start_index):
+
+            def _stops_fast_update(result: Optional[Tuple[bool, bool]], number: int) -> bool:
+                if not fast_update or result is None:
+                    return False
+                downloaded, post_changed = result
+                # disengage fast_update for first post when resuming
+                return (not downloaded and not post_changed and number > possibly_pinned and
+                        (not is_resuming or number > 0))
+
+            if self.pipeline_workers > 0:
+                self._posts_download_pipeline(posts, target, displayed_count, post_filter, max_count, takewhile,
+                                              possibly_pinned, start_index, _stops_fast_update, pending)
+                return
             for number, post in enumerate(posts, start=start_index + 1):
                 should_stop = not takewhile(post)
                 if should_stop and number <= possibly_pinned:
                     continue
                 if (max_count is not None and number > max_count) or should_stop:
                     break
-                if displayed_count is not None:
-                    self.context.log("[{0:{w}d}/{1:{w}d}] ".format(number, displayed_count,
-                                                                   w=len(str(displayed_count))),
-                                     end="", flush=True)
-                else:
-                    self.context.log("[{:3d}] ".format(number), end="", flush=True)
-                if post_filter is not None:
+                result = self._posts_download_loop_step(post, number, target, displayed_count, post_filter)
+                if _stops_fast_update(result, number):
+                    break
+
+    def _raise_if_downloads_stopped(self, target: Union[str, Path]) -> None:
+        # checked before each post, story item and picture, so that all downloads of the other profiles stop promptly
+        if self._stop_downloads.is_set():
+            raise AbortDownloadException("Download of {} stopped, since another profile download has been "
+                                         "interrupted.".format(target))
+
+    def _posts_download_loop_step(self, post: Post, number: int, target: Union[str, Path],
+                                  displayed_count: Optional[int],
+                                  post_filter: Optional[Callable[[Post], bool]]) -> Optional[Tuple[bool, bool]]:
+        """Filter and download one post of :meth:`posts_download_loop`.
+
+        Returns ``(downloaded, post_changed)``, or None if the post has been skipped or its download failed.
+
+        :raises AbortDownloadException: If another profile of a parallel :meth:`download_profiles` has failed or
+           been interrupted."""
+        self._raise_if_downloads_stopped(target)
+        if displayed_count is not None:
+            self.context.log("[{0:{w}d}/{1:{w}d}] ".format(number, displayed_count,
+                                                           w=len(str(displayed_count))),
+                             end="", flush=True)
+        else:
+            self.context.log("[{:3d}] ".format(number), end="", flush=True)
+        if post_filter is not None:
+            try:
+                if not post_filter(post):
+                    self.context.log("{} skipped".format(post))
+                    return None
+            except (InstaloaderException, KeyError, TypeError) as err:
+                self.context.error("{} skipped. Filter evaluation failed: {}".format(post, err))
+                return None
+        with self.context.error_catcher("Download {} of {}".format(post, target)):
+            # The PostChangedException gets raised if the Post's id/shortcode changed while obtaining
+            # additional metadata. This is most likely the case if a HTTP redirect takes place while
+            # resolving the shortcode URL.
+            # The `post_changed` variable keeps the fast-update functionality alive: A Post which is
+            # obained after a redirect has probably already been downloaded as a previous Post of the
+            # same Profile.
+            # Observed in issue #225: https://github.com/instaloader/instaloader/issues/225
+            post_changed = False
+            while True:
+                try:
+                    downloaded = self.download_post(post, target=target)
+                    break
+                except PostChangedException:
+                    post_changed = True
+                    continue
+            return downloaded, post_changed
+        return None
+
+    def _posts_download_pipeline(self, posts: Iterator[Post], target: Union[str, Path],
+                                 displayed_count: Optional[int], post_filter: Optional[Callable[[Post], bool]],
+                                 max_count: Optional[int], takewhile: Callable[[Post], bool], possibly_pinned: int,
+                                 start_index: int,
+                                 stops_fast_update: Callable[[Optional[Tuple[bool, bool]], int], bool],
+                                 pending: Dict[int, Optional[FrozenNodeIterator]]) -> None:
+        """Pipelined loop of :meth:`posts_download_loop`.
+
+        A producer thread walks `posts` into a bounded queue, so that fetching the next page overlaps with
+        downloading, while :attr:`pipeline_workers` consumer threads download the posts. For every produced post,
+        the iterator state to resume from is kept in `pending` until the post has been handled, so that an
+        interrupted iteration resumes from the oldest post that has not been downloaded."""
+        is_node_iterator = isinstance(posts, NodeIterator)
+        work: queue.Queue = queue.Queue(maxsize=max(NodeIterator.page_length(), 2 * self.pipeline_workers))
+        stop = threading.Event()
+        lock = threading.Lock()
+        errors: List[BaseException] = []
+        # numbers of the posts which caused fast_update to stop
+        stopped_at: List[int] = []
+
+        def _produce():
+            try:
+                for number, post in enumerate(posts, start=start_index + 1):
+                    if stop.is_set():
+                        break
+                    should_stop = not takewhile(post)
+                    if should_stop and number <= possibly_pinned:
+                        continue
+                    if (max_count is not None and number > max_count) or should_stop:
+                        break
+                    with lock:
+                        pending[number] = cast(NodeIterator, posts).freeze() if is_node_iterator else None
+                    work.put((number, post))
+            except BaseException as err:  # pylint:disable=broad-except
+                with lock:
+                    errors.append(err)
+                stop.set()
+            finally:
+                for _ in range(self.pipeline_workers):
+                    work.put(None)
+
+        def _consume():
+            while True:
+                item = work.get()
+                if item is None:
+                    return
+                number, post = item
+                with lock:
+                    if errors:
+                        # keep the post pending, it is to be resumed from
+                        continue
+                    skip = bool(stopped_at) and number > min(stopped_at)
+                if not skip:
                     try:
-                        if not post_filter(post):
-                            self.context.log("{} skipped".format(post))
-                            continue
-                    except (InstaloaderException, KeyError, TypeError) as err:
-                        self.context.error("{} skipped. Filter evaluation failed: {}".format(post, err))
+                        result = self._posts_download_loop_step(post, number, target, displayed_count, post_filter)
+                    except BaseException as err:  # pylint:disable=broad-except
+                        with lock:
+                            errors.append(err)
+                        stop.set()
                         continue
-                with self.context.error_catcher("Download {} of {}".format(post, target)):
-                    # The PostChangedException gets raised if the Post's id/shortcode changed while obtaining
-                    # additional metadata. This is most likely the case if a HTTP redirect takes place while
-                    # resolving the shortcode URL.
-                    # The `post_changed` variable keeps the fast-update functionality alive: A Post which is
-                    # obained after a redirect has probably already been downloaded as a previous Post of the
-                    # same Profile.
-                    # Observed in issue #225: https://github.com/instaloader/instaloader/issues/225
-                    post_changed = False
-                    while True:
-                        try:
-                            downloaded = self.download_post(post, target=target)
-                            break
-                        except PostChangedException:
-                            post_changed = True
-                            continue
-                    if fast_update and not downloaded and not post_changed and number > possibly_pinned:
-                        # disengage fast_update for first post when resuming
-                        if not is_resuming or number > 0:
-                            break
+                    if stops_fast_update(result, number):
+                        with lock:
+                            stopped_at.append(number)
+                        stop.set()
+                with lock:
+                    pending.pop(number, None)
+
+        threads = [threading.Thread(target=_produce, name='instaloader-pipeline-producer', daemon=True)]
+        threads.extend(threading.Thread(target=_consume, name='instaloader-pipeline-consumer', daemon=True)
+                       for _ in range(self.pipeline_workers))
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    # join with timeout to stay responsive to KeyboardInterrupt
+                    thread.join(0.5)
+        except BaseException as err:
+            # let the consumers skip the remaining posts, then propagate
+            with lock:
+                errors.append(err)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            raise
+        if errors:
+            raise errors[0]
 
     @_requires_login
     def get_feed_posts(self) -> Iterator[Post]:
@@ -1440,7 +1653,8 @@ class Instaloader:
                           raise_errors: bool = False,
                           latest_stamps: Optional[LatestStamps] = None,
                           max_count: Optional[int] = None,
-                          reels: bool = False):
+                          reels: bool = False,
+                          parallel_profiles: int = 1):
         """High-level method to download set of profiles.
 
         :param profiles: Set of profiles to download.
@@ -1459,6 +1673,10 @@ class Instaloader:
         :param latest_stamps: :option:`--latest-stamps`.
         :param max_count: Maximum count of posts to download.
         :param reels: :option:`--reels`.
+        :param parallel_profiles: Number of profiles downloaded concurrently. All of them share this instance's
+           :class:`RateController`, i.e. they wait for the same rate limit budget. If one of them raises, or on
+           :exc:`KeyboardInterrupt`, the others stop before their next post, story item or picture, and save their
+           resume information.
 
         .. versionadded:: 4.1
 
@@ -1473,6 +1691,10 @@ class Instaloader:
 
         .. versionchanged:: 4.14
            Add `reels` parameter.
+
+        .. versionchanged:: 4.16
+           Add `parallel_profiles` parameter. With `latest_stamps`, profiles are processed starting with the one
+           whose posts have been downloaded least recently.
         """
 
         @contextmanager
@@ -1482,9 +1704,15 @@ class Instaloader:
         # error_handler type is Callable[[Optional[str]], ContextManager[None]] (not supported with Python 3.5.0..3.5.3)
         error_handler = _error_raiser if raise_errors else self.context.error_catcher
 
-        for i, profile in enumerate(profiles, start=1):
-            self.context.log("[{0:{w}d}/{1:{w}d}] Downloading profile {2}".format(i, len(profiles), profile.username,
-                                                                                  w=len(str(len(profiles)))))
+        ordered_profiles = list(profiles)
+        if latest_stamps is not None:
+            # stalest first, so that an interrupted run catches up on those first the next time
+            ordered_profiles.sort(key=lambda p: latest_stamps.get_last_post_timestamp(p.username))
+        w = len(str(len(ordered_profiles)))
+
+        def _download_profile(i: int, profile: Profile) -> None:
+            self.context.log("[{0:{w}d}/{1:{w}d}] Downloading profile {2}".format(i, len(ordered_profiles),
+                                                                                  profile.username, w=w))
             with error_handler(profile.username):  # type: ignore # (ignore type for Python 3.5 support)
                 profile_name = profile.username
 
@@ -1548,6 +1776,33 @@ class Instaloader:
                     if latest_stamps is not None and posts_to_download.first_item is not None:
                         latest_stamps.set_last_post_timestamp(profile_name,
                                                               posts_to_download.first_item.date_local)
+            if parallel_profiles > 1:
+                self.context.log("[{0:{w}d}/{1:{w}d}] Finished profile {2}".format(i, len(ordered_profiles),
+                                                                                   profile.username, w=w))
+
+        if parallel_profiles > 1:
+            try:
+                with ThreadPoolExecutor(max_workers=parallel_profiles,
+                                        thread_name_prefix='instaloader-profile') as executor:
+                    futures = [executor.submit(_download_profile, i, profile)
+                               for i, profile in enumerate(ordered_profiles, start=1)]
+                    try:
+                        wait(futures, return_when=FIRST_EXCEPTION)
+                        for future in futures:
+                            if future.done():
+                                future.result()
+                    except BaseException:
+                        # do not start further profiles, and let the running ones stop before their next download,
+                        # which saves their resume information
+                        self._stop_downloads.set()
+                        for future in futures:
+                            future.cancel()
+                        raise
+            finally:
+                self._stop_downloads.clear()
+        else:
+            for i, profile in enumerate(ordered_profiles, start=1):
+                _download_profile(i, profile)
 
         if stories and profiles:
             with self.context.error_catcher("Download stories"):
@@ -1,3 +1,6 @@
+import bisect
+import http.client
+import http.cookiejar
 import json
 import os
 import pickle
@@ -5,17 +8,23 @@ import random
 import shutil
 import sys
 import textwrap
+import threading
 import time
 import urllib.parse
 import uuid
+from collections import deque
 from contextlib import contextmanager, suppress
 from datetime import datetime, timedelta
 from functools import partial
-from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+from typing import Any, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
 import requests
+import requests.adapters
+import requests.cookies
+import requests.structures
 import requests.utils
 
+from . import jsonbackend, metrics
 from .exceptions import *
 
 
@@ -30,6 +39,29 @@ def copy_session(session: requests.Session, request_timeout: Optional[float] = N
     return new
 
 
+def detached_session(request_timeout: Optional[float] = None) -> requests.Session:
+    """Returns a requests.Session without default headers that never stores cookies.
+
+    Headers and cookies are passed with each request instead, so one such session can serve requests derived from
+    different sessions while keeping its connection pool.
+
+    .. versionadded:: 4.16"""
+    session = requests.Session()
+    session.headers = requests.structures.CaseInsensitiveDict()  # type: ignore
+    # reject every cookie set by a response, like a copied session that is thrown away afterwards
+    session.cookies = requests.cookies.RequestsCookieJar(
+        policy=http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    # Need to silence mypy bug for this. See: https://github.com/python/mypy/issues/2427
+    session.request = partial(session.request, timeout=request_timeout)  # type: ignore
+    return session
+
+
+def is_conditional_request(headers: Optional[Dict[str, str]]) -> bool:
+    """Whether `headers` make a request conditional on the cached version of the client, i.e. whether a
+    ``304 Not Modified`` response is expected."""
+    return headers is not None and any(name in headers for name in ('If-None-Match', 'If-Modified-Since'))
+
+
 def default_user_agent() -> str:
     return ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
             '(KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36')
@@ -76,17 +108,37 @@ class InstaloaderContext:
 
     Further, it provides methods for logging in and general session handles, which are used by that routines in
     class :class:`Instaloader`.
+
+    Media downloads (:meth:`get_raw`, :meth:`head`) share one anonymous session, whose connection pool keeps
+    connections to the CDN alive across downloads. It may be used from multiple threads.
+
+    .. versionchanged:: 4.16
+       Added `cdn_pool_connections`, `cdn_pool_maxsize` and `prefetch_pages` parameters.
     """
 
     def __init__(self, sleep: bool = True, quiet: bool = False, user_agent: Optional[str] = None,
                  max_connection_attempts: int = 3, request_timeout: float = 300.0,
                  rate_controller: Optional[Callable[["InstaloaderContext"], "RateController"]] = None,
                  fatal_status_codes: Optional[List[int]] = None,
-                 iphone_support: bool = True):
+                 iphone_support: bool = True,
+                 cdn_pool_connections: int = 10,
+                 cdn_pool_maxsize: int = 10,
+                 prefetch_pages: int = 0):
 
         self.user_agent = user_agent if user_agent is not None else default_user_agent()
         self.request_timeout = request_timeout
         self._session = self.get_anonymous_session()
+        # long-lived sessions for GraphQL and iPhone API queries, whose headers and cookies are derived from
+        # self._session per request, so that connections are kept alive across queries
+        self._graphql_session = detached_session(request_timeout)
+        self._iphone_session = detached_session(request_timeout)
+        # pooled session for anonymous media downloads: connections to up to cdn_pool_connections hosts are cached,
+        # keeping up to cdn_pool_maxsize idle connections alive per host
+        self.cdn_pool_connections = cdn_pool_connections
+        self.cdn_pool_maxsize = cdn_pool_maxsize
+        self._cdn_session = self.get_cdn_session()
+        # default read-ahead of NodeIterators created with this context
+        self.prefetch_pages = prefetch_pages
         self.username = None
         self.user_id = None
         self.sleep = sleep
@@ -163,6 +215,9 @@ class InstaloaderContext:
             for err in self.error_log:
                 print(err, file=sys.stderr)
         self._session.close()
+        self._graphql_session.close()
+        self._iphone_session.close()
+        self._cdn_session.close()
 
     @contextmanager
     def error_catcher(self, extra_info: Optional[str] = None):
@@ -211,6 +266,21 @@ class InstaloaderContext:
         session.request = partial(session.request, timeout=self.request_timeout) # type: ignore
         return session
 
+    def get_cdn_session(self) -> requests.Session:
+        """Returns a new anonymous session for media downloads with a connection pool sized by
+        `cdn_pool_connections` and `cdn_pool_maxsize`.
+
+        It sends no cookies and does not store any, so it can be shared between threads.
+
+        .. versionadded:: 4.16"""
+        session = detached_session(self.request_timeout)
+        session.headers.update(self._default_http_header(empty_session_only=True))
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.cdn_pool_connections,
+                                                pool_maxsize=self.cdn_pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
     def save_session(self):
         """Not meant to be used directly, use :meth:`Instaloader.save_session`."""
         return requests.utils.dict_from_cookiejar(self._session.cookies)
@@ -261,8 +331,6 @@ class InstaloaderContext:
            Raises LoginException instead of ConnectionException when an error happens.
            Raises LoginException instead of InvalidArgumentException when the username does not exist.
         """
-        # pylint:disable=import-outside-toplevel
-        import http.client
         # pylint:disable=protected-access
         http.client._MAXHEADERS = 200
         session = requests.Session()
@@ -386,7 +454,8 @@ class InstaloaderContext:
     def get_json(self, path: str, params: Dict[str, Any], host: str = 'www.instagram.com',
                  session: Optional[requests.Session] = None, _attempt=1,
                  response_headers: Optional[Dict[str, Any]] = None,
-                 use_post: bool = False) -> Dict[str, Any]:
+                 use_post: bool = False, headers: Optional[Mapping[str, Any]] = None,
+                 cookies: Optional[Any] = None) -> Dict[str, Any]:
         """JSON request to Instagram.
 
         :param path: URL, relative to the given domain which defaults to www.instagram.com/
@@ -394,6 +463,8 @@ class InstaloaderContext:
         :param host: Domain part of the URL from where to download the requested JSON; defaults to www.instagram.com
         :param session: Session to use, or None to use self.session
         :param use_post: Use POST instead of GET to make the request
+        :param headers: Headers overlaid on the session's headers for this request; None values remove a header
+        :param cookies: Cookies sent in addition to the session's cookies
         :return: Decoded response dictionary
         :raises AbortDownloadException: When the server responds with
             'feedback_required'/'checkpoint_required'/'challenge_required'
@@ -404,26 +475,36 @@ class InstaloaderContext:
 
         .. versionchanged:: 4.13
            Added `use_post` parameter.
+
+        .. versionchanged:: 4.16
+           Added `headers` and `cookies` parameters.
         """
         is_graphql_query = 'query_hash' in params and 'graphql/query' in path
         is_doc_id_query = 'doc_id' in params and 'graphql/query' in path
         is_iphone_query = host == 'i.instagram.com'
         is_other_query = not is_graphql_query and not is_doc_id_query and host == "www.instagram.com"
+        query_type = (params['query_hash'] if is_graphql_query else params['doc_id'] if is_doc_id_query else
+                      'iphone' if is_iphone_query else 'other')
         sess = session if session else self._session
+        start_time = time.monotonic()
         try:
             self.do_sleep()
-            if is_graphql_query:
-                self._rate_controller.wait_before_query(params['query_hash'])
-            if is_doc_id_query:
-                self._rate_controller.wait_before_query(params['doc_id'])
-            if is_iphone_query:
-                self._rate_controller.wait_before_query('iphone')
-            if is_other_query:
-                self._rate_controller.wait_before_query('other')
-            if use_post:
-                resp = sess.post('https://{0}/{1}'.format(host, path), data=params, allow_redirects=False)
-            else:
-                resp = sess.get('https://{0}/{1}'.format(host, path), params=params, allow_redirects=False)
+            with metrics.timed(metrics.RATE_LIMIT_WAIT, query_type, 'query'):
+                if is_graphql_query:
+                    self._rate_controller.wait_before_query(params['query_hash'])
+                if is_doc_id_query:
+                    self._rate_controller.wait_before_query(params['doc_id'])
+                if is_iphone_query:
+                    self._rate_controller.wait_before_query('iphone')
+                if is_other_query:
+                    self._rate_controller.wait_before_query('other')
+            with metrics.timed(metrics.REQUEST_DURATION, query_type):
+                if use_post:
+                    resp = sess.post('https://{0}/{1}'.format(host, path), data=params, headers=headers,
+                                     cookies=cookies, allow_redirects=False)
+                else:
+                    resp = sess.get('https://{0}/{1}'.format(host, path), params=params, headers=headers,
+                                    cookies=cookies, allow_redirects=False)
             if resp.status_code in self.fatal_status_codes:
                 redirect = " redirect to {}".format(resp.headers['location']) if 'location' in resp.headers else ""
                 body = ""
@@ -442,16 +523,18 @@ class InstaloaderContext:
                     raise AbortDownloadException("Redirected to login page. You've been logged out, please wait " +
                                                  "some time, recreate the session and try again")
                 if redirect_url.startswith('https://{}/'.format(host)):
-                    resp = sess.get(redirect_url if redirect_url.endswith('/') else redirect_url + '/',
-                                    params=params, allow_redirects=False)
+                    with metrics.timed(metrics.REQUEST_DURATION, query_type):
+                        resp = sess.get(redirect_url if redirect_url.endswith('/') else redirect_url + '/',
+                                        params=params, headers=headers, cookies=cookies, allow_redirects=False)
                 else:
                     break
+            metrics.RESPONSE_BYTES.labels(query_type).inc(len(resp.content))
             if response_headers is not None:
                 response_headers.clear()
                 response_headers.update(resp.headers)
             if resp.status_code == 400:
                 with suppress(json.decoder.JSONDecodeError):
-                    if resp.json().get("message") in [
+                    if jsonbackend.loads(resp.content).get("message") in [
                         "feedback_required",
                         "checkpoint_required",
                         "challenge_required",
@@ -467,11 +550,15 @@ class InstaloaderContext:
             if resp.status_code != 200:
                 raise ConnectionException(self._response_error(resp))
             else:
-                resp_json = resp.json()
+                resp_json = jsonbackend.loads(resp.content)
             if 'status' in resp_json and resp_json['status'] != "ok":
                 raise ConnectionException(self._response_error(resp))
+            metrics.QUERY_DURATION.labels(query_type).observe(time.monotonic() - start_time)
             return resp_json
         except (ConnectionException, json.decoder.JSONDecodeError, requests.exceptions.RequestException) as err:
+            metrics.QUERY_DURATION.labels(query_type).observe(time.monotonic() - start_time)
+            if isinstance(err, TooManyRequestsException):
+                metrics.TOO_MANY_REQUESTS.labels(query_type).inc()
             error_string = "JSON Query to {}: {}".format(path, err)
             if _attempt == self.max_connection_attempts:
                 if isinstance(err, QueryReturnedNotFoundException):
@@ -479,22 +566,39 @@ class InstaloaderContext:
                 else:
                     raise ConnectionException(error_string) from err
             self.error(error_string + " [retrying; skip with ^C]", repeat_at_end=False)
+            metrics.RETRIES.labels(query_type).inc()
             try:
                 if isinstance(err, TooManyRequestsException):
-                    if is_graphql_query:
-                        self._rate_controller.handle_429(params['query_hash'])
-                    if is_doc_id_query:
-                        self._rate_controller.handle_429(params['doc_id'])
-                    if is_iphone_query:
-                        self._rate_controller.handle_429('iphone')
-                    if is_other_query:
-                        self._rate_controller.handle_429('other')
+                    with metrics.timed(metrics.RATE_LIMIT_WAIT, query_type, '429'):
+                        if is_graphql_query:
+                            self._rate_controller.handle_429(params['query_hash'])
+                        if is_doc_id_query:
+                            self._rate_controller.handle_429(params['doc_id'])
+                        if is_iphone_query:
+                            self._rate_controller.handle_429('iphone')
+                        if is_other_query:
+                            self._rate_controller.handle_429('other')
                 return self.get_json(path=path, params=params, host=host, session=sess, _attempt=_attempt + 1,
-                                     response_headers=response_headers)
+                                     response_headers=response_headers, use_post=use_post, headers=headers,
+                                     cookies=cookies)
             except KeyboardInterrupt:
                 self.error("[skipped by user]", repeat_at_end=False)
                 raise ConnectionException(error_string) from err
 
+    def _graphql_headers(self, referer: Optional[str]) -> requests.structures.CaseInsensitiveDict:
+        headers = requests.structures.CaseInsensitiveDict(
+            self._session.headers)  # type: requests.structures.CaseInsensitiveDict[Any]
+        headers.update(self._default_http_header(empty_session_only=True))
+        # None removes these headers also from the defaults of the session the query is sent with
+        headers['Connection'] = None
+        headers['Content-Length'] = None
+        headers['authority'] = 'www.instagram.com'
+        headers['scheme'] = 'https'
+        headers['accept'] = '*/*'
+        if referer is not None:
+            headers['referer'] = urllib.parse.quote(referer)
+        return headers
+
     def graphql_query(self, query_hash: str, variables: Dict[str, Any],
                       referer: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -508,22 +612,14 @@ class InstaloaderContext:
         .. versionchanged:: 4.13.1
            Removed the `rhx_gis` parameter.
         """
-        with copy_session(self._session, self.request_timeout) as tmpsession:
-            tmpsession.headers.update(self._default_http_header(empty_session_only=True))
-            del tmpsession.headers['Connection']
-            del tmpsession.headers['Content-Length']
-            tmpsession.headers['authority'] = 'www.instagram.com'
-            tmpsession.headers['scheme'] = 'https'
-            tmpsession.headers['accept'] = '*/*'
-            if referer is not None:
-                tmpsession.headers['referer'] = urllib.parse.quote(referer)
-
-            variables_json = json.dumps(variables, separators=(',', ':'))
-
-            resp_json = self.get_json('graphql/query',
-                                      params={'query_hash': query_hash,
-                                              'variables': variables_json},
-                                      session=tmpsession)
+        variables_json = json.dumps(variables, separators=(',', ':'))
+
+        resp_json = self.get_json('graphql/query',
+                                  params={'query_hash': query_hash,
+                                          'variables': variables_json},
+                                  session=self._graphql_session,
+                                  headers=self._graphql_headers(referer),
+                                  cookies=self._session.cookies)
         if 'status' not in resp_json:
             self.error("GraphQL response did not contain a \"status\" field.")
         return resp_json
@@ -540,24 +636,16 @@ class InstaloaderContext:
         :param referer: HTTP Referer, or None.
         :return: The server's response dictionary.
         """
-        with copy_session(self._session, self.request_timeout) as tmpsession:
-            tmpsession.headers.update(self._default_http_header(empty_session_only=True))
-            del tmpsession.headers['Connection']
-            del tmpsession.headers['Content-Length']
-            tmpsession.headers['authority'] = 'www.instagram.com'
-            tmpsession.headers['scheme'] = 'https'
-            tmpsession.headers['accept'] = '*/*'
-            if referer is not None:
-                tmpsession.headers['referer'] = urllib.parse.quote(referer)
-
-            variables_json = json.dumps(variables, separators=(',', ':'))
-
-            resp_json = self.get_json('graphql/query',
-                                      params={'variables': variables_json,
-                                              'doc_id': doc_id,
-                                              'server_timestamps': 'true'},
-                                      session=tmpsession,
-                                      use_post=True)
+        variables_json = json.dumps(variables, separators=(',', ':'))
+
+        resp_json = self.get_json('graphql/query',
+                                  params={'variables': variables_json,
+                                          'doc_id': doc_id,
+                                          'server_timestamps': 'true'},
+                                  session=self._graphql_session,
+                                  headers=self._graphql_headers(referer),
+                                  cookies=self._session.cookies,
+                                  use_post=True)
         if 'status' not in resp_json:
             self.error("GraphQL response did not contain a \"status\" field.")
         return resp_json
@@ -609,58 +697,61 @@ class InstaloaderContext:
         :raises ConnectionException: When query repeatedly failed.
 
         .. versionadded:: 4.2.1"""
-        with copy_session(self._session, self.request_timeout) as tempsession:
-            # Set headers to simulate an API request from iPad
-            tempsession.headers['ig-intended-user-id'] = str(self.user_id)
-            tempsession.headers['x-pigeon-rawclienttime'] = '{:.6f}'.format(time.time())
-
-            # Add headers obtained from previous iPad request
-            tempsession.headers.update(self.iphone_headers)
-
-            # Extract key information from cookies if we haven't got it already from a previous request
-            header_cookies_mapping = {'x-mid': 'mid',
-                                     'ig-u-ds-user-id': 'ds_user_id',
-                                     'x-ig-device-id': 'ig_did',
-                                     'x-ig-family-device-id': 'ig_did',
-                                     'family_device_id': 'ig_did'}
-
-            # Map the cookie value to the matching HTTP request header
-            cookies = tempsession.cookies.get_dict().copy()
-            for key, value in header_cookies_mapping.items():
-                if value in cookies:
-                    if key not in tempsession.headers:
-                        tempsession.headers[key] = cookies[value]
-                    else:
-                        # Remove the cookie value if it's already specified as a header
-                        tempsession.cookies.pop(value, None)
-
-            # Edge case for ig-u-rur header due to special string encoding in cookie
-            if 'rur' in cookies:
-                if 'ig-u-rur' not in tempsession.headers:
-                    tempsession.headers['ig-u-rur'] = cookies['rur'].strip('\"').encode('utf-8') \
-                                                                    .decode('unicode_escape')
+        headers = requests.structures.CaseInsensitiveDict(self._session.headers)
+        cookies = self._session.cookies.get_dict()
+
+        # Set headers to simulate an API request from iPad
+        headers['ig-intended-user-id'] = str(self.user_id)
+        headers['x-pigeon-rawclienttime'] = '{:.6f}'.format(time.time())
+
+        # Add headers obtained from previous iPad request
+        headers.update(self.iphone_headers)
+
+        # Extract key information from cookies if we haven't got it already from a previous request
+        header_cookies_mapping = {'x-mid': 'mid',
+                                 'ig-u-ds-user-id': 'ds_user_id',
+                                 'x-ig-device-id': 'ig_did',
+                                 'x-ig-family-device-id': 'ig_did',
+                                 'family_device_id': 'ig_did'}
+
+        # Map the cookie value to the matching HTTP request header
+        session_cookies = cookies.copy()
+        for key, value in header_cookies_mapping.items():
+            if value in session_cookies:
+                if key not in headers:
+                    headers[key] = session_cookies[value]
                 else:
-                    tempsession.cookies.pop('rur', None)
+                    # Remove the cookie value if it's already specified as a header
+                    cookies.pop(value, None)
+
+        # Edge case for ig-u-rur header due to special string encoding in cookie
+        if 'rur' in session_cookies:
+            if 'ig-u-rur' not in headers:
+                headers['ig-u-rur'] = session_cookies['rur'].strip('\"').encode('utf-8') \
+                                                             .decode('unicode_escape')
+            else:
+                cookies.pop('rur', None)
 
-            # Remove headers specific to Desktop version
-            for header in ['Host', 'Origin', 'X-Instagram-AJAX', 'X-Requested-With', 'Referer']:
-                tempsession.headers.pop(header, None)
+        # Remove headers specific to Desktop version
+        for header in ['Host', 'Origin', 'X-Instagram-AJAX', 'X-Requested-With', 'Referer']:
+            headers.pop(header, None)
 
-            # No need for cookies if we have a bearer token
-            if 'authorization' in tempsession.headers:
-                tempsession.cookies.clear()
+        # No need for cookies if we have a bearer token
+        if 'authorization' in headers:
+            cookies.clear()
 
-            response_headers = dict()    # type: Dict[str, Any]
-            response = self.get_json(path, params, 'i.instagram.com', tempsession, response_headers=response_headers)
+        response_headers = dict()    # type: Dict[str, Any]
+        response = self.get_json(path, params, 'i.instagram.com', self._iphone_session,
+                                 response_headers=response_headers, headers=headers, cookies=cookies)
 
-            # Extract the ig-set-* headers and use them in the next request
-            for key, value in response_headers.items():
-                if key.startswith('ig-set-'):
-                    self.iphone_headers[key.replace('ig-set-', '')] = value
-                elif key.startswith('x-ig-set-'):
-                    self.iphone_headers[key.replace('x-ig-set-', 'x-ig-')] = value
+        # Extract the ig-set-* headers and use them in the next request
+        for key, value in response_headers.items():
+            if key.startswith('ig-set-'):
+                self.iphone_headers[key.replace('ig-set-', '')] = value
+            elif key.startswith('x-ig-set-'):
+                self.iphone_headers[key.replace('x-ig-set-', 'x-ig-')] = value
 
-            return response
+        return response
 
     def write_raw(self, resp: Union[bytes, requests.Response], filename: str) -> None:
         """Write raw response data into a file.
@@ -669,25 +760,40 @@ class InstaloaderContext:
         self.log(filename, end=' ', flush=True)
         with open(filename + '.temp', 'wb') as file:
             if isinstance(resp, requests.Response):
-                shutil.copyfileobj(resp.raw, file)
+                with resp:
+                    shutil.copyfileobj(resp.raw, file)
             else:
                 file.write(resp)
         os.replace(filename + '.temp', filename)
 
-    def get_raw(self, url: str, _attempt=1) -> requests.Response:
+    def get_raw(self, url: str, _attempt=1, headers: Optional[Dict[str, str]] = None) -> requests.Response:
         """Downloads a file anonymously.
 
+        :param headers: Additional request headers, such as ``Range``. If a ``Range`` header is given, a
+           ``206 Partial Content`` response is accepted as well, and if an ``If-None-Match`` or ``If-Modified-Since``
+           header is given, a ``304 Not Modified`` response.
         :raises QueryReturnedNotFoundException: When the server responds with a 404.
         :raises QueryReturnedForbiddenException: When the server responds with a 403.
+        :raises QueryReturnedBadRequestException: When the server responds with a 416 to a range request.
         :raises ConnectionException: When download failed.
 
-        .. versionadded:: 4.2.1"""
-        with self.get_anonymous_session() as anonymous_session:
-            resp = anonymous_session.get(url, stream=True)
-        if resp.status_code == 200:
+        .. versionadded:: 4.2.1
+
+        .. versionchanged:: 4.16
+           Added `headers` parameter."""
+        is_range_request = headers is not None and 'Range' in headers
+        with metrics.timed(metrics.REQUEST_DURATION, 'raw'):
+            resp = self._cdn_session.get(url, stream=True, headers=headers)
+        if (resp.status_code == 200 or (is_range_request and resp.status_code == 206) or
+                (is_conditional_request(headers) and resp.status_code == 304)):
             resp.raw.decode_content = True
+            if 'Content-Length' in resp.headers:
+                metrics.RESPONSE_BYTES.labels('raw').inc(int(resp.headers['Content-Length']))
             return resp
         else:
+            resp.close()
+            if is_range_request and resp.status_code == 416:
+                raise QueryReturnedBadRequestException(self._response_error(resp))
             if resp.status_code == 403:
                 # suspected invalid URL signature
                 raise QueryReturnedForbiddenException(self._response_error(resp))
@@ -713,8 +819,7 @@ class InstaloaderContext:
 
         .. versionadded:: 4.7.6
         """
-        with self.get_anonymous_session() as anonymous_session:
-            resp = anonymous_session.head(url, allow_redirects=allow_redirects)
+        resp = self._cdn_session.head(url, allow_redirects=allow_redirects)
         if resp.status_code == 200:
             return resp
         else:
@@ -741,6 +846,13 @@ class RateController:
                raise MyCustomException()
 
        L = instaloader.Instaloader(rate_controller=lambda ctx: MyRateController(ctx))
+
+    One instance may be shared by several threads. Computing the wait time of a query and recording it happens
+    atomically, and threads waiting to issue a query of the same type proceed one at a time, in the order in which
+    they called :meth:`RateController.wait_before_query`.
+
+    .. versionchanged:: 4.16
+       Made thread-safe.
     """
 
     def __init__(self, context: InstaloaderContext):
@@ -748,11 +860,19 @@ class RateController:
         self._query_timestamps: Dict[str, List[float]] = dict()
         self._earliest_next_request_time = 0.0
         self._iphone_earliest_next_request_time = 0.0
+        # timestamps of all GraphQL queries, i.e. not 'iphone' or 'other', for the accumulated sliding window.
+        # Like the lists in _query_timestamps, it is sorted, as queries are recorded in order.
+        self._graphql_timestamps: List[float] = []
+        # guards the attributes above; reentrant, as query_waittime may be called with it held
+        self._lock = threading.RLock()
+        # per query type, the threads waiting in wait_before_query; only the first one may proceed
+        self._waiters: Dict[str, Deque[threading.Event]] = dict()
 
     def sleep(self, secs: float):
         """Wait given number of seconds."""
         # Not static, to allow for the behavior of this method to depend on context-inherent properties, such as
         # whether we are logged in.
+        metrics.RATE_CONTROLLER_SLEEP.observe(secs)
         time.sleep(secs)
 
     def _dump_query_timestamps(self, current_time: float, failed_query_type: str):
@@ -778,16 +898,28 @@ class RateController:
         # whether we are logged in.
         return 75 if query_type == 'other' else 200
 
+    def graphql_count_per_sliding_window(self) -> int:
+        """Return how many GraphQL requests of any type together can be done within a sliding window of 10 minutes.
+
+        .. versionadded:: 4.16"""
+        return 275
+
+    def _window_timestamps(self, query_type: Optional[str]) -> List[float]:
+        # timestamps of type query_type, or of all GraphQL queries if query_type is None
+        return self._graphql_timestamps if query_type is None else self._query_timestamps.get(query_type, [])
+
     def _reqs_in_sliding_window(self, query_type: Optional[str], current_time: float, window: float) -> List[float]:
-        if query_type is not None:
-            # timestamps of type query_type
-            relevant_timestamps = self._query_timestamps[query_type]
-        else:
-            # all GraphQL queries, i.e. not 'iphone' or 'other'
-            graphql_query_timestamps = filter(lambda tp: tp[0] not in ['iphone', 'other'],
-                                              self._query_timestamps.items())
-            relevant_timestamps = [t for times in (tp[1] for tp in graphql_query_timestamps) for t in times]
-        return list(filter(lambda t: t > current_time - window, relevant_timestamps))
+        with self._lock:
+            timestamps = self._window_timestamps(query_type)
+            return timestamps[bisect.bisect_right(timestamps, current_time - window):]
+
+    def _sliding_window(self, query_type: Optional[str], current_time: float, window: float) \
+            -> Tuple[int, Optional[float]]:
+        """Number of requests within the sliding window and the time of the oldest of them, in O(log n)."""
+        with self._lock:
+            timestamps = self._window_timestamps(query_type)
+            start = bisect.bisect_right(timestamps, current_time - window)
+            return len(timestamps) - start, timestamps[start] if start < len(timestamps) else None
 
     def query_waittime(self, query_type: str, current_time: float, untracked_queries: bool = False) -> float:
         """Calculate time needed to wait before query can be executed."""
@@ -795,44 +927,43 @@ class RateController:
         iphone_sliding_window = 1800
         if query_type not in self._query_timestamps:
             self._query_timestamps[query_type] = []
-        self._query_timestamps[query_type] = list(filter(lambda t: t > current_time - 60 * 60,
-                                                         self._query_timestamps[query_type]))
+        # forget requests older than an hour; the lists are sorted, so they are a prefix
+        for timestamps in (self._query_timestamps[query_type], self._graphql_timestamps):
+            del timestamps[:bisect.bisect_right(timestamps, current_time - 60 * 60)]
 
         def per_type_next_request_time():
-            reqs_in_sliding_window = self._reqs_in_sliding_window(query_type, current_time, per_type_sliding_window)
-            if len(reqs_in_sliding_window) < self.count_per_sliding_window(query_type):
+            count, oldest = self._sliding_window(query_type, current_time, per_type_sliding_window)
+            if count < self.count_per_sliding_window(query_type):
                 return 0.0
             else:
-                return min(reqs_in_sliding_window) + per_type_sliding_window + 6
+                return oldest + per_type_sliding_window + 6
 
         def gql_accumulated_next_request_time():
             if query_type in ['iphone', 'other']:
                 return 0.0
             gql_accumulated_sliding_window = 600
-            gql_accumulated_max_count = 275
-            reqs_in_sliding_window = self._reqs_in_sliding_window(None, current_time, gql_accumulated_sliding_window)
-            if len(reqs_in_sliding_window) < gql_accumulated_max_count:
+            gql_accumulated_max_count = self.graphql_count_per_sliding_window()
+            count, oldest = self._sliding_window(None, current_time, gql_accumulated_sliding_window)
+            if count < gql_accumulated_max_count:
                 return 0.0
             else:
-                return min(reqs_in_sliding_window) + gql_accumulated_sliding_window
+                return oldest + gql_accumulated_sliding_window
 
         def untracked_next_request_time():
             if untracked_queries:
                 if query_type == "iphone":
-                    reqs_in_sliding_window = self._reqs_in_sliding_window(query_type, current_time,
-                                                                          iphone_sliding_window)
-                    self._iphone_earliest_next_request_time = min(reqs_in_sliding_window) + iphone_sliding_window + 18
+                    _, oldest = self._sliding_window(query_type, current_time, iphone_sliding_window)
+                    self._iphone_earliest_next_request_time = oldest + iphone_sliding_window + 18
                 else:
-                    reqs_in_sliding_window = self._reqs_in_sliding_window(query_type, current_time,
-                                                                          per_type_sliding_window)
-                    self._earliest_next_request_time = min(reqs_in_sliding_window) + per_type_sliding_window + 6
+                    _, oldest = self._sliding_window(query_type, current_time, per_type_sliding_window)
+                    self._earliest_next_request_time = oldest + per_type_sliding_window + 6
             return max(self._iphone_earliest_next_request_time, self._earliest_next_request_time)
 
         def iphone_next_request():
             if query_type == "iphone":
-                reqs_in_sliding_window = self._reqs_in_sliding_window(query_type, current_time, iphone_sliding_window)
-                if len(reqs_in_sliding_window) >= 199:
-                    return min(reqs_in_sliding_window) + iphone_sliding_window + 18
+                count, oldest = self._sliding_window(query_type, current_time, iphone_sliding_window)
+                if count >= 199:
+                    return oldest + iphone_sliding_window + 18
             return 0.0
 
         return max(0.0,
@@ -843,34 +974,85 @@ class RateController:
                        iphone_next_request(),
                    ) - current_time)
 
-    def wait_before_query(self, query_type: str) -> None:
-        """This method is called before a query to Instagram.
-
-        It calls :meth:`RateController.query_waittime` to determine the time needed to wait and then calls
-        :meth:`RateController.sleep` to wait until the request can be made."""
-        waittime = self.query_waittime(query_type, time.monotonic(), False)
+    def _before_query_waittime(self, query_type: str) -> float:
+        with self._lock:
+            waittime = self.query_waittime(query_type, time.monotonic(), False)
         assert waittime >= 0
         if waittime > 15:
             formatted_waittime = ("{} seconds".format(round(waittime)) if waittime <= 666 else
                                   "{} minutes".format(round(waittime / 60)))
             self._context.log("\nToo many queries in the last time. Need to wait {}, until {:%H:%M}."
                               .format(formatted_waittime, datetime.now() + timedelta(seconds=waittime)))
-        if waittime > 0:
-            self.sleep(waittime)
-        if query_type not in self._query_timestamps:
-            self._query_timestamps[query_type] = [time.monotonic()]
-        else:
-            self._query_timestamps[query_type].append(time.monotonic())
+        return waittime
+
+    def _record_query(self, query_type: str) -> None:
+        with self._lock:
+            current_time = time.monotonic()
+            if query_type not in self._query_timestamps:
+                self._query_timestamps[query_type] = [current_time]
+            else:
+                self._query_timestamps[query_type].append(current_time)
+            if query_type not in ['iphone', 'other']:
+                self._graphql_timestamps.append(current_time)
+
+    def _reserve_query(self, query_type: str) -> float:
+        """Return the time needed to wait before a query; if there is none, record the query right away."""
+        with self._lock:
+            waittime = self._before_query_waittime(query_type)
+            if waittime <= 0:
+                self._record_query(query_type)
+            return waittime
+
+    @contextmanager
+    def _turn(self, query_type: str) -> Iterator[None]:
+        """Block until all threads that entered before for the same query type have left."""
+        ticket = threading.Event()
+        with self._lock:
+            waiters = self._waiters.setdefault(query_type, deque())
+            waiters.append(ticket)
+            if waiters[0] is ticket:
+                ticket.set()
+        try:
+            ticket.wait()
+            yield
+        finally:
+            with self._lock:
+                was_first = waiters[0] is ticket
+                waiters.remove(ticket)
+                if not waiters:
+                    del self._waiters[query_type]
+                elif was_first:
+                    waiters[0].set()
+
+    def wait_before_query(self, query_type: str) -> None:
+        """This method is called before a query to Instagram.
+
+        It calls :meth:`RateController.query_waittime` to determine the time needed to wait and then calls
+        :meth:`RateController.sleep` to wait until the request can be made.
+
+        .. versionchanged:: 4.16
+           Threads waiting for a query of the same type are woken in FIFO order. After sleeping, the wait time is
+           determined again, since queries of other types may have taken the budget in the meantime; the query is
+           only recorded once there is no need to wait anymore."""
+        with self._turn(query_type):
+            while (waittime := self._reserve_query(query_type)) > 0:
+                self.sleep(waittime)
 
     def handle_429(self, query_type: str) -> None:
         """This method is called to handle a 429 Too Many Requests response.
 
         It calls :meth:`RateController.query_waittime` to determine the time needed to wait and then calls
         :meth:`RateController.sleep` to wait until we can repeat the same request."""
-        current_time = time.monotonic()
-        waittime = self.query_waittime(query_type, current_time, True)
-        assert waittime >= 0
-        self._dump_query_timestamps(current_time, query_type)
+        waittime = self._after_429_waittime(query_type)
+        if waittime > 0:
+            self.sleep(waittime)
+
+    def _after_429_waittime(self, query_type: str) -> float:
+        with self._lock:
+            current_time = time.monotonic()
+            waittime = self.query_waittime(query_type, current_time, True)
+            assert waittime >= 0
+            self._dump_query_timestamps(current_time, query_type)
         text_for_429 = ("Instagram responded with HTTP error \"429 - Too Many Requests\". Please do not run multiple "
                         "instances of Instaloader in parallel or within short sequence. Also, do not use any Instagram "
                         "App while Instaloader is running.")
@@ -881,5 +1063,65 @@ class RateController:
             self._context.error("The request will be retried in {}, at {:%H:%M}."
                                 .format(formatted_waittime, datetime.now() + timedelta(seconds=waittime)),
                                 repeat_at_end=False)
-        if waittime > 0:
-            self.sleep(waittime)
+        return waittime
+
+    def get_state(self) -> Dict[str, Any]:
+        """Return the request history as a JSON-serializable dict, to be restored with :meth:`set_state`.
+
+        Times are given as UNIX timestamps, so a state saved by one process is meaningful for another one.
+
+        .. versionadded:: 4.16"""
+        with self._lock:
+            offset = time.time() - time.monotonic()
+            return {
+                'query_timestamps': {query_type: [t + offset for t in timestamps]
+                                     for query_type, timestamps in self._query_timestamps.items() if timestamps},
+                'earliest_next_request_time': (self._earliest_next_request_time + offset
+                                               if self._earliest_next_request_time else 0.0),
+                'iphone_earliest_next_request_time': (self._iphone_earliest_next_request_time + offset
+                                                      if self._iphone_earliest_next_request_time else 0.0),
+            }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Add a request history returned by :meth:`get_state` to the one of this controller.
+
+        Requests older than an hour are skipped, as they do not count towards any sliding window anymore.
+
+        .. versionadded:: 4.16"""
+        with self._lock:
+            offset = time.time() - time.monotonic()
+            oldest = time.monotonic() - 60 * 60
+            for query_type, timestamps in state.get('query_timestamps', {}).items():
+                restored = [t - offset for t in timestamps if t - offset > oldest]
+                if not restored:
+                    continue
+                self._query_timestamps[query_type] = sorted(self._query_timestamps.get(query_type, []) + restored)
+                if query_type not in ['iphone', 'other']:
+                    self._graphql_timestamps = sorted(self._graphql_timestamps + restored)
+            if state.get('earliest_next_request_time'):
+                self._earliest_next_request_time = max(self._earliest_next_request_time,
+                                                       state['earliest_next_request_time'] - offset)
+            if state.get('iphone_earliest_next_request_time'):
+                self._iphone_earliest_next_request_time = max(self._iphone_earliest_next_request_time,
+                                                              state['iphone_earliest_next_request_time'] - offset)
+
+    def save_state_to_file(self, filename: str) -> None:
+        """Write :meth:`get_state` to a JSON file, replacing it atomically.
+
+        .. versionadded:: 4.16"""
+        with open(filename + '.temp', 'w') as file:
+            json.dump(self.get_state(), file)
+        os.replace(filename + '.temp', filename)
+
+    def load_state_from_file(self, filename: str) -> None:
+        """Restore a request history written by :meth:`save_state_to_file`.
+
+        .. versionadded:: 4.16"""
+        with open(filename) as file:
+            self.set_state(json.load(file))
+
+    def close(self) -> None:
+        """Release resources held by the controller. Its :class:`InstaloaderContext` does not call this, as a
+        controller may be shared by several contexts.
+
+        .. versionadded:: 4.16"""
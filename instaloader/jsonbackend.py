@@ -0,0 +1,103 @@
+"""JSON (de)serialization of API responses, saved structures and comment files.
+
+The fastest installed backend is used: ``orjson``, then ``ujson``, then the standard library's :mod:`json`.
+:func:`use_backend` selects another one. Whichever backend is used, invalid documents raise
+:class:`json.JSONDecodeError`.
+
+Compact output of ``orjson`` and ``ujson`` leaves non-ASCII characters unescaped, so it differs byte-wise from
+:mod:`json`, but loads to the same structure. Indented output is always written by :mod:`json`, so pretty-printed
+files stay byte-identical to those of earlier versions. Values the fast backends cannot encode, such as integers
+beyond 64 bit, are passed on to :mod:`json` as well; ``orjson`` decodes such integers as floats.
+
+.. versionadded:: 4.16
+"""
+import json
+from types import ModuleType
+from typing import Any, Optional, Union
+
+orjson: Optional[ModuleType]
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+ujson: Optional[ModuleType]
+try:
+    import ujson  # type: ignore
+except ImportError:
+    ujson = None
+
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+JSONDecodeError = json.JSONDecodeError
+
+_installed = {'orjson': orjson is not None, 'ujson': ujson is not None, 'json': True}
+
+
+def _fastest() -> str:
+    return next(name for name in BACKENDS if _installed[name])
+
+
+# the backend in use, changed by use_backend()
+_selection = {'backend': _fastest()}
+
+
+def current_backend() -> str:
+    """Name of the JSON backend in use."""
+    return _selection['backend']
+
+
+def use_backend(name: Optional[str] = None) -> str:
+    """Select the JSON backend by name, or the fastest installed one if `name` is None, and return its name.
+
+    :raises ValueError: If the backend is unknown or not installed."""
+    if name is None:
+        name = _fastest()
+    if not _installed.get(name, False):
+        raise ValueError("JSON backend {!r} is not available; installed: {}."
+                         .format(name, ', '.join(n for n in BACKENDS if _installed[n])))
+    _selection['backend'] = name
+    return name
+
+
+def loads(s: Union[bytes, bytearray, str]) -> Any:
+    """Deserialize a JSON document, given as UTF-8 encoded bytes or as string."""
+    backend = _selection['backend']
+    try:
+        if backend == 'orjson' and orjson is not None:
+            return orjson.loads(s)
+        if backend == 'ujson' and ujson is not None:
+            return ujson.loads(s)
+        return json.loads(s)
+    except ValueError as err:
+        if isinstance(err, JSONDecodeError):
+            raise
+        # ujson's errors and undecodable bytes
+        doc = s if isinstance(s, str) else bytes(s).decode('utf-8', 'replace')
+        raise JSONDecodeError(str(err), doc, 0) from err
+
+
+def dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize `obj` to compact, UTF-8 encoded JSON."""
+    backend = _selection['backend']
+    if backend == 'orjson' and orjson is not None:
+        with_sort = orjson.OPT_SORT_KEYS if sort_keys else 0
+        try:
+            return orjson.dumps(obj, option=with_sort)
+        except TypeError:
+            pass
+    elif backend == 'ujson' and ujson is not None:
+        try:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False,
+                               sort_keys=sort_keys).encode()
+        except (TypeError, OverflowError):
+            pass
+    return json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys).encode()
+
+
+def dumps(obj: Any, indent: Optional[int] = None, sort_keys: bool = False) -> str:
+    """Serialize `obj` to a JSON string, compact unless `indent` is given."""
+    if indent is not None:
+        return json.dumps(obj, indent=indent, sort_keys=sort_keys)
+    return dumpb(obj, sort_keys).decode()
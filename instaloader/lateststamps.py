@@ -1,4 +1,5 @@
 import configparser
+import threading
 from datetime import datetime, timezone
 from typing import Optional
 from os.path import dirname
@@ -12,7 +13,10 @@ class LatestStamps:
 
     :param latest_stamps_file: path to file.
 
-    .. versionadded:: 4.8"""
+    .. versionadded:: 4.8
+
+    .. versionchanged:: 4.16
+       Updates are serialized, so one instance can be shared by profiles downloaded in parallel."""
     PROFILE_ID = 'profile-id'
     PROFILE_PIC = 'profile-pic'
     POST_TIMESTAMP = 'post-timestamp'
@@ -26,6 +30,7 @@ class LatestStamps:
         self.file = latest_stamps_file
         self.data = configparser.ConfigParser()
         self.data.read(latest_stamps_file)
+        self._lock = threading.RLock()
 
     def _save(self):
         if dn := dirname(self.file):
@@ -46,20 +51,22 @@ class LatestStamps:
 
     def save_profile_id(self, profile_name: str, profile_id: int):
         """Stores ID of profile."""
-        self._ensure_section(profile_name)
-        self.data.set(profile_name, self.PROFILE_ID, str(profile_id))
-        self._save()
+        with self._lock:
+            self._ensure_section(profile_name)
+            self.data.set(profile_name, self.PROFILE_ID, str(profile_id))
+            self._save()
 
     def rename_profile(self, old_profile: str, new_profile: str):
         """Renames a profile."""
-        self._ensure_section(new_profile)
-        for option in [self.PROFILE_ID, self.PROFILE_PIC, self.POST_TIMESTAMP,
-                       self.TAGGED_TIMESTAMP, self.IGTV_TIMESTAMP, self.STORY_TIMESTAMP]:
-            if self.data.has_option(old_profile, option):
-                value = self.data.get(old_profile, option)
-                self.data.set(new_profile, option, value)
-        self.data.remove_section(old_profile)
-        self._save()
+        with self._lock:
+            self._ensure_section(new_profile)
+            for option in [self.PROFILE_ID, self.PROFILE_PIC, self.POST_TIMESTAMP,
+                           self.TAGGED_TIMESTAMP, self.IGTV_TIMESTAMP, self.STORY_TIMESTAMP]:
+                if self.data.has_option(old_profile, option):
+                    value = self.data.get(old_profile, option)
+                    self.data.set(new_profile, option, value)
+            self.data.remove_section(old_profile)
+            self._save()
 
     def _get_timestamp(self, section: str, key: str) -> datetime:
         try:
@@ -68,9 +75,10 @@ class LatestStamps:
             return datetime.fromtimestamp(0, timezone.utc)
 
     def _set_timestamp(self, section: str, key: str, timestamp: datetime):
-        self._ensure_section(section)
-        self.data.set(section, key, timestamp.strftime(self.ISO_FORMAT))
-        self._save()
+        with self._lock:
+            self._ensure_section(section)
+            self.data.set(section, key, timestamp.strftime(self.ISO_FORMAT))
+            self._save()
 
     def get_last_post_timestamp(self, profile_name: str) -> datetime:
         """Returns timestamp of last download of a profile's posts."""
@@ -121,6 +129,7 @@ class LatestStamps:
 
     def set_profile_pic(self, profile_name: str, profile_pic: str):
         """Sets filename of profile's last downloaded profile pic."""
-        self._ensure_section(profile_name)
-        self.data.set(profile_name, self.PROFILE_PIC, profile_pic)
-        self._save()
+        with self._lock:
+            self._ensure_section(profile_name)
+            self.data.set(profile_name, self.PROFILE_PIC, profile_pic)
+            self._save()
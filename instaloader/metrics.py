@@ -0,0 +1,104 @@
+"""Prometheus instrumentation of the requests made by :class:`InstaloaderContext`.
+
+The metrics are registered in the default registry of ``prometheus_client`` if that package is installed. Otherwise
+all hooks are no-ops, so instrumenting the request routines costs next to nothing.
+
+Query type labels are the keys :class:`RateController` tracks: the ``query_hash`` or ``doc_id`` of a GraphQL query,
+``'iphone'``, ``'other'``, and ``'raw'`` for anonymous media downloads.
+
+.. versionadded:: 4.16
+"""
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Iterator, Optional, Tuple
+
+prometheus_client: Optional[ModuleType]
+try:
+    import prometheus_client  # type: ignore
+except ImportError:
+    prometheus_client = None
+
+
+# buckets for waits imposed by the rate controller, up to the 30 minutes of the iphone sliding window
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, float('inf'))
+
+# buckets for network round trips
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+
+class _NoopMetric:
+    def labels(self, *_args, **_kwargs):
+        return self
+
+    def observe(self, amount: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+if prometheus_client is not None:
+    QUERY_DURATION = prometheus_client.Histogram(
+        'instaloader_query_duration_seconds',
+        'Duration of one JSON query attempt, including rate limit waits, redirects and decoding.',
+        ['query_type'], buckets=WAIT_BUCKETS)
+    RATE_LIMIT_WAIT = prometheus_client.Histogram(
+        'instaloader_rate_limit_wait_seconds',
+        'Time spent waiting for the rate controller before a query (reason="query") or after a 429 (reason="429").',
+        ['query_type', 'reason'], buckets=WAIT_BUCKETS)
+    REQUEST_DURATION = prometheus_client.Histogram(
+        'instaloader_http_request_duration_seconds',
+        'Network round trip of a request until its response headers (raw) or body (JSON) are received.',
+        ['query_type'], buckets=REQUEST_BUCKETS)
+    RATE_CONTROLLER_SLEEP = prometheus_client.Histogram(
+        'instaloader_rate_controller_sleep_seconds',
+        'Durations passed to RateController.sleep.',
+        buckets=WAIT_BUCKETS)
+    TOO_MANY_REQUESTS = prometheus_client.Counter(
+        'instaloader_too_many_requests_total',
+        'Number of 429 Too Many Requests responses.',
+        ['query_type'])
+    RETRIES = prometheus_client.Counter(
+        'instaloader_retries_total',
+        'Number of retried query attempts.',
+        ['query_type'])
+    RESPONSE_BYTES = prometheus_client.Counter(
+        'instaloader_response_bytes_total',
+        'Bytes received in response bodies; for raw downloads as announced by Content-Length.',
+        ['query_type'])
+    RATE_BUDGET = prometheus_client.Gauge(
+        'instaloader_rate_budget_requests',
+        'Requests per sliding window learned by AdaptiveRateController; query_type="graphql" is the accumulated '
+        'budget of all GraphQL queries.',
+        ['account', 'query_type'])
+else:
+    QUERY_DURATION = RATE_LIMIT_WAIT = REQUEST_DURATION = RATE_CONTROLLER_SLEEP = _NoopMetric()
+    TOO_MANY_REQUESTS = RETRIES = RESPONSE_BYTES = RATE_BUDGET = _NoopMetric()
+
+
+def available() -> bool:
+    """Whether ``prometheus_client`` is installed and metrics are recorded."""
+    return prometheus_client is not None
+
+
+@contextmanager
+def timed(histogram, *labels: str) -> Iterator[None]:
+    """Observe the duration of the enclosed block in `histogram`, also if it raises."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        histogram.labels(*labels).observe(time.monotonic() - start)
+
+
+def render() -> Tuple[bytes, str]:
+    """Return the current metrics in the Prometheus text exposition format and its content type.
+
+    :raises RuntimeError: If ``prometheus_client`` is not installed."""
+    if prometheus_client is None:
+        raise RuntimeError("prometheus_client is not installed.")
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
@@ -1,13 +1,18 @@
 import base64
+import glob
 import hashlib
 import json
 import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from lzma import LZMAError
-from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, TypeVar
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, TypeVar
 
-from .exceptions import InvalidArgumentException
+from .exceptions import InvalidArgumentException, QueryReturnedBadRequestException
 from .instaloadercontext import InstaloaderContext
 
 class FrozenNodeIterator(NamedTuple):
@@ -67,13 +72,38 @@ class NodeIterator(Iterator[T]):
 
     See also :func:`resumable_iteration` for a high-level context manager that handles a resumable iteration.
 
+    With `prefetch` > 0, up to that many following pages are requested in a background thread as soon as a page is
+    being handed out, so that iterating does not stall at page boundaries. The requests are rate controlled like any
+    other. Pages that have been prefetched when :meth:`NodeIterator.freeze` is called are included in the frozen
+    state. `prefetch` defaults to :attr:`InstaloaderContext.prefetch_pages`.
+
+    `doc_id`-based queries request pages of `page_length` nodes, defaulting to :attr:`NodeIterator.doc_id_page_length`
+    or, if smaller, the largest page length last accepted for the same `doc_id`. When Instagram responds with
+    "400 Bad Request", the page length is halved (down to 12) and the query repeated. After 8 pages of a `doc_id` have
+    been accepted in a row with a halved page length, it is doubled again, so that a transient error does not shorten
+    the pages for good. The page length replaces the
+    ``first`` pagination variable as well as ``count`` and ``page_size`` in a ``data`` query variable, if present.
+
     .. versionchanged: 4.13
        Included support for `doc_id`-based queries (using POST method).
+
+    .. versionchanged:: 4.16
+       Added `prefetch` and `page_length` parameters.
     """
 
     _graphql_page_length = 12
     _shelf_life = timedelta(days=29)
 
+    #: Initial page length of `doc_id`-based queries.
+    doc_id_page_length = 48
+    # page length to request next per doc_id, shared by all iterators, and the number of pages accepted in a row
+    # since it has last been changed; guarded by _doc_id_lock
+    _doc_id_page_lengths: Dict[str, int] = dict()
+    _doc_id_accepted_pages: Dict[str, int] = dict()
+    _doc_id_lock = threading.Lock()
+    # number of pages accepted in a row after which a halved page length is doubled again
+    _doc_id_probe_pages = 8
+
     def __init__(self,
                  context: InstaloaderContext,
                  query_hash: Optional[str],
@@ -83,7 +113,9 @@ class NodeIterator(Iterator[T]):
                  query_referer: Optional[str] = None,
                  first_data: Optional[Dict[str, Any]] = None,
                  is_first: Optional[Callable[[T, Optional[T]], bool]] = None,
-                 doc_id: Optional[str] = None):
+                 doc_id: Optional[str] = None,
+                 prefetch: Optional[int] = None,
+                 page_length: Optional[int] = None):
         self._context = context
         self._query_hash = query_hash
         self._doc_id = doc_id
@@ -93,53 +125,135 @@ class NodeIterator(Iterator[T]):
         self._query_referer = query_referer
         self._page_index = 0
         self._total_index = 0
+        if page_length is None:
+            page_length = NodeIterator.doc_id_page_length
+            if doc_id is not None:
+                with NodeIterator._doc_id_lock:
+                    page_length = min(page_length, NodeIterator._doc_id_page_lengths.get(doc_id, page_length))
+        self._page_length = page_length
+        self._prefetch = prefetch if prefetch is not None else context.prefetch_pages
+        # the pages following self._data that are requested in the background, in order, each as a future of
+        # (data, best before, page length), or (None, None, page length) if there is no such page
+        self._prefetched: Deque[Future] = deque()
+        self._prefetch_executor: Optional[ThreadPoolExecutor] = None
         if first_data is not None:
             self._data = first_data
-            self._best_before = datetime.now() + NodeIterator._shelf_life
         else:
             self._data = self._query()
+        self._best_before = datetime.now() + NodeIterator._shelf_life
         self._first_node: Optional[Dict] = None
         self._is_first = is_first
 
     def _query(self, after: Optional[str] = None) -> Dict:
+        data, self._page_length = self._query_page(self._page_length, after)
+        return data
+
+    def _query_page(self, page_length: int, after: Optional[str] = None) -> Tuple[Dict, int]:
+        # Returns the page and the page length to request the following page with. Leaves the iterator's state
+        # alone, as it is also called from the prefetch thread.
         if self._doc_id is not None:
-            return self._query_doc_id(self._doc_id, after)
+            return self._query_doc_id(self._doc_id, page_length, after)
         else:
             assert self._query_hash is not None
-            return self._query_query_hash(self._query_hash, after)
+            return self._query_query_hash(self._query_hash, after), page_length
 
-    def _query_doc_id(self, doc_id: str, after: Optional[str] = None) -> Dict:
+    def _query_doc_id(self, doc_id: str, page_length: int, after: Optional[str] = None) -> Tuple[Dict, int]:
         pagination_variables: Dict[str, Any] = {'__relay_internal__pv__PolarisFeedShareMenurelayprovider': False}
         if after is not None:
             pagination_variables['after'] = after
             pagination_variables['before'] = None
-            pagination_variables['first'] = 12
+            pagination_variables['first'] = page_length
             pagination_variables['last'] = None
-        data = self._edge_extractor(
-            self._context.doc_id_graphql_query(
-                doc_id, {**self._query_variables, **pagination_variables}, self._query_referer
+        query_variables = self._query_variables
+        if isinstance(query_variables.get('data'), dict):
+            # not stored in self._query_variables, which identifies the iteration (see magic)
+            data_variables = {key: (page_length if key in ('count', 'page_size') else value)
+                              for key, value in query_variables['data'].items()}
+            query_variables = {**query_variables, 'data': data_variables}
+        try:
+            data = self._edge_extractor(
+                self._context.doc_id_graphql_query(
+                    doc_id, {**query_variables, **pagination_variables}, self._query_referer
+                )
             )
-        )
-        self._best_before = datetime.now() + NodeIterator._shelf_life
-        return data
+        except QueryReturnedBadRequestException:
+            new_page_length = page_length // 2
+            if new_page_length < NodeIterator._graphql_page_length:
+                raise
+            with NodeIterator._doc_id_lock:
+                NodeIterator._doc_id_page_lengths[doc_id] = new_page_length
+                NodeIterator._doc_id_accepted_pages[doc_id] = 0
+            self._context.error("HTTP Error 400 (Bad Request) on GraphQL Query. Retrying with page length {}."
+                                .format(new_page_length), repeat_at_end=False)
+            return self._query_doc_id(doc_id, new_page_length, after)
+        return data, NodeIterator._accepted_doc_id_page_length(doc_id, page_length)
+
+    @staticmethod
+    def _accepted_doc_id_page_length(doc_id: str, page_length: int) -> int:
+        # Records that a page of `doc_id` has been accepted with `page_length`, and returns the page length to
+        # request the following page with.
+        with NodeIterator._doc_id_lock:
+            accepted_pages = NodeIterator._doc_id_accepted_pages.get(doc_id, 0) + 1
+            if accepted_pages >= NodeIterator._doc_id_probe_pages and page_length < NodeIterator.doc_id_page_length:
+                page_length = min(2 * page_length, NodeIterator.doc_id_page_length)
+                accepted_pages = 0
+            NodeIterator._doc_id_page_lengths[doc_id] = page_length
+            NodeIterator._doc_id_accepted_pages[doc_id] = accepted_pages
+            return page_length
 
     def _query_query_hash(self, query_hash: str, after: Optional[str] = None) -> Dict:
         pagination_variables: Dict[str, Any] = {'first': NodeIterator._graphql_page_length}
         if after is not None:
             pagination_variables['after'] = after
-        data = self._edge_extractor(
+        return self._edge_extractor(
             self._context.graphql_query(
                 query_hash, {**self._query_variables, **pagination_variables}, self._query_referer
             )
         )
-        self._best_before = datetime.now() + NodeIterator._shelf_life
-        return data
+
+    def _prefetch_page(self, data: Dict, previous: Optional[Future], page_length: int) \
+            -> Tuple[Optional[Dict], Optional[datetime], int]:
+        if previous is not None:
+            data, _, page_length = previous.result()
+        if data is None or not data.get('page_info', {}).get('has_next_page'):
+            return None, None, page_length
+        page, page_length = self._query_page(page_length, data['page_info']['end_cursor'])
+        return page, datetime.now() + NodeIterator._shelf_life, page_length
+
+    def _fill_prefetch(self) -> None:
+        if self._prefetch_executor is None:
+            # one thread, as each page is requested with the cursor of the previous one
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='instaloader-prefetch')
+        while len(self._prefetched) < self._prefetch:
+            previous = self._prefetched[-1] if self._prefetched else None
+            self._prefetched.append(self._prefetch_executor.submit(self._prefetch_page, self._data, previous,
+                                                                   self._page_length))
+
+    def _clear_prefetch(self) -> None:
+        for future in self._prefetched:
+            future.cancel()
+        self._prefetched.clear()
+
+    def _next_page(self) -> Tuple[Dict, datetime]:
+        if not self._prefetched:
+            return self._query(self._data['page_info']['end_cursor']), datetime.now() + NodeIterator._shelf_life
+        try:
+            # the page length is taken over here, on the iterating thread
+            data, best_before, self._page_length = self._prefetched[0].result()
+        except Exception:
+            # the following prefetched pages depend on this one; request it again on the next call
+            self._clear_prefetch()
+            raise
+        self._prefetched.popleft()
+        return data, best_before
 
     def __iter__(self):
         return self
 
     def __next__(self) -> T:
         if self._page_index < len(self._data['edges']):
+            if len(self._prefetched) < self._prefetch:
+                self._fill_prefetch()
             node = self._data['edges'][self._page_index]['node']
             page_index, total_index = self._page_index, self._total_index
             try:
@@ -157,18 +271,38 @@ class NodeIterator(Iterator[T]):
                     self._first_node = node
             return item
         if self._data.get('page_info', {}).get('has_next_page'):
-            query_response = self._query(self._data['page_info']['end_cursor'])
+            query_response, best_before = self._next_page()
             if self._data['edges'] != query_response['edges'] and len(query_response['edges']) > 0:
-                page_index, data = self._page_index, self._data
+                page_index, data, data_best_before = self._page_index, self._data, self._best_before
                 try:
                     self._page_index = 0
                     self._data = query_response
+                    self._best_before = best_before
                 except KeyboardInterrupt:
-                    self._page_index, self._data = page_index, data
+                    self._page_index, self._data, self._best_before = page_index, data, data_best_before
                     raise
                 return self.__next__()
+        self.close()
         raise StopIteration()
 
+    def close(self) -> None:
+        """Cancel the pages requested in the background and stop the prefetch thread.
+
+        This happens by itself when the iteration is exhausted; call it, or use the iterator as a context manager,
+        if the iteration is left early. The iterator remains usable, and prefetches again if iterated further.
+
+        .. versionadded:: 4.16"""
+        self._clear_prefetch()
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=False, cancel_futures=True)
+            self._prefetch_executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     @property
     def count(self) -> Optional[int]:
         """The ``count`` as returned by Instagram. This is not always the total count this iterator will yield."""
@@ -208,18 +342,33 @@ class NodeIterator(Iterator[T]):
         return NodeIterator._graphql_page_length
 
     def freeze(self) -> FrozenNodeIterator:
-        """Freeze the iterator for later resuming."""
+        """Freeze the iterator for later resuming.
+
+        .. versionchanged:: 4.16
+           Pages that have already been prefetched are appended to the remaining data."""
         remaining_data = None
+        best_before = self._best_before
         if self._data is not None:
             remaining_data = {**self._data,
                               'edges': (self._data['edges'][(max(self._page_index - 1, 0)):])}
+            previous_edges = self._data['edges']
+            for future in self._prefetched:
+                if not future.done() or future.cancelled() or future.exception() is not None:
+                    break
+                page, page_best_before, _ = future.result()
+                # stop where __next__ would stop
+                if page is None or not page['edges'] or page['edges'] == previous_edges:
+                    break
+                remaining_data = {**page, 'edges': remaining_data['edges'] + page['edges']}
+                previous_edges = page['edges']
+                best_before = min(best_before, page_best_before)
         return FrozenNodeIterator(
             query_hash=self._query_hash,
             query_variables=self._query_variables,
             query_referer=self._query_referer,
             context_username=self._context.username,
             total_index=max(self.total_index - 1, 0),
-            best_before=self._best_before.timestamp() if self._best_before else None,
+            best_before=best_before.timestamp() if best_before else None,
             remaining_data=remaining_data,
             first_node=self._first_node,
             doc_id=self._doc_id,
@@ -247,6 +396,7 @@ class NodeIterator(Iterator[T]):
             raise InvalidArgumentException("\"best before\" date missing.")
         if frozen.remaining_data is None:
             raise InvalidArgumentException("\"remaining_data\" missing.")
+        self._clear_prefetch()
         self._total_index = frozen.total_index
         self._best_before = datetime.fromtimestamp(frozen.best_before)
         self._data = frozen.remaining_data
@@ -254,6 +404,20 @@ class NodeIterator(Iterator[T]):
             self._first_node = frozen.first_node
 
 
+def _saved_resume_file(resume_file_path: str) -> Optional[str]:
+    """The file at `resume_file_path` if it exists, or else one saved under the same name up to '.json' but with
+    another compression extension; the loader detects the compression by its magic bytes."""
+    if os.path.isfile(resume_file_path):
+        return resume_file_path
+    stem, json_ext, _ = resume_file_path.rpartition('.json')
+    if not json_ext:
+        return None
+    for path in sorted(glob.glob(glob.escape(stem + json_ext) + '*')):
+        if re.fullmatch(r'(\.\w+)?', path[len(stem + json_ext):]) and os.path.isfile(path):
+            return path
+    return None
+
+
 @contextmanager
 def resumable_iteration(context: InstaloaderContext,
                         iterator: Iterable,
@@ -261,7 +425,8 @@ def resumable_iteration(context: InstaloaderContext,
                         save: Callable[[FrozenNodeIterator, str], None],
                         format_path: Callable[[str], str],
                         check_bbd: bool = True,
-                        enabled: bool = True) -> Iterator[Tuple[bool, int]]:
+                        enabled: bool = True,
+                        freeze: Optional[Callable[[], FrozenNodeIterator]] = None) -> Iterator[Tuple[bool, int]]:
     """
     High-level context manager to handle a resumable iteration that can be interrupted
     with a :class:`KeyboardInterrupt` or an :class:`AbortDownloadException`.
@@ -292,20 +457,32 @@ def resumable_iteration(context: InstaloaderContext,
     :param format_path: Returns the path to the resume file for the given magic.
     :param check_bbd: Whether to check the best before date and reject an expired FrozenNodeIterator.
     :param enabled: Set to False to disable all functionality and simply execute the inner body.
+    :param freeze: Returns the state to save when interrupted, defaults to ``iterator.freeze``. To be given if the
+       iterator has been read ahead of the items that have been processed.
 
     .. versionchanged:: 4.7
        Also interrupt on :class:`AbortDownloadException`.
+
+    .. versionchanged:: 4.16
+       Add `freeze` parameter. The iterator is closed (see :meth:`NodeIterator.close`) when the context is left. If
+       there is no file at the path returned by `format_path`, a file of the same name up to ``.json``, but with
+       another extension, is resumed from, so that resume files of another compression are found. It is replaced
+       by the one at the returned path when saving.
     """
-    if not enabled or not isinstance(iterator, NodeIterator):
+    if not isinstance(iterator, NodeIterator):
         yield False, 0
         return
+    if not enabled:
+        with iterator:
+            yield False, 0
+        return
     is_resuming = False
     start_index = 0
     resume_file_path = format_path(iterator.magic)
-    resume_file_exists = os.path.isfile(resume_file_path)
-    if resume_file_exists:
+    saved_resume_file_path = _saved_resume_file(resume_file_path)
+    if saved_resume_file_path is not None:
         try:
-            fni = load(context, resume_file_path)
+            fni = load(context, saved_resume_file_path)
             if not isinstance(fni, FrozenNodeIterator):
                 raise InvalidArgumentException("Invalid type.")
             if check_bbd and fni.best_before and datetime.fromtimestamp(fni.best_before) < datetime.now():
@@ -313,17 +490,22 @@ def resumable_iteration(context: InstaloaderContext,
             iterator.thaw(fni)
             is_resuming = True
             start_index = iterator.total_index
-            context.log("Resuming from {}.".format(resume_file_path))
+            context.log("Resuming from {}.".format(saved_resume_file_path))
         except (InvalidArgumentException, LZMAError, json.decoder.JSONDecodeError, EOFError) as exc:
-            context.error("Warning: Not resuming from {}: {}".format(resume_file_path, exc))
+            context.error("Warning: Not resuming from {}: {}".format(saved_resume_file_path, exc))
     try:
         yield is_resuming, start_index
     except (Exception, KeyboardInterrupt):
         if os.path.dirname(resume_file_path):
             os.makedirs(os.path.dirname(resume_file_path), exist_ok=True)
-        save(iterator.freeze(), resume_file_path)
+        save(freeze() if freeze is not None else iterator.freeze(), resume_file_path)
         context.log("\nSaved resume information to {}.".format(resume_file_path))
+        if saved_resume_file_path is not None and saved_resume_file_path != resume_file_path:
+            os.unlink(saved_resume_file_path)
         raise
-    if resume_file_exists:
-        os.unlink(resume_file_path)
-        context.log("Iteration complete, deleted resume information file {}.".format(resume_file_path))
+    finally:
+        # after saving, which includes the pages prefetched so far
+        iterator.close()
+    if saved_resume_file_path is not None:
+        os.unlink(saved_resume_file_path)
+        context.log("Iteration complete, deleted resume information file {}.".format(saved_resume_file_path))
@@ -6,47 +6,527 @@ pool so the async event loop is not blocked.
 """
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
 import os
-from typing import Optional, List, Tuple, Any
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import partial
+from typing import Optional, List, Dict, Tuple, Any, AsyncIterator, Awaitable, Callable
 
-from starlette.concurrency import run_in_threadpool
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
 from instaloader.api import (
+    MediaStream,
+    open_media,
+    open_media_async,
     make_loader,
     get_profile_json,
     get_post_json,
     get_post_media,
     get_stories_for_user,
-    get_story_media,
+    get_profile_picture_url,
 )
-from instaloader import TwoFactorAuthRequiredException, BadCredentialsException
+from instaloader import (
+    TwoFactorAuthRequiredException,
+    BadCredentialsException,
+    AbortDownloadException,
+    ConnectionException,
+    LoginRequiredException,
+    QueryReturnedForbiddenException,
+    QueryReturnedNotFoundException,
+    TooManyRequestsException,
+    AdaptiveRateController,
+    InstaloaderContext,
+    RateController,
+    SQLiteRateController,
+)
+try:
+    from instaloader.asyncinstaloadercontext import AsyncInstaloaderContext
+except ImportError:
+    # httpx not installed; media is streamed from the threadpool instead
+    AsyncInstaloaderContext = None
+from instaloader.settings import get_settings
+from instaloader.services.response_cache import ResponseCache, SQLiteCacheBackend
+
+logger = logging.getLogger(__name__)
+
+# sliding window of RateController's per query type limit
+_RATE_WINDOW_SECONDS = 660
+
+
+def rate_budget_waittime(rate_controller: Optional[RateController]) -> float:
+    """Seconds until `rate_controller` would let the next query of any type it tracks through.
+
+    Blocking, as a SQLiteRateController reads its database; call it from the threadpool."""
+    if rate_controller is None:
+        return 0.0
+    current_time = time.monotonic()
+    # pylint:disable=protected-access
+    with rate_controller._lock:
+        query_types = set(rate_controller._query_timestamps) | {'other'}
+        return max(rate_controller.query_waittime(query_type, current_time) for query_type in query_types)
+
+
+def recent_query_count(rate_controller: RateController) -> int:
+    """Number of queries `rate_controller` has seen within its per query type sliding window."""
+    current_time = time.monotonic()
+    # pylint:disable=protected-access
+    return sum(rate_controller._sliding_window(query_type, current_time, _RATE_WINDOW_SECONDS)[0]
+               for query_type in list(rate_controller._query_timestamps))
+
+
+def close_account_loader(L) -> None:
+    """Close a logged-in loader together with its own RateController. Blocking."""
+    L.close()
+    # pylint:disable=protected-access
+    L.context._rate_controller.close()
+
+
+def rate_controller_factory(base: type = RateController, sqlite_path: str = '',
+                            adaptive: bool = False) -> Callable[[InstaloaderContext], RateController]:
+    """Factory for Instaloader(rate_controller=...) of `base` RateControllers,
+    made adaptive (AdaptiveRateController) and shared with other processes
+    through `sqlite_path` (SQLiteRateController) if requested."""
+    bases = []  # type: List[type]
+    if adaptive:
+        bases.append(AdaptiveRateController)
+    if base is not RateController:
+        bases.append(base)
+    if sqlite_path:
+        bases.append(SQLiteRateController)
+    if not bases:
+        cls = RateController  # type: type
+    elif len(bases) == 1:
+        cls = bases[0]
+    else:
+        cls = type('_'.join(b.__name__.lstrip('_') for b in bases), tuple(bases), {})
+    if sqlite_path:
+        return lambda context: cls(context, sqlite_path)
+    return cls
+
+
+class LoaderPool:
+    """Bounded pool of anonymous Instaloader instances reused across requests.
+
+    A loader is checked out for the duration of one service call and checked
+    back in afterwards, so its requests.Session (and the keep-alive connections
+    it holds) survives between HTTP requests. All loaders of the pool share a
+    single RateController, so the sliding-window accounting sees every query
+    made by any of them.
+
+    Loaders that have been idle for longer than `max_idle_seconds` are closed
+    on the next checkout/checkin. Loaders whose last call failed with a
+    connection-level error are closed instead of being returned to the pool.
+
+    The shared RateController is created by `rate_controller_factory` (see
+    :func:`rate_controller_factory`) for an InstaloaderContext of its own, as
+    the loader it is first created for may be evicted long before the pool is
+    closed. `rate_state` is a RateController.get_state() snapshot restored
+    into it when it is created.
+    """
+
+    def __init__(self, max_size: int = 4, max_idle_seconds: float = 300.0,
+                 rate_controller_factory: Callable[[InstaloaderContext], RateController] = RateController,
+                 rate_state: Optional[Dict[str, Any]] = None):
+        self.max_size = max(1, max_size)
+        self.max_idle_seconds = max_idle_seconds
+        self.rate_controller_factory = rate_controller_factory
+        self.rate_state = rate_state
+        # (loader, monotonic time of checkin), oldest first
+        self._idle = []  # type: List[Tuple[Any, float]]
+        self._size = 0
+        self._cond = None  # type: Optional[asyncio.Condition]
+        self._rate_controller = None  # type: Optional[RateController]
+        # context the shared RateController logs to; not used for requests
+        self._rate_context = None  # type: Optional[InstaloaderContext]
+        # loaders are created in the threadpool, possibly several at once
+        self._rate_controller_lock = threading.Lock()
+
+    def _condition(self) -> asyncio.Condition:
+        # created lazily so it binds to the running event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    @property
+    def rate_controller(self) -> Optional[RateController]:
+        """The RateController shared by the pooled loaders, or None before the first loader is created."""
+        return self._rate_controller
+
+    def _shared_rate_controller(self, context) -> RateController:
+        # `context` belongs to the loader being created, which the pool may close while others keep using the
+        # shared RateController, so the controller is bound to a context of its own instead
+        with self._rate_controller_lock:
+            if self._rate_controller is None:
+                self._rate_context = InstaloaderContext(sleep=False, quiet=True)
+                self._rate_controller = self.rate_controller_factory(self._rate_context)
+                if self.rate_state:
+                    self._rate_controller.set_state(self.rate_state)
+                    self.rate_state = None
+            return self._rate_controller
+
+    @staticmethod
+    def _is_healthy(L) -> bool:
+        # The pool only hands out anonymous loaders.
+        return L.context is not None and not L.context.is_logged_in
+
+    def _discard(self, L):
+        self._size -= 1
+        try:
+            L.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        deadline = time.monotonic() - self.max_idle_seconds
+        while self._idle and self._idle[0][1] < deadline:
+            L, _ = self._idle.pop(0)
+            self._discard(L)
+
+    async def checkout(self):
+        """Return a warm loader from the pool, creating one if below max_size.
+
+        Waits for a checkin if the pool is exhausted."""
+        cond = self._condition()
+        async with cond:
+            while True:
+                self._evict_idle()
+                while self._idle:
+                    # most recently used first, so rarely-needed loaders age out
+                    L, _ = self._idle.pop()
+                    if self._is_healthy(L):
+                        return L
+                    self._discard(L)
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                await cond.wait()
+        try:
+            return await run_in_threadpool(make_loader, rate_controller=self._shared_rate_controller)
+        except Exception:
+            async with cond:
+                self._size -= 1
+                cond.notify()
+            raise
+
+    async def checkin(self, L, discard: bool = False):
+        """Return a loader to the pool, or close it if `discard` is set or it is unhealthy."""
+        cond = self._condition()
+        async with cond:
+            if discard or not self._is_healthy(L):
+                self._discard(L)
+            else:
+                # don't let the error log of a long-lived loader grow unbounded
+                L.context.error_log.clear()
+                self._idle.append((L, time.monotonic()))
+            self._evict_idle()
+            cond.notify()
+
+    @staticmethod
+    def _discards(err: BaseException) -> bool:
+        # whether a call failing with `err` leaves the loader unfit for reuse
+        return (isinstance(err, (AbortDownloadException, ConnectionException)) and
+                not isinstance(err, QueryReturnedNotFoundException))
+
+    @asynccontextmanager
+    async def loader(self):
+        """Async context manager that checks a loader out and back in."""
+        L = await self.checkout()
+        discard = False
+        try:
+            yield L
+        except BaseException as err:
+            discard = self._discards(err)
+            raise
+        finally:
+            await self.checkin(L, discard)
+
+    async def close(self):
+        """Close all idle loaders and the shared RateController with its context."""
+        cond = self._condition()
+        async with cond:
+            while self._idle:
+                L, _ = self._idle.pop()
+                self._discard(L)
+        if self._rate_controller is not None:
+            await run_in_threadpool(self._rate_controller.close)
+            self._rate_controller = None
+        if self._rate_context is not None:
+            self._rate_context.close()
+            self._rate_context = None
+
+
+class _AccountRateController(RateController):
+    """RateController of a pooled logged-in loader.
+
+    A 429 response ends the call instead of sleeping until the account may
+    query again, so the account can be quarantined and the request served by
+    another account."""
+
+    def handle_429(self, query_type: str) -> None:
+        raise TooManyRequestsException("429 Too Many Requests for query type {}".format(query_type))
+
+
+class _Account:
+    def __init__(self, loader):
+        self.loader = loader
+        self.username = loader.context.username  # type: str
+        self.inflight = 0
+        # monotonic time until which the account is not used; None while healthy
+        self.quarantined_until = None  # type: Optional[float]
+        self.quarantine_reason = None  # type: Optional[str]
+
+    def is_quarantined(self, current_time: float) -> bool:
+        return self.quarantined_until is not None and self.quarantined_until > current_time
+
+
+class AccountPool:
+    """Logged-in loaders, one per Instagram account, sharing the load of authenticated requests.
+
+    Each account keeps its own session and RateController. A call goes to the
+    account with the most rate limit headroom: the shortest RateController
+    wait, then the fewest calls in flight, then the fewest recent queries.
+
+    An account that gets a 429 is quarantined for `quarantine_seconds`; one
+    that hits a checkpoint/challenge or is redirected to the login page is
+    quarantined until it is logged in again. The call is then retried on the
+    next account.
+    """
+
+    def __init__(self, quarantine_seconds: float = 1800.0):
+        self.quarantine_seconds = quarantine_seconds
+        self._accounts = OrderedDict()  # type: OrderedDict[str, _Account]
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def __contains__(self, username: str) -> bool:
+        return username.lower() in self._accounts
+
+    @property
+    def usernames(self) -> List[str]:
+        return [account.username for account in self._accounts.values()]
+
+    @property
+    def rate_controllers(self) -> Dict[str, RateController]:
+        """RateController of each account, by lower-case username."""
+        # pylint:disable=protected-access
+        return {key: account.loader.context._rate_controller for key, account in self._accounts.items()}
+
+    @property
+    def primary(self):
+        """Loader of the most recently added account, or None."""
+        if not self._accounts:
+            return None
+        return next(reversed(self._accounts.values())).loader
+
+    def add(self, L):
+        """Add a logged-in loader, returning the loader it replaces for the same account (or None)."""
+        account = _Account(L)
+        old = self._accounts.pop(account.username.lower(), None)
+        self._accounts[account.username.lower()] = account
+        return old.loader if old is not None else None
+
+    def remove_all(self) -> List[Any]:
+        """Remove all accounts and return their loaders."""
+        loaders = [account.loader for account in self._accounts.values()]
+        self._accounts.clear()
+        return loaders
+
+    def quarantine(self, username: str, seconds: Optional[float], reason: str) -> None:
+        """Take an account out of rotation for `seconds`, or until it is re-added if `seconds` is None."""
+        account = self._accounts.get(username.lower())
+        if account is None:
+            return
+        account.quarantined_until = time.monotonic() + seconds if seconds is not None else float('inf')
+        account.quarantine_reason = reason
+
+    def status(self) -> List[Dict[str, Any]]:
+        current_time = time.monotonic()
+        result = []
+        for account in self._accounts.values():
+            quarantined = account.is_quarantined(current_time)
+            result.append({
+                'username': account.username,
+                'inflight': account.inflight,
+                'quarantined': quarantined,
+                'quarantine_reason': account.quarantine_reason if quarantined else None,
+                'quarantined_seconds_left': (None if not quarantined or account.quarantined_until == float('inf')
+                                             else round(account.quarantined_until - current_time)),
+            })
+        return result
+
+    async def _pick(self) -> _Account:
+        if not self._accounts:
+            raise RuntimeError('server not logged in')
+        current_time = time.monotonic()
+        candidates = [account for account in self._accounts.values() if not account.is_quarantined(current_time)]
+        if not candidates:
+            raise TooManyRequestsException('all logged-in accounts are quarantined')
+        if len(candidates) == 1:
+            return candidates[0]
+
+        def _headroom() -> List[Tuple[float, int]]:
+            # pylint:disable=protected-access
+            return [(rate_budget_waittime(account.loader.context._rate_controller),
+                     recent_query_count(account.loader.context._rate_controller)) for account in candidates]
+
+        # the RateControllers may have to read their database
+        headroom = await run_in_threadpool(_headroom)
+        return min(zip(candidates, headroom),
+                   key=lambda pair: (pair[1][0], pair[0].inflight, pair[1][1]))[0]
+
+    async def call(self, fn: Callable[..., Any], *args) -> Any:
+        """Run the blocking ``fn(loader, *args)`` in the threadpool on the account with the most headroom.
+
+        :raises RuntimeError: If no account is logged in.
+        :raises TooManyRequestsException: If every account is quarantined."""
+        while True:
+            account = await self._pick()
+            account.inflight += 1
+            try:
+                return await run_in_threadpool(fn, account.loader, *args)
+            except TooManyRequestsException:
+                self.quarantine(account.username, self.quarantine_seconds, '429 Too Many Requests')
+            except (LoginRequiredException, AbortDownloadException) as err:
+                self.quarantine(account.username, None, str(err) or type(err).__name__)
+            finally:
+                account.inflight -= 1
 
 
 class InstagramService:
-    """Service that manages an Instaloader instance and exposes async methods.
+    """Service that manages Instaloader instances and exposes async methods.
 
-    The service keeps an optional in-memory shared loader (`self.loader`) which
-    is useful for endpoints that require a logged-in session (stories).
+    Logged-in loaders, one per account, are kept in `self.accounts` and used
+    for endpoints that require a session (stories). Anonymous endpoints borrow
+    loaders from `self.pool`, and profile/post metadata is served from
+    `self.cache` when fresh.
     """
 
     def __init__(self):
-        self.loader = None  # type: Optional[Any]
         self.pending_2fa = None
         self.session = None
+        settings = get_settings()
+        self.accounts = AccountPool(quarantine_seconds=settings.ACCOUNT_QUARANTINE_SECONDS)
+        # RateController histories of the previous run, by lower-case username ('' for the anonymous pool);
+        # each is restored once, when its RateController is in use again
+        self.rate_state_file = settings.RATE_CONTROLLER_STATE_FILE
+        self.rate_state_save_seconds = settings.RATE_CONTROLLER_STATE_SAVE_SECONDS
+        self._rate_states = self._read_rate_states()
+        self._rate_state_task = None  # type: Optional[asyncio.Task]
+        self.pool = LoaderPool(max_size=settings.LOADER_POOL_SIZE,
+                               max_idle_seconds=settings.LOADER_POOL_MAX_IDLE_SECONDS,
+                               rate_controller_factory=rate_controller_factory(
+                                   sqlite_path=settings.RATE_CONTROLLER_SQLITE_PATH,
+                                   adaptive=settings.RATE_CONTROLLER_ADAPTIVE),
+                               rate_state=self._rate_states.pop('', None))
+        self._account_rate_controller = rate_controller_factory(_AccountRateController,
+                                                                sqlite_path=settings.RATE_CONTROLLER_SQLITE_PATH,
+                                                                adaptive=settings.RATE_CONTROLLER_ADAPTIVE)
+        backend = None
+        if settings.RESPONSE_CACHE_SQLITE_PATH:
+            backend = SQLiteCacheBackend(settings.RESPONSE_CACHE_SQLITE_PATH)
+        self.cache = ResponseCache(ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+                                   max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+                                   max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+                                   backend=backend)
+        # resolved media URLs of posts, so range requests don't re-resolve the post
+        self.media_urls = ResponseCache(ttl=settings.MEDIA_URL_CACHE_TTL_SECONDS)
+        # resolved story items per user of the logged-in session
+        self.stories = ResponseCache(ttl=settings.STORY_CACHE_TTL_SECONDS)
+        self.batch_concurrency = max(1, settings.BATCH_CONCURRENCY)
+        # async transport for CDN media transfers, created on first use
+        self._media_context = None  # type: Optional[Any]
+        # anonymous loader outside the pool whose CDN session carries media transfers if httpx is not installed,
+        # created on first use
+        self._media_loader = None  # type: Optional[Any]
+
+    @property
+    def loader(self):
+        """Loader of the most recently logged-in account, or None."""
+        return self.accounts.primary
 
     async def _make_loader(self):
         # make_loader is a small, quick call but may do I/O in some configs
-        return await run_in_threadpool(make_loader)
+        return await run_in_threadpool(make_loader, rate_controller=self._account_rate_controller)
+
+    def _read_rate_states(self) -> Dict[str, Any]:
+        if not self.rate_state_file:
+            return {}
+        try:
+            with open(self.rate_state_file, 'r', encoding='utf8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_rate_state(self) -> None:
+        """Write the RateController histories of the pool and all accounts to RATE_CONTROLLER_STATE_FILE.
+
+        Blocking; states of accounts that have not been used since the restart are kept."""
+        if not self.rate_state_file:
+            return
+        states = dict(self._rate_states)
+        if self.pool.rate_controller is not None:
+            states[''] = self.pool.rate_controller.get_state()
+        for key, rate_controller in self.accounts.rate_controllers.items():
+            states[key] = rate_controller.get_state()
+        with open(self.rate_state_file + '.temp', 'w', encoding='utf8') as f:
+            json.dump(states, f)
+        os.replace(self.rate_state_file + '.temp', self.rate_state_file)
+
+    async def _save_rate_state_periodically(self):
+        while True:
+            await asyncio.sleep(self.rate_state_save_seconds)
+            try:
+                await run_in_threadpool(self.save_rate_state)
+            except Exception as err:
+                logger.warning('saving rate controller state failed: %s', err)
+
+    def start_rate_state_snapshots(self) -> None:
+        """Save the RateController histories every RATE_CONTROLLER_STATE_SAVE_SECONDS until :meth:`close`."""
+        if self.rate_state_file and self._rate_state_task is None:
+            self._rate_state_task = asyncio.create_task(self._save_rate_state_periodically())
+
+    async def _add_account(self, L):
+        replaced = self.accounts.add(L)
+        self.stories.clear()
+        # pylint:disable=protected-access
+        states = [self._rate_states.pop(L.context.username.lower(), None)]
+        if replaced is not None:
+            states.append(replaced.context._rate_controller.get_state())
+        for state in states:
+            if state:
+                L.context._rate_controller.set_state(state)
+        if replaced is not None:
+            try:
+                await run_in_threadpool(close_account_loader, replaced)
+            except Exception:
+                pass
+        try:
+            self.session = await run_in_threadpool(L.save_session)
+        except Exception:
+            self.session = None
 
     async def load_saved_session_if_any(self) -> Optional[str]:
-        """Scan for session-<username> files and load the first working one.
+        """Load all saved sessions (see :meth:`load_saved_sessions`) and return the first username, if any."""
+        usernames = await self.load_saved_sessions()
+        return usernames[0] if usernames else None
+
+    async def load_saved_sessions(self) -> List[str]:
+        """Scan for session-<username> files and load every working one into `self.accounts`.
 
         Preference order:
           1. Directory specified by SESSION_OUTPUT_DIR env var
           2. Project-local ./sessions directory
           3. Legacy ~/.config/instaloader (fallback)
 
-        Returns username if loaded, else None.
+        Sessions of accounts that are already logged in are skipped. Returns
+        the usernames loaded.
         """
         candidate = os.environ.get('SESSION_OUTPUT_DIR') or os.path.join(os.getcwd(), 'sessions')
         if os.path.isdir(candidate):
@@ -60,31 +540,31 @@ class InstagramService:
             elif win_legacy and os.path.isdir(win_legacy):
                 session_dir = win_legacy
             else:
-                return None
-        for fn in os.listdir(session_dir):
+                return []
+        loaded = []
+        for fn in sorted(os.listdir(session_dir)):
             if not fn.startswith('session-'):
                 continue
             username = fn[len('session-'):]
+            if username in self.accounts:
+                continue
             sessionfile = os.path.join(session_dir, fn)
             try:
                 L = await self._make_loader()
                 # load_session_from_file is blocking; run in thread
                 await run_in_threadpool(L.load_session_from_file, username, sessionfile)
                 if L.context.is_logged_in:
-                    self.loader = L
-                    try:
-                        self.session = await run_in_threadpool(L.save_session)
-                    except Exception:
-                        self.session = None
-                    return username
-                await run_in_threadpool(L.close)
+                    await self._add_account(L)
+                    loaded.append(username)
+                    continue
+                await run_in_threadpool(close_account_loader, L)
             except Exception:
                 try:
-                    await run_in_threadpool(L.close)
+                    await run_in_threadpool(close_account_loader, L)
                 except Exception:
                     pass
                 continue
-        return None
+        return loaded
 
     # DB persistence is intentionally not handled here. A background worker
     # should be responsible for persisting sessions into a database.
@@ -105,18 +585,13 @@ class InstagramService:
         except Exception:
             # ensure loader closed on failure
             try:
-                await run_in_threadpool(L.close)
+                await run_in_threadpool(close_account_loader, L)
             except Exception:
                 pass
             raise
 
-        # success -> store loader
-        self.loader = L
-        try:
-            self.session = await run_in_threadpool(L.save_session)
-        except Exception:
-            self.session = None
-
+        # success -> add the account to the pool
+        await self._add_account(L)
         return self.session
 
     async def two_factor(self, code: str):
@@ -128,82 +603,217 @@ class InstagramService:
         except BadCredentialsException:
             raise
         # success
-        self.loader = L
-        try:
-            self.session = await run_in_threadpool(L.save_session)
-        except Exception:
-            self.session = None
+        await self._add_account(L)
         self.pending_2fa = None
         return self.session
 
     def is_logged_in(self) -> bool:
-        return bool(self.loader and getattr(self.loader.context, 'is_logged_in', False))
+        return len(self.accounts) > 0
 
     def get_username(self) -> Optional[str]:
         if not self.loader:
             return None
         return getattr(self.loader.context, 'username', None)
 
+    def get_accounts(self) -> List[dict]:
+        """Status of all logged-in accounts, including quarantine state."""
+        return self.accounts.status()
+
     async def logout(self):
-        if not self.loader:
+        """Log out all accounts."""
+        if not self.accounts:
             raise RuntimeError('not logged in')
+        for key, rate_controller in self.accounts.rate_controllers.items():
+            # restored if the account logs in again
+            self._rate_states[key] = rate_controller.get_state()
         try:
-            await run_in_threadpool(self.loader.close)
-        finally:
-            self.loader = None
-            self.session = None
-            self.pending_2fa = None
+            await run_in_threadpool(self.save_rate_state)
+        except Exception:
+            pass
+        loaders = self.accounts.remove_all()
+        self.session = None
+        self.stories.clear()
+        self.pending_2fa = None
+        for L in loaders:
+            try:
+                await run_in_threadpool(close_account_loader, L)
+            except Exception:
+                pass
 
-    # Read-only helpers
-    async def get_profile(self, username: str):
-        # use a transient loader (no login needed for public profiles)
-        L = await self._make_loader()
+    async def close(self):
+        if self._rate_state_task is not None:
+            self._rate_state_task.cancel()
+            self._rate_state_task = None
         try:
+            await run_in_threadpool(self.save_rate_state)
+        except Exception as err:
+            logger.warning('saving rate controller state failed: %s', err)
+        await self.pool.close()
+        for L in self.accounts.remove_all():
+            try:
+                await run_in_threadpool(close_account_loader, L)
+            except Exception:
+                pass
+        self.cache.close()
+        if self._media_context is not None:
+            await self._media_context.aclose()
+            # the synchronous context the async one takes its state from
+            await run_in_threadpool(self._media_context.context.close)
+            self._media_context = None
+        if self._media_loader is not None:
+            await run_in_threadpool(self._media_loader.close)
+            self._media_loader = None
+
+    async def _open_media(self, url: str, request_headers: Optional[dict] = None) -> MediaStream:
+        """Open a CDN media URL for streaming.
+
+        Uses the httpx-based AsyncInstaloaderContext when available, so the
+        transfer is driven by the event loop; otherwise the body is read in
+        the threadpool from the CDN session of a loader kept for media
+        transfers. Either way no pooled loader is held while the body is
+        transferred, so slow media clients do not hold up metadata requests.
+        The returned MediaStream's chunks are async, and its `aclose` releases
+        the upstream response."""
+        if AsyncInstaloaderContext is not None:
+            if self._media_context is None:
+                self._media_context = AsyncInstaloaderContext(InstaloaderContext(sleep=False, quiet=True))
+            return await open_media_async(self._media_context, url, request_headers)
+        if self._media_loader is None:
+            self._media_loader = make_loader()
+        media = await run_in_threadpool(open_media, self._media_loader, url, request_headers)
+        return media._replace(chunks=iterate_in_threadpool(media.chunks),
+                              release=partial(run_in_threadpool, media.release))
+
+    # Read-only helpers
+    async def _fetch_profile(self, username: str):
+        # use a pooled anonymous loader (no login needed for public profiles)
+        async with self.pool.loader() as L:
             return await run_in_threadpool(get_profile_json, L, username)
-        finally:
-            await run_in_threadpool(L.close)
 
-    async def get_post(self, shortcode: str):
-        L = await self._make_loader()
-        try:
+    async def _fetch_post(self, shortcode: str):
+        async with self.pool.loader() as L:
             return await run_in_threadpool(get_post_json, L, shortcode)
-        finally:
-            await run_in_threadpool(L.close)
 
-    async def get_post_media(self, shortcode: str) -> List[dict]:
-        L = await self._make_loader()
-        try:
-            return await run_in_threadpool(get_post_media, L, shortcode)
-        finally:
-            await run_in_threadpool(L.close)
+    async def get_profile(self, username: str):
+        return await self.cache.get_or_fetch('profile:' + username.lower(),
+                                             lambda: self._fetch_profile(username))
 
-    async def get_post_media_bytes(self, shortcode: str, index: int = 1) -> Tuple[bytes, str]:
-        """Return (bytes, mime) for a particular media index (1-based) of a post.
+    async def get_post(self, shortcode: str):
+        return await self.cache.get_or_fetch('post:' + shortcode,
+                                             lambda: self._fetch_post(shortcode))
+
+    async def refresh_profile(self, username: str):
+        """Fetch a profile upstream and replace its cache entry, regardless of its age."""
+        data = await self._fetch_profile(username)
+        await self.cache.put('profile:' + username.lower(), data)
+        return data
+
+    async def refresh_post(self, shortcode: str):
+        """Fetch a post upstream and replace its cache entry, regardless of its age."""
+        data = await self._fetch_post(shortcode)
+        await self.cache.put('post:' + shortcode, data)
+        return data
+
+    async def _iter_batch(self, keys: List[str], fetch: Callable[[str], Awaitable[Any]],
+                          key_name: str) -> AsyncIterator[dict]:
+        """Fetch many keys concurrently and yield one result dict per unique key as it completes.
+
+        At most `batch_concurrency` fetches are in flight; each still goes
+        through the cache and the pooled loaders, i.e. the shared
+        RateController. Failures are reported per item instead of aborting the
+        batch."""
+        pending = deque(dict.fromkeys(keys))
+        total = len(pending)
+        results = asyncio.Queue()  # type: asyncio.Queue
+
+        async def _worker():
+            while pending:
+                key = pending.popleft()
+                try:
+                    results.put_nowait({key_name: key, 'data': await fetch(key)})
+                except Exception as err:
+                    results.put_nowait({key_name: key, 'error': str(err)})
 
-        This helper fetches the media list (in threadpool) and then executes the
-        media getter callback in the threadpool as well so callers get bytes
-        directly without dealing with callables.
+        workers = [asyncio.ensure_future(_worker()) for _ in range(min(self.batch_concurrency, total))]
+        try:
+            for _ in range(total):
+                yield await results.get()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    def iter_profiles(self, usernames: List[str]) -> AsyncIterator[dict]:
+        return self._iter_batch([u.lower() for u in usernames], self.get_profile, 'username')
+
+    def iter_posts(self, shortcodes: List[str]) -> AsyncIterator[dict]:
+        return self._iter_batch(shortcodes, self.get_post, 'shortcode')
+
+    async def _get_post_media_urls(self, shortcode: str) -> List[dict]:
+        async def _fetch():
+            async with self.pool.loader() as L:
+                items = await run_in_threadpool(get_post_media, L, shortcode)
+            return [{k: v for k, v in item.items() if k != 'open_stream'} for item in items]
+        return await self.media_urls.get_or_fetch('media:' + shortcode, _fetch)
+
+    async def open_post_media(self, shortcode: str, index: int = 1,
+                              request_headers: Optional[dict] = None) -> MediaStream:
+        """Open a particular media index (1-based) of a post for streaming.
+
+        The post's media URLs are resolved once and cached, so subsequent (range)
+        requests for the same post go straight to the CDN. `request_headers`
+        such as ``Range`` are forwarded upstream. Only the response headers are
+        read here; the body is consumed lazily through the returned
+        MediaStream's chunk iterator.
         """
-        items = await self.get_post_media(shortcode)
+        try:
+            return await self._open_post_media_url(shortcode, index, request_headers)
+        except QueryReturnedForbiddenException:
+            # signature of the cached CDN URL has probably expired; resolve again
+            await self.media_urls.invalidate('media:' + shortcode)
+            return await self._open_post_media_url(shortcode, index, request_headers)
+
+    async def _open_post_media_url(self, shortcode: str, index: int,
+                                   request_headers: Optional[dict]) -> MediaStream:
+        items = await self._get_post_media_urls(shortcode)
         if index < 1 or index > len(items):
             raise IndexError('media index out of range')
-        item = items[index - 1]
-        getter = item.get('get_bytes')
-        if not getter:
-            raise RuntimeError('no getter for media')
-        # getter is a sync callable — run in threadpool
-        return await run_in_threadpool(getter)
-
-    async def get_stories_for_user(self, username: str):
-        # requires logged-in loader
-        if not self.loader or not getattr(self.loader.context, 'is_logged_in', False):
-            raise RuntimeError('server not logged in')
-        return await run_in_threadpool(get_stories_for_user, self.loader, username)
+        return await self._open_media(items[index - 1]['url'], request_headers)
+
+    async def get_profile_picture(self, username: str) -> MediaStream:
+        async with self.pool.loader() as L:
+            url = await run_in_threadpool(get_profile_picture_url, L, username)
+        return await self._open_media(url)
+
+    @staticmethod
+    def _stories_expiry(items: List[dict]) -> Optional[float]:
+        # the index of an item shifts as soon as the first item expires
+        if not items:
+            return None
+        return min(datetime.fromisoformat(item['expiring']).replace(tzinfo=timezone.utc).timestamp()
+                   for item in items)
 
-    async def get_story_media(self, username: str, index: int = 1) -> Tuple[bytes, str]:
-        if not self.loader or not getattr(self.loader.context, 'is_logged_in', False):
+    async def get_stories_for_user(self, username: str) -> List[dict]:
+        """Return the story items of a user, resolved once and cached until the first item expires."""
+        # requires a logged-in account
+        if not self.accounts:
             raise RuntimeError('server not logged in')
-        return await run_in_threadpool(get_story_media, self.loader, username, index)
+
+        async def _fetch():
+            items = await self.accounts.call(get_stories_for_user, username)
+            return [{k: v for k, v in item.items() if k != 'open_stream'} for item in items]
+        return await self.stories.get_or_fetch('stories:' + username.lower(), _fetch,
+                                               expires_at=self._stories_expiry)
+
+    async def invalidate_stories(self, username: str) -> None:
+        """Force the next story request for `username` to fetch the reel again."""
+        await self.stories.invalidate('stories:' + username.lower())
+
+    async def get_story_media(self, username: str, index: int = 1,
+                              request_headers: Optional[dict] = None) -> MediaStream:
+        items = await self.get_stories_for_user(username)
+        if index < 1 or index > len(items):
+            raise IndexError('story index out of range')
+        return await self._open_media(items[index - 1]['url'], request_headers)
 
 
 _global_service: Optional[InstagramService] = None
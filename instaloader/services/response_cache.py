@@ -0,0 +1,230 @@
+"""TTL + LRU response cache used by InstagramService.
+
+Cached values are the JSON-serializable dicts returned by the read-only
+service helpers (profile/post metadata). The in-process layer is an LRU that
+is bounded both by entry count and by the approximate serialized size of the
+entries. Concurrent misses for the same key are collapsed into a single
+upstream fetch (single-flight).
+
+An optional backend (e.g. :class:`SQLiteCacheBackend`) is consulted on a
+memory miss and written through on every store, so a restarted process does
+not start with a cold cache.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+
+class CacheBackend:
+    """Interface for a persistent second-level cache store.
+
+    Methods are blocking; :class:`ResponseCache` calls them in the threadpool.
+    Expiry times are UNIX timestamps."""
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, expires_at) or None."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache backend storing JSON-encoded values in an on-disk SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS response_cache '
+                               '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            self._conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires_at FROM response_cache WHERE key = ?',
+                                     (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        encoded = json.dumps(value)
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                               (key, encoded, expires_at))
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_MISS = object()
+
+
+class ResponseCache:
+    """In-process TTL + LRU cache with single-flight miss deduplication.
+
+    :param ttl: Time to live of an entry in seconds. ``0`` disables caching.
+    :param max_entries: Maximum number of entries kept in memory.
+    :param max_bytes: Maximum accumulated JSON size of the entries kept in memory.
+    :param backend: Optional persistent :class:`CacheBackend`.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        # key -> (value, size, expires_at); least recently used first
+        self._entries = OrderedDict()  # type: OrderedDict[str, Tuple[Any, int, float]]
+        self._bytes = 0
+        self._inflight = {}  # type: Dict[str, asyncio.Future]
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _get_memory(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISS
+        value, _, expires_at = entry
+        if expires_at <= time.time():
+            self._remove_memory(key)
+            return _MISS
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove_memory(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _put_memory(self, key: str, value: Any, expires_at: float) -> None:
+        size = len(json.dumps(value))
+        self._remove_memory(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, expires_at)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    async def _load_backend(self, key: str) -> Any:
+        if self.backend is None:
+            return _MISS
+        try:
+            hit = await run_in_threadpool(self.backend.get, key)
+        except Exception:
+            return _MISS
+        if hit is None:
+            return _MISS
+        value, expires_at = hit
+        if expires_at <= time.time():
+            return _MISS
+        self._put_memory(key, value, expires_at)
+        return value
+
+    async def put(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        """Store a value, replacing any existing entry.
+
+        :param expires_at: UNIX timestamp after which the entry must not be served anymore. The entry never
+           lives longer than the cache's TTL."""
+        if not self.enabled:
+            return
+        expires_at = min(time.time() + self.ttl, expires_at) if expires_at is not None else time.time() + self.ttl
+        self._put_memory(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                await run_in_threadpool(self.backend.set, key, value, expires_at)
+            except Exception:
+                pass
+
+    async def invalidate(self, key: str) -> None:
+        """Drop a key from memory and from the backend."""
+        self._remove_memory(key)
+        if self.backend is not None:
+            try:
+                await run_in_threadpool(self.backend.delete, key)
+            except Exception:
+                pass
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        self._entries.clear()
+        self._bytes = 0
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]],
+                           expires_at: Optional[Callable[[Any], Optional[float]]] = None) -> Any:
+        """Return the cached value for `key`, calling `fetch` on a miss.
+
+        Concurrent callers missing the same key wait for the one fetch that is
+        already in flight instead of issuing their own.
+
+        :param expires_at: Optional callback returning the expiry time of a fetched value, see :meth:`put`."""
+        if not self.enabled:
+            return await fetch()
+        while True:
+            value = self._get_memory(key)
+            if value is not _MISS:
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # the fetching request went away; try again ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load_backend(key)
+            if value is _MISS:
+                value = await fetch()
+                await self.put(key, value, expires_at(value) if expires_at is not None else None)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as err:
+            future.set_exception(err)
+            # mark as retrieved; there may be no waiters
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
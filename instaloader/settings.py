@@ -47,6 +47,22 @@ if _HAS_BASESETTINGS:
         WORKER_TARGETS: str = ""          # e.g. "acct1,acct2,post:ABC"
         SUPERMARKET_TARGETS: str = ""     # e.g. "store_account1,store_account2"
 
+        LOADER_POOL_SIZE: int = 4
+        LOADER_POOL_MAX_IDLE_SECONDS: float = 300.0
+
+        RESPONSE_CACHE_TTL_SECONDS: float = 300.0   # 0 disables the cache
+        RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+        RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+        RESPONSE_CACHE_SQLITE_PATH: str = ""      # e.g. "cache.sqlite3"
+        MEDIA_URL_CACHE_TTL_SECONDS: float = 600.0
+        STORY_CACHE_TTL_SECONDS: float = 300.0
+        BATCH_CONCURRENCY: int = 4
+        ACCOUNT_QUARANTINE_SECONDS: float = 1800.0   # after a 429 on a logged-in account
+        RATE_CONTROLLER_SQLITE_PATH: str = ""     # shared by all processes using it, e.g. "rate.sqlite3"
+        RATE_CONTROLLER_STATE_FILE: str = ""      # request history kept across restarts, e.g. "rate-state.json"
+        RATE_CONTROLLER_STATE_SAVE_SECONDS: float = 60.0
+        RATE_CONTROLLER_ADAPTIVE: bool = False    # learn rate limits from 429 responses (AIMD)
+
         class Config:
             env_file = None
             env_file_encoding = "utf-8"
@@ -57,6 +73,20 @@ else:
             self.WORKER_INTERVAL_SECONDS = int(os.getenv('WORKER_INTERVAL_SECONDS', '3600'))
             self.WORKER_TARGETS = os.getenv('WORKER_TARGETS', '')
             self.SUPERMARKET_TARGETS = os.getenv('SUPERMARKET_TARGETS', '')
+            self.LOADER_POOL_SIZE = int(os.getenv('LOADER_POOL_SIZE', '4'))
+            self.LOADER_POOL_MAX_IDLE_SECONDS = float(os.getenv('LOADER_POOL_MAX_IDLE_SECONDS', '300'))
+            self.RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '300'))
+            self.RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+            self.RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+            self.RESPONSE_CACHE_SQLITE_PATH = os.getenv('RESPONSE_CACHE_SQLITE_PATH', '')
+            self.MEDIA_URL_CACHE_TTL_SECONDS = float(os.getenv('MEDIA_URL_CACHE_TTL_SECONDS', '600'))
+            self.STORY_CACHE_TTL_SECONDS = float(os.getenv('STORY_CACHE_TTL_SECONDS', '300'))
+            self.BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+            self.ACCOUNT_QUARANTINE_SECONDS = float(os.getenv('ACCOUNT_QUARANTINE_SECONDS', '1800'))
+            self.RATE_CONTROLLER_SQLITE_PATH = os.getenv('RATE_CONTROLLER_SQLITE_PATH', '')
+            self.RATE_CONTROLLER_STATE_FILE = os.getenv('RATE_CONTROLLER_STATE_FILE', '')
+            self.RATE_CONTROLLER_STATE_SAVE_SECONDS = float(os.getenv('RATE_CONTROLLER_STATE_SAVE_SECONDS', '60'))
+            self.RATE_CONTROLLER_ADAPTIVE = os.getenv('RATE_CONTROLLER_ADAPTIVE', '').lower() in ('1', 'true', 'yes')
 
 def load_settings_from_optional_file(path_env: str = "CONFIG_FILE") -> Settings:
     cfg_file = os.getenv(path_env, "")
@@ -64,6 +94,7 @@ def load_settings_from_optional_file(path_env: str = "CONFIG_FILE") -> Settings:
         with open(cfg_file, "r", encoding="utf8") as f:
             data = json.load(f) 
         return Settings(**data)
+    return Settings()
 
 _settings: Optional[Settings] = None
 def get_settings() -> Settings:
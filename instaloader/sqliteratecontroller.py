@@ -0,0 +1,137 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from .instaloadercontext import InstaloaderContext, RateController
+
+
+class SQLiteRateController(RateController):
+    """
+    :class:`RateController` whose request history is kept in a SQLite database, so that several processes on the
+    same host draw from one rate limit budget::
+
+       import instaloader
+
+       L = instaloader.Instaloader(rate_controller=lambda ctx: instaloader.SQLiteRateController(ctx, 'rate.sqlite3'))
+
+    The database is opened in WAL mode. Each query's wait time is computed and the query recorded within one
+    ``BEGIN IMMEDIATE`` transaction, which serializes concurrent processes; after sleeping, the wait time is computed
+    anew in another such transaction, and the query only recorded once it is zero. Requests are accounted per account,
+    which defaults to the username of the context at the time of the query (anonymous processes share one budget).
+    Times are stored as UNIX timestamps, as monotonic clocks of different processes are not comparable. Call
+    :meth:`close` to close the database connection when the controller is not used anymore.
+
+    :param context: The :class:`InstaloaderContext`.
+    :param path: Path of the SQLite database, created if it does not exist.
+    :param account: Name under which requests are accounted, instead of the context's username.
+
+    .. versionadded:: 4.16
+    """
+
+    def __init__(self, context: InstaloaderContext, path: str, account: Optional[str] = None):
+        super().__init__(context)
+        self.path = path
+        self._account = account
+        self._transaction_depth = 0
+        self._records_since_purge = 0
+        self._conn = sqlite3.connect(path, timeout=60.0, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS rate_queries '
+                               '(account TEXT NOT NULL, query_type TEXT NOT NULL, graphql INTEGER NOT NULL, '
+                               'ts REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS rate_queries_type '
+                               'ON rate_queries (account, query_type, ts)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS rate_queries_graphql '
+                               'ON rate_queries (account, graphql, ts)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS rate_queries_ts ON rate_queries (ts)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS rate_state '
+                               '(account TEXT PRIMARY KEY, earliest_next_request_time REAL NOT NULL, '
+                               'iphone_earliest_next_request_time REAL NOT NULL)')
+
+    @property
+    def account(self) -> str:
+        """Name under which requests are accounted."""
+        if self._account is not None:
+            return self._account
+        return self._context.username or ''
+
+    @staticmethod
+    def _clock_offset() -> float:
+        # wall-clock time minus monotonic time, to convert between stored and in-memory timestamps
+        return time.time() - time.monotonic()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self._lock:
+            if self._transaction_depth > 0:
+                self._transaction_depth += 1
+                try:
+                    yield
+                finally:
+                    self._transaction_depth -= 1
+                return
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._transaction_depth = 1
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            else:
+                self._conn.execute('COMMIT')
+            finally:
+                self._transaction_depth = 0
+
+    def _load(self, query_type: str) -> None:
+        """Replace the in-memory history relevant for `query_type` with the one of the database."""
+        offset = self._clock_offset()
+        since = time.time() - 60 * 60
+        account = self.account
+        self._query_timestamps[query_type] = [
+            ts - offset for ts, in self._conn.execute('SELECT ts FROM rate_queries WHERE account = ? AND '
+                                                      'query_type = ? AND ts > ? ORDER BY ts',
+                                                      (account, query_type, since))]
+        self._graphql_timestamps = [
+            ts - offset for ts, in self._conn.execute('SELECT ts FROM rate_queries WHERE account = ? AND '
+                                                      'graphql = 1 AND ts > ? ORDER BY ts', (account, since))]
+        state = self._conn.execute('SELECT earliest_next_request_time, iphone_earliest_next_request_time '
+                                   'FROM rate_state WHERE account = ?', (account,)).fetchone()
+        if state is not None:
+            self._earliest_next_request_time = state[0] - offset
+            self._iphone_earliest_next_request_time = state[1] - offset
+
+    def query_waittime(self, query_type: str, current_time: float, untracked_queries: bool = False) -> float:
+        with self._transaction():
+            self._load(query_type)
+            return super().query_waittime(query_type, current_time, untracked_queries)
+
+    def _record_query(self, query_type: str) -> None:
+        with self._transaction():
+            super()._record_query(query_type)
+            self._conn.execute('INSERT INTO rate_queries (account, query_type, graphql, ts) VALUES (?, ?, ?, ?)',
+                               (self.account, query_type, query_type not in ['iphone', 'other'], time.time()))
+            self._records_since_purge += 1
+            if self._records_since_purge >= 100:
+                self._conn.execute('DELETE FROM rate_queries WHERE ts <= ?', (time.time() - 60 * 60,))
+                self._records_since_purge = 0
+
+    def _reserve_query(self, query_type: str) -> float:
+        with self._transaction():
+            return super()._reserve_query(query_type)
+
+    def _after_429_waittime(self, query_type: str) -> float:
+        with self._transaction():
+            waittime = super()._after_429_waittime(query_type)
+            offset = self._clock_offset()
+            self._conn.execute('INSERT OR REPLACE INTO rate_state (account, earliest_next_request_time, '
+                               'iphone_earliest_next_request_time) VALUES (?, ?, ?)',
+                               (self.account, self._earliest_next_request_time + offset,
+                                self._iphone_earliest_next_request_time + offset))
+            return waittime
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
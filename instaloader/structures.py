@@ -1,21 +1,56 @@
-import json
+import gzip
 import lzma
 import re
+import zlib
 from base64 import b64decode, b64encode
 from contextlib import suppress
 from datetime import datetime
 from itertools import islice
 from pathlib import Path
+from types import ModuleType
 from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 from unicodedata import normalize
 
-from . import __version__
+zstandard: Optional[ModuleType]
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+from . import __version__, jsonbackend
 from .exceptions import *
 from .instaloadercontext import InstaloaderContext
 from .nodeiterator import FrozenNodeIterator, NodeIterator
 from .sectioniterator import SectionIterator
 
 
+class _PackedJSON:
+    """A JSON-compatible structure kept as compressed JSON, and decoded each time it is accessed.
+
+    Used for the ``iphone_struct`` of :class:`Post`, :class:`Profile` and :class:`StoryItem`, which makes up most of
+    their data but is rarely needed. Like the structure it holds, it is false if that is empty, so that an empty
+    ``iphone_struct`` is fetched again."""
+    __slots__ = ('_packed', '_empty')
+
+    def __init__(self, structure: Dict[str, Any]):
+        self._packed = zlib.compress(jsonbackend.dumpb(structure), 1)
+        self._empty = not structure
+
+    def __bool__(self) -> bool:
+        return not self._empty
+
+    def unpack(self) -> Dict[str, Any]:
+        return jsonbackend.loads(zlib.decompress(self._packed))
+
+
+def _split_iphone_struct(node: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[_PackedJSON]]:
+    """Return `node` without its ``iphone_struct``, and the packed ``iphone_struct``, if any."""
+    if 'iphone_struct' not in node:
+        return node, None
+    return ({key: value for key, value in node.items() if key != 'iphone_struct'},
+            _PackedJSON(node['iphone_struct']))
+
+
 class PostSidecarNode(NamedTuple):
     """Item of a Sidecar Post."""
     is_video: bool
@@ -39,7 +74,7 @@ class PostCommentAnswer(NamedTuple):
 PostCommentAnswer.id.__doc__ = "ID number of comment."
 PostCommentAnswer.created_at_utc.__doc__ = ":class:`~datetime.datetime` when comment was created (UTC)."
 PostCommentAnswer.text.__doc__ = "Comment text."
-PostCommentAnswer.owner.__doc__ = "Owner :class:`Profile` of the comment."
+PostCommentAnswer.owner.__doc__ = "Owner :class:`Profile` of the comment."  # type: ignore[misc]
 PostCommentAnswer.likes_count.__doc__ = "Number of likes on comment."
 
 
@@ -183,21 +218,24 @@ class Post:
     :param context: :attr:`Instaloader.context` used for additional queries if necessary..
     :param node: Node structure, as returned by Instagram.
     :param owner_profile: The Profile of the owner, if already known at creation.
+
+    .. versionchanged:: 4.16
+       Instances have no ``__dict__``, and an ``iphone_struct`` contained in `node` is kept compressed until needed.
     """
 
+    __slots__ = ('_context', '_node', '_owner_profile', '_full_metadata_dict', '_location', '_iphone_struct_')
+
     def __init__(self, context: InstaloaderContext, node: Dict[str, Any],
                  owner_profile: Optional['Profile'] = None):
         assert 'shortcode' in node or 'code' in node
 
         self._context = context
-        self._node = node
+        # an iphone_struct is contained if created with from_iphone_struct() or loaded from JSON with
+        # load_structure_from_file()
+        self._node, self._iphone_struct_ = _split_iphone_struct(node)
         self._owner_profile = owner_profile
         self._full_metadata_dict: Optional[Dict[str, Any]] = None
         self._location: Optional[PostLocation] = None
-        self._iphone_struct_ = None
-        if 'iphone_struct' in node:
-            # if loaded from JSON with load_structure_from_file()
-            self._iphone_struct_ = node['iphone_struct']
 
     @classmethod
     def from_shortcode(cls, context: InstaloaderContext, shortcode: str):
@@ -277,7 +315,7 @@ class Post:
         return ["GraphImage", "GraphVideo", "GraphSidecar"]
 
     def _asdict(self):
-        node = self._node
+        node = self._node.copy()
         if self._full_metadata_dict:
             node.update(self._full_metadata_dict)
         if self._owner_profile:
@@ -285,7 +323,7 @@ class Post:
         if self._location:
             node['location'] = self._location._asdict()
         if self._iphone_struct_:
-            node['iphone_struct'] = self._iphone_struct_
+            node['iphone_struct'] = self._iphone_struct_.unpack()
         return node
 
     @property
@@ -354,8 +392,8 @@ class Post:
             raise LoginRequiredException("Login required to access iPhone media info endpoint.")
         if not self._iphone_struct_:
             data = self._context.get_iphone_json(path='api/v1/media/{}/info/'.format(self.mediaid), params={})
-            self._iphone_struct_ = data['items'][0]
-        return self._iphone_struct_
+            self._iphone_struct_ = _PackedJSON(data['items'][0])
+        return self._iphone_struct_.unpack()
 
     def _field(self, *keys) -> Any:
         """Lookups given fields in _node, and if not found in _full_metadata. Raises KeyError if not found anywhere."""
@@ -486,20 +524,22 @@ class Post:
             if any(edge['node']['is_video'] and 'video_url' not in edge['node'] for edge in edges[start:(end+1)]):
                 # video_url is only present in full metadata, issue #558.
                 edges = self._full_metadata['edge_sidecar_to_children']['edges']
-            for idx, edge in enumerate(edges):
-                if start <= idx <= end:
-                    node = edge['node']
-                    is_video = node['is_video']
-                    display_url = node['display_url']
-                    if not is_video and self._context.iphone_support and self._context.is_logged_in:
-                        try:
+            # decoded once, when the first slide needs it, rather than once per slide
+            carousel_media = None
+            for idx, edge in islice(enumerate(edges), start, end + 1):
+                node = edge['node']
+                is_video = node['is_video']
+                display_url = node['display_url']
+                if not is_video and self._context.iphone_support and self._context.is_logged_in:
+                    try:
+                        if carousel_media is None:
                             carousel_media = self._iphone_struct['carousel_media']
-                            orig_url = carousel_media[idx]['image_versions2']['candidates'][0]['url']
-                            display_url = re.sub(r'([?&])se=\d+&?', r'\1', orig_url).rstrip('&')
-                        except (InstaloaderException, KeyError, IndexError) as err:
-                            self._context.error(f"Unable to fetch high quality image version of {self}: {err}")
-                    yield PostSidecarNode(is_video=is_video, display_url=display_url,
-                                          video_url=node['video_url'] if is_video else None)
+                        orig_url = carousel_media[idx]['image_versions2']['candidates'][0]['url']
+                        display_url = re.sub(r'([?&])se=\d+&?', r'\1', orig_url).rstrip('&')
+                    except (InstaloaderException, KeyError, IndexError) as err:
+                        self._context.error(f"Unable to fetch high quality image version of {self}: {err}")
+                yield PostSidecarNode(is_video=is_video, display_url=display_url,
+                                      video_url=node['video_url'] if is_video else None)
 
     @property
     def caption(self) -> Optional[str]:
@@ -887,18 +927,22 @@ class Profile:
            print(followee.username)
 
     Also, this class implements == and is hashable.
+
+    .. versionchanged:: 4.16
+       Instances have no ``__dict__``, and an ``iphone_struct`` contained in `node` is kept compressed until needed.
     """
+
+    __slots__ = ('_context', '_has_public_story', '_node', '_has_full_metadata', '_iphone_struct_')
+
     def __init__(self, context: InstaloaderContext, node: Dict[str, Any]):
         assert "username" in node
         assert "id" in node or "pk" in node
         self._context = context
         self._has_public_story: Optional[bool] = None
-        self._node = node
+        # an iphone_struct is contained if created with from_iphone_struct() or loaded from JSON with
+        # load_structure_from_file()
+        self._node, self._iphone_struct_ = _split_iphone_struct(node)
         self._has_full_metadata = False
-        self._iphone_struct_ = None
-        if 'iphone_struct' in node:
-            # if loaded from JSON with load_structure_from_file()
-            self._iphone_struct_ = node['iphone_struct']
 
     @classmethod
     def from_username(cls, context: InstaloaderContext, username: str):
@@ -977,7 +1021,7 @@ class Profile:
         json_node.pop('edge_saved_media', None)
         json_node.pop('edge_felix_video_timeline', None)
         if self._iphone_struct_:
-            json_node['iphone_struct'] = self._iphone_struct_
+            json_node['iphone_struct'] = self._iphone_struct_.unpack()
         return json_node
 
     def _obtain_metadata(self):
@@ -1071,8 +1115,8 @@ class Profile:
             raise LoginRequiredException("Login required to access iPhone profile info endpoint.")
         if not self._iphone_struct_:
             data = self._context.get_iphone_json(path='api/v1/users/{}/info/'.format(self.userid), params={})
-            self._iphone_struct_ = data['user']
-        return self._iphone_struct_
+            self._iphone_struct_ = _PackedJSON(data['user'])
+        return self._iphone_struct_.unpack()
 
     @property
     def userid(self) -> int:
@@ -1452,23 +1496,26 @@ class StoryItem:
     :param context: :class:`InstaloaderContext` instance used for additional queries if necessary.
     :param node: Dictionary containing the available information of the story item.
     :param owner_profile: :class:`Profile` instance representing the story owner.
+
+    .. versionchanged:: 4.16
+       Instances have no ``__dict__``, and an ``iphone_struct`` contained in `node` is kept compressed until needed.
     """
 
+    __slots__ = ('_context', '_node', '_owner_profile', '_iphone_struct_')
+
     def __init__(self, context: InstaloaderContext, node: Dict[str, Any], owner_profile: Optional[Profile] = None):
         self._context = context
-        self._node = node
+        # an iphone_struct is contained if added by Story.get_items() or loaded from JSON with
+        # load_structure_from_file()
+        self._node, self._iphone_struct_ = _split_iphone_struct(node)
         self._owner_profile = owner_profile
-        self._iphone_struct_ = None
-        if 'iphone_struct' in node:
-            # if loaded from JSON with load_structure_from_file()
-            self._iphone_struct_ = node['iphone_struct']
 
     def _asdict(self):
-        node = self._node
+        node = self._node.copy()
         if self._owner_profile:
             node['owner'] = self._owner_profile._asdict()
         if self._iphone_struct_:
-            node['iphone_struct'] = self._iphone_struct_
+            node['iphone_struct'] = self._iphone_struct_.unpack()
         return node
 
     @property
@@ -1518,12 +1565,10 @@ class StoryItem:
             data = self._context.get_iphone_json(
                 path='api/v1/feed/reels_media/?reel_ids={}'.format(self.owner_id), params={}
             )
-            self._iphone_struct_ = {}
-            for item in data['reels'][str(self.owner_id)]['items']:
-                if item['pk'] == self.mediaid:
-                    self._iphone_struct_ = item
-                    break
-        return self._iphone_struct_
+            # kept empty, and thus fetched again, if the story item is not found
+            self._iphone_struct_ = _PackedJSON(next((item for item in data['reels'][str(self.owner_id)]['items']
+                                                     if item['pk'] == self.mediaid), {}))
+        return self._iphone_struct_.unpack()
 
     @property
     def owner_profile(self) -> Profile:
@@ -1910,7 +1955,13 @@ class Hashtag:
 
     .. versionchanged:: 4.9
        Removed ``get_related_tags()`` and ``is_top_media_only`` as these features were removed from Instagram.
+
+    .. versionchanged:: 4.16
+       Instances have no ``__dict__``.
     """
+
+    __slots__ = ('_context', '_node', '_has_full_metadata')
+
     def __init__(self, context: InstaloaderContext, node: Dict[str, Any]):
         assert "name" in node
         self._context = context
@@ -2239,24 +2290,75 @@ def get_json_structure(structure: JsonExportable) -> dict:
     }
 
 
+# compressed formats of saved structures, by filename extension, those that are available, and the magic bytes they
+# start with
+_JSON_COMPRESSION_EXTENSIONS = ('xz', 'gz', 'zst')
+JSON_COMPRESSIONS = _JSON_COMPRESSION_EXTENSIONS if zstandard is not None else ('xz', 'gz')
+_XZ_MAGIC = b'\xfd7zXZ\x00'
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _require_zstandard() -> ModuleType:
+    if zstandard is None:
+        raise InvalidArgumentException("zstd compression requires the zstandard package, "
+                                       "install it with pip install instaloader[zstd].")
+    return zstandard
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == 'xz':
+        return lzma.compress(data, check=lzma.CHECK_NONE)
+    if compression == 'gz':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return _require_zstandard().ZstdCompressor(level=3).compress(data)
+
+
+def _decompress(data: bytes) -> bytes:
+    """Decompress `data` if it starts with the magic bytes of a format of :data:`JSON_COMPRESSIONS`."""
+    if data.startswith(_XZ_MAGIC):
+        return lzma.decompress(data)
+    if data.startswith(_GZIP_MAGIC):
+        try:
+            return gzip.decompress(data)
+        except (OSError, zlib.error) as err:
+            raise InvalidArgumentException("Corrupt gzip data: {}".format(err)) from err
+    if data.startswith(_ZSTD_MAGIC):
+        zstd = _require_zstandard()
+        try:
+            # unlike ZstdDecompressor.decompress, also handles frames without content size
+            return zstd.ZstdDecompressor().decompressobj().decompress(data)
+        except zstd.ZstdError as err:
+            raise InvalidArgumentException("Corrupt zstd data: {}".format(err)) from err
+    return data
+
+
 def save_structure_to_file(structure: JsonExportable, filename: str) -> None:
     """Saves a :class:`Post`, :class:`Profile`, :class:`StoryItem`, :class:`Hashtag` or :class:`FrozenNodeIterator` to a
-    '.json' or '.json.xz' file such that it can later be loaded by :func:`load_structure_from_file`.
+    '.json', '.json.xz', '.json.gz' or '.json.zst' file such that it can later be loaded by
+    :func:`load_structure_from_file`.
 
-    If the specified filename ends in '.xz', the file will be LZMA compressed. Otherwise, a pretty-printed JSON file
-    will be created.
+    If the specified filename ends in '.xz', '.gz' or '.zst', the file will be LZMA, gzip or zstd compressed,
+    respectively. Otherwise, a pretty-printed JSON file will be created. zstd compression requires the
+    ``zstandard`` package.
 
     :param structure: :class:`Post`, :class:`Profile`, :class:`StoryItem` or :class:`Hashtag`
-    :param filename: Filename, ends in '.json' or '.json.xz'
+    :param filename: Filename, ends in '.json', '.json.xz', '.json.gz' or '.json.zst'
+    :raises InvalidArgumentException: If the filename ends in '.zst', but ``zstandard`` is not installed.
+
+    .. versionchanged:: 4.16
+       Compressed files are encoded by the fastest installed JSON backend, see :mod:`instaloader.jsonbackend`.
+       Added gzip and zstd compression.
     """
     json_structure = get_json_structure(structure)
-    compress = filename.endswith('.xz')
-    if compress:
-        with lzma.open(filename, 'wt', check=lzma.CHECK_NONE) as fp:
-            json.dump(json_structure, fp=fp, separators=(',', ':'))
+    compression = filename.rsplit('.', 1)[-1]
+    if compression in _JSON_COMPRESSION_EXTENSIONS:
+        data = _compress(jsonbackend.dumpb(json_structure), compression)
+        with open(filename, 'wb') as fp:
+            fp.write(data)
     else:
         with open(filename, 'wt') as fp:
-            json.dump(json_structure, fp=fp, indent=4, sort_keys=True)
+            fp.write(jsonbackend.dumps(json_structure, indent=4, sort_keys=True))
 
 
 def load_structure(context: InstaloaderContext, json_structure: dict) -> JsonExportable:
@@ -2291,17 +2393,17 @@ def load_structure(context: InstaloaderContext, json_structure: dict) -> JsonExp
 
 def load_structure_from_file(context: InstaloaderContext, filename: str) -> JsonExportable:
     """Loads a :class:`Post`, :class:`Profile`, :class:`StoryItem`, :class:`Hashtag` or :class:`FrozenNodeIterator` from
-    a '.json' or '.json.xz' file that has been saved by :func:`save_structure_to_file`.
+    a file that has been saved by :func:`save_structure_to_file`.
+
+    The compression is detected by the magic bytes the file starts with, regardless of its extension.
 
     :param context: :attr:`Instaloader.context` linked to the new object, used for additional queries if necessary.
-    :param filename: Filename, ends in '.json' or '.json.xz'
+    :param filename: Filename, ends in '.json', '.json.xz', '.json.gz' or '.json.zst'
+
+    .. versionchanged:: 4.16
+       Detect LZMA, gzip and zstd compression by magic bytes.
     """
-    compressed = filename.endswith('.xz')
-    if compressed:
-        fp = lzma.open(filename, 'rt')
-    else:
-        # pylint:disable=consider-using-with
-        fp = open(filename, 'rt')
-    json_structure = json.load(fp)
-    fp.close()
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    json_structure = jsonbackend.loads(_decompress(data))
     return load_structure(context, json_structure)
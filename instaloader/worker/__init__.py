@@ -0,0 +1 @@
+"""Background workers that run alongside the API in the same event loop."""
@@ -0,0 +1,111 @@
+"""Background refresher keeping the response cache warm for configured targets.
+
+`WORKER_TARGETS` is a comma-separated list of usernames and ``post:<shortcode>``
+entries, e.g. ``"acct1,acct2,post:ABC"``. Every target is refreshed once per
+cycle. A cycle lasts `WORKER_INTERVAL_SECONDS`, but never longer than 80% of
+the response cache TTL, so a hot target is re-fetched before its entry expires
+and requests for it are always answered from the cache.
+
+The refreshes of a cycle are spread evenly over the cycle instead of being
+sent as a burst. Before each refresh the worker asks the pool's shared
+RateController how long a query would have to wait; if the budget is
+exhausted it waits that long itself, rather than occupying a pooled loader
+that interactive requests need.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from instaloader.services.instagram_service import InstagramService, get_global_service, rate_budget_waittime
+from instaloader.settings import get_settings
+
+# fraction of the cache TTL after which a target is refreshed
+CACHE_REFRESH_FRACTION = 0.8
+
+logger = logging.getLogger(__name__)
+
+
+def parse_targets(spec: str) -> List[Tuple[str, str]]:
+    """Parse a WORKER_TARGETS string into ``(kind, key)`` tuples, kind being ``'profile'`` or ``'post'``."""
+    targets = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        if entry.startswith('post:'):
+            targets.append(('post', entry[len('post:'):]))
+        else:
+            targets.append(('profile', entry))
+    return list(dict.fromkeys(targets))
+
+
+class PrefetchWorker:
+    """Periodically refreshes the cached metadata of a fixed set of targets.
+
+    :param service: Service whose cache and loader pool are used.
+    :param targets: ``(kind, key)`` tuples as returned by :func:`parse_targets`.
+    :param interval: Maximum duration of one refresh cycle in seconds.
+    """
+
+    def __init__(self, service: InstagramService, targets: List[Tuple[str, str]], interval: float):
+        self.service = service
+        self.targets = targets
+        self.interval = interval
+        if service.cache.enabled:
+            self.interval = min(self.interval, service.cache.ttl * CACHE_REFRESH_FRACTION)
+        self._stopped = asyncio.Event()
+
+    async def _sleep(self, secs: float) -> bool:
+        """Sleep, returning early (and True) if the worker has been stopped."""
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout=max(0.0, secs))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def refresh(self, kind: str, key: str) -> None:
+        if kind == 'post':
+            await self.service.refresh_post(key)
+        else:
+            await self.service.refresh_profile(key)
+
+    async def run_once(self) -> None:
+        """Refresh every target once, spreading the refreshes over one interval."""
+        spacing = self.interval / len(self.targets)
+        for kind, key in self.targets:
+            started = time.monotonic()
+            # let the rate limit budget recover instead of blocking a pooled loader
+            # blocking, as a SQLiteRateController reads its database
+            waittime = await run_in_threadpool(rate_budget_waittime, self.service.pool.rate_controller)
+            while waittime > 0:
+                if await self._sleep(waittime):
+                    return
+                waittime = await run_in_threadpool(rate_budget_waittime, self.service.pool.rate_controller)
+            try:
+                await self.refresh(kind, key)
+            except Exception as err:
+                logger.warning('refreshing %s %s failed: %s', kind, key, err)
+            if await self._sleep(spacing - (time.monotonic() - started)):
+                return
+
+    async def run_forever(self) -> None:
+        """Run refresh cycles until :meth:`stop` is called."""
+        if not self.targets:
+            return
+        while not self._stopped.is_set():
+            await self.run_once()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def from_settings(service: Optional[InstagramService] = None) -> PrefetchWorker:
+    """Create a worker for the global service from WORKER_TARGETS and WORKER_INTERVAL_SECONDS."""
+    settings = get_settings()
+    return PrefetchWorker(service or get_global_service(), parse_targets(settings.WORKER_TARGETS),
+                          float(settings.WORKER_INTERVAL_SECONDS))
@@ -5,10 +5,13 @@ Usage: python run.py
 In Docker the container runs this to bootstrap and then start uvicorn.
 """
 import asyncio
+import logging
 import os
 import shutil
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 
 async def _import_mounted_sessions():
     """If a host-mounted session directory exists (mounted into /data/session by compose), copy into user's config dir."""
@@ -30,18 +33,44 @@ async def _load_saved_session_and_run_worker():
     try:
         from instaloader.services.instagram_service import get_global_service
         svc = get_global_service()
-        # attempt to load saved session from config dir
+        # attempt to load saved sessions from config dir
         try:
-            username = await svc.load_saved_session_if_any()
-            if username:
-                print('Loaded saved session for', username)
+            usernames = await svc.load_saved_sessions()
+            if usernames:
+                print('Loaded saved sessions for', ', '.join(usernames))
         except Exception as e:
             print('no saved session loaded:', e)
     except Exception as e:
         print('warning: worker startup failed:', e)
 
 
+def _start_prefetch_worker():
+    """Start the cache refresher for WORKER_TARGETS in the current loop; returns (worker, task) or None."""
+    try:
+        from instaloader.worker import prefetch_worker
+        worker = prefetch_worker.from_settings()
+        if not worker.targets:
+            return None
+        logger.info('Starting prefetch worker for %d targets every %.0fs', len(worker.targets), worker.interval)
+        return worker, asyncio.create_task(worker.run_forever())
+    except Exception as e:
+        logger.warning('prefetch worker not started: %s', e)
+        return None
+
+
+def _configure_logging():
+    """Send log records of the library and the service to stderr, at the LOG_LEVEL setting."""
+    try:
+        from instaloader.settings import get_settings
+        level = get_settings().LOG_LEVEL
+    except Exception:
+        level = os.getenv('LOG_LEVEL', 'INFO')
+    logging.basicConfig(level=level.upper(), format='%(levelname)s %(name)s: %(message)s')
+
+
 def main():
+    _configure_logging()
+
     # Run a single asyncio loop for bootstrap and then start uvicorn within
     # the same loop to avoid mixing futures/tasks across different loops.
     async def _app_main():
@@ -67,9 +96,18 @@ def main():
         port = int(os.getenv('PORT', '8000'))
         print(f'Starting uvicorn on {host}:{port} ...')
 
+        # keep the caches of WORKER_TARGETS warm while serving
+        prefetch = _start_prefetch_worker()
+
         config = Config('instaloader.api.api_server:app', host=host, port=port, loop='asyncio')
         server = Server(config)
-        await server.serve()
+        try:
+            await server.serve()
+        finally:
+            if prefetch is not None:
+                worker, task = prefetch
+                worker.stop()
+                await task
 
     try:
         asyncio.run(_app_main())
@@ -24,6 +24,10 @@ if sys.version_info < (3, 9):
 requirements = ['requests>=2.25']
 optional_requirements = {
     'browser_cookie3': ['browser_cookie3>=0.19.1'],
+    'httpx': ['httpx>=0.23'],
+    'json': ['orjson>=3.6'],
+    'zstd': ['zstandard>=0.15'],
+    'metrics': ['prometheus_client>=0.14'],
 }
 
 keywords = (['instagram', 'instagram-scraper', 'instagram-client', 'instagram-feed', 'downloader', 'videos', 'photos',
@@ -0,0 +1,156 @@
+"""Unit Tests for the media endpoints of the web API, against a stubbed service (offline)"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+import instaloader
+
+try:
+    from fastapi.testclient import TestClient
+    from instaloader.api import MediaStream, api_server
+    from instaloader.services import instagram_service
+    from instaloader.services.instagram_service import InstagramService, get_service_dep
+except ImportError:
+    api_server = None
+
+BODY = bytes(range(256)) * 4
+ETAG = '"abc"'
+
+
+class Upstream:
+    """Stands in for the CDN response a MediaStream is read from."""
+
+    def __init__(self, body: bytes = BODY, status_code: int = 200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {'Accept-Ranges': 'bytes'}
+        self.chunks_read = 0
+        self.released = 0
+
+    def release(self):
+        self.released += 1
+
+    def media(self) -> 'MediaStream':
+        async def _chunks():
+            for start in range(0, len(self.body), 256):
+                self.chunks_read += 1
+                yield self.body[start:start + 256]
+        content_length = len(self.body) if self.status_code != 304 else None
+        return MediaStream(_chunks(), 'video/mp4', content_length, self.status_code, self.headers, self.release)
+
+
+class FakeService:
+    """Serves BODY as every post media, answering forwarded ``Range`` and ``If-None-Match`` headers like the CDN
+    does through InstaloaderContext.get_raw; records the request headers forwarded to it."""
+
+    def __init__(self):
+        self.request_headers = []
+        self.upstreams = []
+
+    def _upstream(self, request_headers) -> Upstream:
+        headers = {'Accept-Ranges': 'bytes', 'ETag': ETAG}
+        if request_headers and request_headers.get('If-None-Match') == ETAG:
+            return Upstream(b'', 304, headers)
+        if request_headers and 'Range' in request_headers:
+            first, last = request_headers['Range'][len('bytes='):].split('-')
+            if int(first) >= len(BODY):
+                raise instaloader.QueryReturnedBadRequestException("416 Range Not Satisfiable")
+            last = min(int(last), len(BODY) - 1) if last else len(BODY) - 1
+            headers['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, len(BODY))
+            return Upstream(BODY[int(first):last + 1], 206, headers)
+        return Upstream(BODY, 200, headers)
+
+    async def open_post_media(self, shortcode, index=1, request_headers=None):
+        self.request_headers.append(request_headers)
+        self.upstreams.append(self._upstream(request_headers))
+        return self.upstreams[-1].media()
+
+
+@unittest.skipIf(api_server is None, "the web API dependencies are not installed")
+class TestMediaResponse(unittest.TestCase):
+
+    def setUp(self):
+        self.service = FakeService()
+        api_server.app.dependency_overrides[get_service_dep] = lambda: self.service
+        self.addCleanup(api_server.app.dependency_overrides.clear)
+        self.client = TestClient(api_server.app)
+
+    def test_streams_body_and_releases_upstream(self):
+        response = self.client.get('/post/ABC/media/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, BODY)
+        self.assertEqual(response.headers['Content-Length'], str(len(BODY)))
+        self.assertEqual(response.headers['Content-Type'], 'video/mp4')
+        self.assertEqual(self.service.request_headers, [None])
+        self.assertEqual(self.service.upstreams[0].released, 1)
+
+    def test_range_request(self):
+        response = self.client.get('/post/ABC/media/1', headers={'Range': 'bytes=100-299', 'If-Range': ETAG})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, BODY[100:300])
+        self.assertEqual(response.headers['Content-Range'], 'bytes 100-299/{}'.format(len(BODY)))
+        self.assertEqual(response.headers['Content-Length'], '200')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.service.request_headers, [{'Range': 'bytes=100-299', 'If-Range': ETAG}])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get('/post/ABC/media/1', headers={'Range': 'bytes={}-'.format(len(BODY))})
+        self.assertEqual(response.status_code, 416)
+
+    def test_not_modified(self):
+        response = self.client.get('/post/ABC/media/1', headers={'If-None-Match': ETAG})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(response.headers['ETag'], ETAG)
+        self.assertEqual(self.service.upstreams[0].released, 1)
+
+    def test_headers_default_to_none(self):
+        media = MediaStream(iter([BODY]), 'video/mp4', len(BODY))
+        self.assertIsNone(media.headers)
+        response = asyncio.run(api_server._media_response(media))
+        self.assertEqual(response.headers['Content-Length'], str(len(BODY)))
+
+    def test_releases_upstream_if_client_goes_away_before_body(self):
+        upstream = Upstream()
+        response = asyncio.run(api_server._media_response(upstream.media()))
+
+        async def send(message):
+            raise OSError("client disconnected")
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        scope = {'type': 'http', 'asgi': {'spec_version': '2.4'}}
+        with self.assertRaises(Exception):
+            asyncio.run(response(scope, receive, send))
+        self.assertEqual(upstream.chunks_read, 0)
+        self.assertEqual(upstream.released, 1)
+
+
+@unittest.skipIf(api_server is None, "the web API dependencies are not installed")
+class TestServiceMediaTransfer(unittest.IsolatedAsyncioTestCase):
+    # pylint:disable=protected-access
+
+    async def asyncSetUp(self):
+        self.service = InstagramService()
+        self.addAsyncCleanup(self.service.close)
+
+    async def test_sync_transfer_does_not_hold_a_pooled_loader(self):
+        upstream = Upstream()
+
+        def open_media(loader, url, request_headers=None):
+            return upstream.media()._replace(chunks=iter([BODY]))
+
+        with mock.patch.object(instagram_service, 'AsyncInstaloaderContext', None), \
+                mock.patch.object(instagram_service, 'open_media', open_media):
+            media = await self.service._open_media('https://cdn.example/video.mp4')
+        self.assertEqual(self.service.pool._size, 0)
+        self.assertEqual([chunk async for chunk in media.chunks], [BODY])
+        await media.aclose()
+        self.assertEqual(upstream.released, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
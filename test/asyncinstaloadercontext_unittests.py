@@ -0,0 +1,150 @@
+"""Unit Tests for AsyncInstaloaderContext and AsyncRateController, against a mocked transport (offline)"""
+
+import asyncio
+import json
+import unittest
+import urllib.parse
+from unittest import mock
+
+import instaloader
+from instaloader import instaloadercontext
+
+try:
+    import httpx
+    from instaloader.asyncinstaloadercontext import AsyncInstaloaderContext, AsyncRateController
+except ImportError:
+    httpx = None
+
+
+class FakeTime:
+    """Stands in for the time module of instaloadercontext; time only passes when slept."""
+
+    def __init__(self, start: float = 10000.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float) -> None:
+        self.now += secs
+
+
+class RaisingRateController(instaloader.RateController):
+    def handle_429(self, query_type: str) -> None:
+        raise instaloader.TooManyRequestsException("429 for {}".format(query_type))
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncInstaloaderContext(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.responses = []
+        self.context = instaloader.InstaloaderContext(sleep=False, quiet=True, max_connection_attempts=2,
+                                                      rate_controller=RaisingRateController)
+        self.actx = AsyncInstaloaderContext(self.context)
+
+    async def asyncSetUp(self):
+        # pylint:disable=protected-access
+        await self.actx._client.aclose()
+        self.actx._client = httpx.AsyncClient(transport=httpx.MockTransport(self._handle), follow_redirects=False)
+
+    async def asyncTearDown(self):
+        await self.actx.aclose()
+        self.context.close()
+
+    def _handle(self, request):
+        self.requests.append(request)
+        return self.responses.pop(0)
+
+    def _respond(self, body, status_code=200, headers=None):
+        self.responses.append(httpx.Response(status_code, json=body, headers=headers))
+
+    def _recorded(self, query_type):
+        # pylint:disable=protected-access
+        return len(self.context._rate_controller._query_timestamps.get(query_type, []))
+
+    async def test_get_json(self):
+        self._respond({'status': 'ok', 'data': [1, 2]})
+        resp = await self.actx.get_json('api/v1/users/web_profile_info/', {'username': 'someone'})
+        self.assertEqual(resp, {'status': 'ok', 'data': [1, 2]})
+        self.assertEqual(self.requests[0].url.host, 'www.instagram.com')
+        self.assertEqual(self.requests[0].url.params['username'], 'someone')
+        self.assertEqual(self._recorded('other'), 1)
+
+    async def test_get_json_not_ok_status(self):
+        self._respond({'status': 'fail'})
+        self._respond({'status': 'fail'})
+        with self.assertRaises(instaloader.ConnectionException):
+            await self.actx.get_json('api/v1/something/', {})
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_graphql_query(self):
+        self._respond({'status': 'ok', 'data': {}})
+        await self.actx.graphql_query('abc123', {'id': 1}, referer='https://www.instagram.com/someone/')
+        request = self.requests[0]
+        self.assertEqual(request.method, 'GET')
+        self.assertEqual(request.url.params['query_hash'], 'abc123')
+        self.assertEqual(json.loads(request.url.params['variables']), {'id': 1})
+        self.assertEqual(self._recorded('abc123'), 1)
+
+    async def test_doc_id_graphql_query(self):
+        self._respond({'status': 'ok', 'data': {}})
+        await self.actx.doc_id_graphql_query('7950326061742207', {'id': 1})
+        request = self.requests[0]
+        self.assertEqual(request.method, 'POST')
+        form = urllib.parse.parse_qs(request.content.decode())
+        self.assertEqual(form['doc_id'], ['7950326061742207'])
+        self.assertEqual(json.loads(form['variables'][0]), {'id': 1})
+        self.assertEqual(self._recorded('7950326061742207'), 1)
+
+    async def test_get_iphone_json(self):
+        self._respond({'status': 'ok'}, headers={'ig-set-authorization': 'Bearer xyz'})
+        await self.actx.get_iphone_json('api/v1/feed/reels_media/', {'reel_ids': '1'})
+        self.assertEqual(self.requests[0].url.host, 'i.instagram.com')
+        self.assertEqual(self.context.iphone_headers['authorization'], 'Bearer xyz')
+        self.assertEqual(self._recorded('iphone'), 1)
+
+    async def test_429_calls_overridden_handle_429(self):
+        self._respond({'status': 'fail', 'message': 'rate limited'}, status_code=429)
+        with self.assertRaises(instaloader.TooManyRequestsException):
+            await self.actx.get_json('api/v1/something/', {})
+        self.assertEqual(len(self.requests), 1)
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncRateController(unittest.IsolatedAsyncioTestCase):
+
+    async def test_accumulated_graphql_limit_across_query_types(self):
+        fake_time = FakeTime()
+        context = instaloader.InstaloaderContext(sleep=False, quiet=True)
+        rate_controller = instaloader.RateController(context)
+        async_rate_controller = AsyncRateController(rate_controller)
+
+        async def fake_sleep(secs):
+            wake_time = fake_time.now + secs
+            # let the other task reserve while this one sleeps
+            await asyncio.sleep(0.05)
+            fake_time.now = max(fake_time.now, wake_time)
+        async_rate_controller.sleep = fake_sleep
+
+        with mock.patch.object(instaloadercontext, 'time', fake_time):
+            limit = rate_controller.graphql_count_per_sliding_window()
+            for i in range(limit):
+                rate_controller.wait_before_query('doc_id_{}'.format(i % 2))
+                fake_time.sleep(1)
+            await asyncio.gather(async_rate_controller.wait_before_query('doc_id_a'),
+                                 async_rate_controller.wait_before_query('doc_id_b'))
+            # pylint:disable=protected-access
+            timestamps = rate_controller._graphql_timestamps
+            for i, timestamp in enumerate(timestamps):
+                in_window = sum(timestamp - 600 < t <= timestamp for t in timestamps[:i + 1])
+                self.assertLessEqual(in_window, limit)
+        context.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+"""Unit Tests for the threaded download paths of Instaloader, against a fake transport (offline)"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import instaloader
+
+MTIME = datetime(2024, 1, 1, 12, 0)
+
+
+class FakeTransfer:
+    """Stands in for get_raw and write_raw of an InstaloaderContext; counts the pictures written."""
+
+    def __init__(self):
+        self.written = []
+        self._lock = threading.Lock()
+
+    def get_raw(self, url, _attempt=1, headers=None):
+        return mock.Mock(headers={'Content-Type': 'video/mp4' if '.mp4' in url else 'image/jpeg'})
+
+    def write_raw(self, resp, filename):
+        with open(filename, 'wb') as file:
+            file.write(filename.encode())
+        with self._lock:
+            self.written.append(filename)
+
+    def patch(self, context):
+        return mock.patch.multiple(context, get_raw=mock.Mock(side_effect=self.get_raw),
+                                   write_raw=mock.Mock(side_effect=self.write_raw))
+
+
+class DownloadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.transfer = FakeTransfer()
+
+    def make_loader(self, **kwargs) -> instaloader.Instaloader:
+        loader = instaloader.Instaloader(sleep=False, quiet=True, save_metadata=False,
+                                         dirname_pattern=os.path.join(self.dir, '{target}'), **kwargs)
+        self.addCleanup(loader.close)
+        patcher = self.transfer.patch(loader.context)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return loader
+
+
+def post_node(number: int, typename: str = 'GraphImage', slides: int = 3) -> dict:
+    """A post node as served by GraphQL, with full metadata; newer posts have smaller numbers."""
+    node = {'__typename': typename, 'id': str(number), 'shortcode': 'P{}'.format(number),
+            'taken_at_timestamp': 1700000000 - 3600 * number, 'is_video': typename == 'GraphVideo',
+            'display_url': 'https://cdn.example/{}.jpg?x=1'.format(number),
+            'edge_media_to_caption': {'edges': [{'node': {'text': 'caption {}'.format(number)}}]}}
+    if typename == 'GraphVideo':
+        node['video_url'] = 'https://cdn.example/{}.mp4?x=1'.format(number)
+    if typename == 'GraphSidecar':
+        node['edge_sidecar_to_children'] = {'edges': [
+            {'node': {'is_video': slide % 2 == 1,
+                      'display_url': 'https://cdn.example/{}_{}.jpg?x=1'.format(number, slide),
+                      'video_url': 'https://cdn.example/{}_{}.mp4?x=1'.format(number, slide)}}
+            for slide in range(slides)]}
+    return node
+
+
+class TestParallelTransfers(DownloadTestCase):
+
+    def _download(self, nodes, **kwargs):
+        loader = self.make_loader(download_video_thumbnails=True, **kwargs)
+        results = [loader.download_post(instaloader.Post(loader.context, node), 'target') for node in nodes]
+        return results, sorted(os.listdir(os.path.join(self.dir, 'target')))
+
+    def test_same_files_and_result_as_serial(self):
+        nodes = [post_node(1, 'GraphImage'), post_node(2, 'GraphVideo'), post_node(3, 'GraphSidecar', slides=4)]
+        serial = self._download(nodes)
+        self.assertEqual(serial[0], [True, True, True])
+        # 1 jpg, 1 jpg and mp4, 4 jpg and 2 mp4; captions are saved without a transfer
+        self.assertEqual(len(self.transfer.written), 9)
+        shutil.rmtree(os.path.join(self.dir, 'target'))
+        self.transfer.written.clear()
+        parallel = self._download(nodes, max_parallel_downloads=4)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(self.transfer.written), 9)
+
+    def test_partially_downloaded(self):
+        nodes = [post_node(3, 'GraphSidecar', slides=4)]
+        for max_parallel_downloads in (1, 4):
+            with self.subTest(max_parallel_downloads=max_parallel_downloads):
+                self._download(nodes)
+                missing = [filename for filename in self.transfer.written if filename.endswith('_2.jpg')]
+                os.remove(missing[0])
+                self.transfer.written.clear()
+                # False since the other slides were already there, as in the serial path
+                self.assertEqual(self._download(nodes, max_parallel_downloads=max_parallel_downloads)[0], [False])
+                self.assertEqual(self.transfer.written, missing)
+                shutil.rmtree(os.path.join(self.dir, 'target'))
+                self.transfer.written.clear()
+
+
+class FakeGraphQLContext:
+    """Serves the post nodes 1 to `post_count` to doc_id queries, in pages of the requested length."""
+
+    def __init__(self, post_count: int, prefetch_pages: int = 0):
+        self.post_count = post_count
+        self.prefetch_pages = prefetch_pages
+        self.username = None
+        self.cursors = []
+
+    def error(self, msg, repeat_at_end=True):
+        raise AssertionError(msg)
+
+    def doc_id_graphql_query(self, doc_id, variables, referer=None):
+        start = int(variables.get('after', 0))
+        self.cursors.append(start)
+        end = min(start + variables.get('first', 12), self.post_count)
+        return {'edges': [{'node': post_node(number)} for number in range(start + 1, end + 1)],
+                'page_info': {'has_next_page': end < self.post_count, 'end_cursor': str(end)}}
+
+
+class TestPipelinedPostsDownloadLoop(DownloadTestCase):
+    # pylint:disable=protected-access
+
+    def setUp(self):
+        super().setUp()
+        # the page lengths learned per doc_id are shared by all iterators
+        for learned in (instaloader.NodeIterator._doc_id_page_lengths,
+                        instaloader.NodeIterator._doc_id_accepted_pages):
+            patcher = mock.patch.dict(learned, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _posts(self, loader, nodes, produced):
+        for node in nodes:
+            produced.append(node['id'])
+            yield instaloader.Post(loader.context, node)
+
+    def _download_loop(self, nodes, pipeline_workers, **kwargs):
+        """Returns the ids of the posts taken from the iterator, and the pictures written."""
+        self.transfer.written.clear()
+        produced = []
+        loader = self.make_loader(pipeline_workers=pipeline_workers)
+        loader.posts_download_loop(self._posts(loader, nodes, produced), 'target', **kwargs)
+        return produced, sorted(self.transfer.written)
+
+    def _picture(self, number):
+        return os.path.join(self.dir, 'target', instaloader.Post(None, post_node(number)).date_utc.strftime(
+            '%Y-%m-%d_%H-%M-%S_UTC.jpg'))
+
+    def test_takewhile(self):
+        # two pinned posts older than the ones to download
+        nodes = [post_node(100), post_node(101)] + [post_node(number) for number in range(3, 31)]
+        for pipeline_workers in (0, 3):
+            with self.subTest(pipeline_workers=pipeline_workers):
+                produced, written = self._download_loop(nodes, pipeline_workers, possibly_pinned=2,
+                                                        takewhile=lambda post: post.mediaid < 10)
+                self.assertEqual(written, sorted(self._picture(number) for number in range(3, 10)))
+                # the post that stops the loop is the last one taken from the iterator
+                self.assertEqual(produced[-1], '10')
+                shutil.rmtree(os.path.join(self.dir, 'target'))
+
+    def test_fast_update(self):
+        nodes = [post_node(number) for number in range(1, 101)]
+        for pipeline_workers in (0, 3):
+            with self.subTest(pipeline_workers=pipeline_workers):
+                self._download_loop(nodes[4:], 0)
+                produced, written = self._download_loop(nodes, pipeline_workers, fast_update=True)
+                self.assertEqual(written, sorted(self._picture(number) for number in range(1, 5)))
+                # the producer stops, at most a queue length ahead of the first post already downloaded
+                self.assertLess(len(produced), 50)
+                shutil.rmtree(os.path.join(self.dir, 'target'))
+
+    def test_resumes_from_oldest_pending_post(self):
+        failing_url = 'https://cdn.example/20.jpg?x=1'
+
+        def get_raw(url, _attempt=1, headers=None):
+            if url == failing_url:
+                raise KeyboardInterrupt
+            return FakeTransfer.get_raw(self.transfer, url, _attempt, headers)
+
+        def iterator(loader, context):
+            return instaloader.NodeIterator(context, None, lambda d: d,
+                                            lambda node: instaloader.Post(loader.context, node),
+                                            doc_id='1234567890', page_length=12)
+
+        self.transfer.get_raw = get_raw
+        loader = self.make_loader(pipeline_workers=2, resume_prefix='iterator')
+        with self.assertRaises(KeyboardInterrupt):
+            loader.posts_download_loop(iterator(loader, FakeGraphQLContext(50, prefetch_pages=2)), 'target')
+        self.assertNotIn(self._picture(20), self.transfer.written)
+        self.assertEqual(len([name for name in os.listdir(os.path.join(self.dir, 'target'))
+                              if name.startswith('iterator_')]), 1)
+
+        del self.transfer.get_raw
+        loader = self.make_loader(pipeline_workers=2, resume_prefix='iterator')
+        context = FakeGraphQLContext(50)
+        loader.posts_download_loop(iterator(loader, context), 'target')
+        # resumed from the saved pages, which include the ones prefetched before the interruption; the first query
+        # is the one of the iterator being constructed
+        self.assertTrue(all(cursor >= 24 for cursor in context.cursors[1:]))
+        self.assertIn(self._picture(20), self.transfer.written)
+        # no post left out, and the resume file removed
+        pictures = [os.path.basename(self._picture(number)) for number in range(1, 51)]
+        self.assertEqual(sorted(os.listdir(os.path.join(self.dir, 'target'))),
+                         sorted(pictures + [picture[:-len('.jpg')] + '.txt' for picture in pictures]))
+
+
+class TestStopDownloads(DownloadTestCase):
+    # pylint:disable=protected-access
+
+    def test_download_pic_stops(self):
+        loader = self.make_loader()
+        loader._stop_downloads.set()
+        with self.assertRaises(instaloader.AbortDownloadException):
+            loader.download_pic(os.path.join(self.dir, 'pic'), 'https://cdn.example/pic.jpg?x=1', MTIME)
+        self.assertEqual(self.transfer.written, [])
+
+    def test_other_profiles_stop_after_failure(self):
+        loader = self.make_loader()
+        downloading = threading.Event()
+
+        def download_profilepic_if_new(profile, latest_stamps):
+            if profile.username == 'failing':
+                downloading.wait(timeout=5)
+                raise RuntimeError("profile download failed")
+            # e.g. highlights, stories or a profile picture of another profile, which are not downloaded per post
+            for i in range(1000):
+                loader.download_pic(os.path.join(self.dir, '{}_{}'.format(profile.username, i)),
+                                    'https://cdn.example/pic.jpg?x=1', MTIME)
+                downloading.set()
+                time.sleep(0.001)
+
+        profiles = {mock.Mock(username='failing', userid=1), mock.Mock(username='other', userid=2)}
+        with mock.patch.object(loader, 'download_profilepic_if_new', download_profilepic_if_new):
+            with self.assertRaises(RuntimeError):
+                loader.download_profiles(profiles, posts=False, parallel_profiles=2)
+        self.assertGreater(len(self.transfer.written), 0)
+        self.assertLess(len(self.transfer.written), 1000)
+        self.assertFalse(loader._stop_downloads.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+"""Unit Tests for NodeIterator and resumable_iteration, against a fake context (offline)"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from typing import Optional
+from unittest import mock
+
+import instaloader
+from instaloader import NodeIterator, resumable_iteration
+
+DOC_ID = '1234567890'
+
+
+class FakeContext:
+    """Serves `node_count` numbered nodes to doc_id queries, in pages of the requested length. Pages longer than
+    `max_page_length` are answered with 400 Bad Request, at most `bad_requests` times if given."""
+
+    def __init__(self, node_count: int, prefetch_pages: int = 0, max_page_length: int = 48,
+                 bad_requests: Optional[int] = None):
+        self.node_count = node_count
+        self.prefetch_pages = prefetch_pages
+        self.max_page_length = max_page_length
+        self.bad_requests = bad_requests
+        self.username = None
+        self.queries = []
+        # set to let queries through; cleared to hold them back
+        self.released = threading.Event()
+        self.released.set()
+        self.errors = []
+
+    def error(self, msg, repeat_at_end=True):
+        self.errors.append(msg)
+
+    def doc_id_graphql_query(self, doc_id, variables, referer=None):
+        self.released.wait(timeout=5)
+        # the first page is requested without a page length
+        page_length = variables.get('first', 12)
+        self.queries.append((threading.current_thread(), page_length))
+        if page_length > self.max_page_length and self.bad_requests != 0:
+            if self.bad_requests is not None:
+                self.bad_requests -= 1
+            raise instaloader.QueryReturnedBadRequestException("400 Bad Request")
+        start = int(variables['after']) if 'after' in variables else 0
+        end = min(start + page_length, self.node_count)
+        return {'edges': [{'node': {'id': i}} for i in range(start, end)],
+                'page_info': {'has_next_page': end < self.node_count, 'end_cursor': str(end)}}
+
+
+def make_iterator(context, **kwargs):
+    return NodeIterator(context, None, lambda d: d, lambda n: n['id'], doc_id=DOC_ID, **kwargs)
+
+
+def patch_doc_id_page_lengths(test_case):
+    # the page lengths learned per doc_id are shared by all iterators
+    for learned in (NodeIterator._doc_id_page_lengths, NodeIterator._doc_id_accepted_pages):
+        patcher = mock.patch.dict(learned, clear=True)
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+
+
+class TestNodeIterator(unittest.TestCase):
+    # pylint:disable=protected-access
+
+    def setUp(self):
+        patch_doc_id_page_lengths(self)
+
+    def test_iterates_all_pages(self):
+        for prefetch in (0, 1, 3):
+            with self.subTest(prefetch=prefetch):
+                context = FakeContext(node_count=50, prefetch_pages=prefetch)
+                self.assertEqual([node for node in make_iterator(context, page_length=12)], list(range(50)))
+
+    def test_prefetch_in_background(self):
+        context = FakeContext(node_count=50, prefetch_pages=2)
+        iterator = make_iterator(context, page_length=12)
+        next(iterator)
+        self.assertEqual(len(iterator._prefetched), 2)
+        for future in list(iterator._prefetched):
+            future.result(timeout=5)
+        self.assertEqual([thread.name.startswith('instaloader-prefetch') for thread, _ in context.queries],
+                         [False, True, True])
+        iterator.close()
+
+    def test_close_stops_prefetching(self):
+        context = FakeContext(node_count=100, prefetch_pages=3)
+        iterator = make_iterator(context, page_length=12)
+        context.released.clear()
+        with iterator:
+            next(iterator)
+            executor = iterator._prefetch_executor
+            self.assertIsNotNone(executor)
+        self.assertIsNone(iterator._prefetch_executor)
+        self.assertEqual(len(iterator._prefetched), 0)
+        context.released.set()
+        executor.shutdown(wait=True)
+        # the page that was being requested when closing, but none of the ones queued after it
+        self.assertLessEqual(len(context.queries), 2)
+
+    def test_page_length_halved_on_bad_request(self):
+        context = FakeContext(node_count=100, max_page_length=24)
+        iterator = make_iterator(context)
+        self.assertEqual(list(iterator), list(range(100)))
+        self.assertEqual([page_length for _, page_length in context.queries], [12, 48, 24, 24, 24, 24])
+        self.assertEqual(NodeIterator._doc_id_page_lengths[DOC_ID], 24)
+        self.assertEqual(make_iterator(context)._page_length, 24)
+
+    def test_page_length_persists_across_iterators(self):
+        self.assertEqual(list(make_iterator(FakeContext(node_count=60, max_page_length=24))), list(range(60)))
+        context = FakeContext(node_count=60, max_page_length=24)
+        self.assertEqual(list(make_iterator(context)), list(range(60)))
+        # the second iteration starts with the page length learned by the first one, without a 400 Bad Request
+        self.assertEqual([page_length for _, page_length in context.queries], [12, 24, 24])
+        self.assertEqual(context.errors, [])
+
+    def test_page_length_doubled_again_after_transient_bad_request(self):
+        context = FakeContext(node_count=300, max_page_length=24, bad_requests=1)
+        self.assertEqual(list(make_iterator(context)), list(range(300)))
+        self.assertEqual([page_length for _, page_length in context.queries], [12, 48] + [24] * 8 + [48, 48])
+        self.assertEqual(NodeIterator._doc_id_page_lengths[DOC_ID], 48)
+
+    def test_prefetched_page_length_taken_over_by_iterating_thread(self):
+        context = FakeContext(node_count=100, prefetch_pages=1, max_page_length=24)
+        iterator = make_iterator(context, page_length=12, first_data={
+            'edges': [{'node': {'id': 0}}], 'page_info': {'has_next_page': True, 'end_cursor': '1'}})
+        # the pages following the first one are requested with the default page length, which is halved
+        iterator._page_length = 48
+        next(iterator)
+        iterator._prefetched[0].result(timeout=5)
+        self.assertEqual(iterator._page_length, 48)
+        self.assertEqual(next(iterator), 1)
+        self.assertEqual(iterator._page_length, 24)
+        iterator.close()
+
+    def test_freeze_includes_prefetched_pages(self):
+        context = FakeContext(node_count=50, prefetch_pages=2)
+        iterator = make_iterator(context, page_length=12)
+        for _ in range(5):
+            next(iterator)
+        for future in list(iterator._prefetched):
+            future.result(timeout=5)
+        frozen = iterator.freeze()
+        iterator.close()
+        self.assertEqual(len(frozen.remaining_data['edges']), 12 - 4 + 2 * 12)
+        resumed = make_iterator(FakeContext(node_count=50), page_length=12)
+        resumed.thaw(frozen)
+        self.assertEqual(list(resumed), list(range(4, 50)))
+
+
+class TestResumableIteration(unittest.TestCase):
+    # pylint:disable=protected-access
+
+    def setUp(self):
+        patch_doc_id_page_lengths(self)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.context = instaloader.InstaloaderContext(sleep=False, quiet=True)
+        self.addCleanup(self.context.close)
+
+    def _resumable_iteration(self, iterator, compression='xz', **kwargs):
+        return resumable_iteration(context=self.context, iterator=iterator,
+                                   load=instaloader.load_structure_from_file, save=instaloader.save_structure_to_file,
+                                   format_path=lambda magic: os.path.join(self.dir, magic + '.json.' + compression),
+                                   **kwargs)
+
+    def _interrupt_at(self, iterator, stop_node, compression='xz'):
+        with self.assertRaises(KeyboardInterrupt):
+            with self._resumable_iteration(iterator, compression):
+                for node in iterator:
+                    if node == stop_node:
+                        raise KeyboardInterrupt
+
+    def test_interrupted_iteration_is_resumed(self):
+        iterator = make_iterator(FakeContext(node_count=30, prefetch_pages=2), page_length=12)
+        seen = []
+        with self.assertRaises(KeyboardInterrupt):
+            with self._resumable_iteration(iterator):
+                for node in iterator:
+                    if node == 7:
+                        raise KeyboardInterrupt
+                    seen.append(node)
+        self.assertIsNone(iterator._prefetch_executor)
+        self.assertEqual(len(os.listdir(self.dir)), 1)
+        resumed = make_iterator(FakeContext(node_count=30), page_length=12)
+        with self._resumable_iteration(resumed) as (is_resuming, start_index):
+            self.assertTrue(is_resuming)
+            self.assertEqual(start_index, 7)
+            seen.extend(resumed)
+        self.assertEqual(seen, list(range(30)))
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_resumes_from_file_of_other_compression(self):
+        self._interrupt_at(make_iterator(FakeContext(node_count=30), page_length=12), 5, compression='gz')
+        self.assertEqual([os.path.splitext(name)[1] for name in os.listdir(self.dir)], ['.gz'])
+        # interrupted again, the resume file is replaced by one of the current compression
+        iterator = make_iterator(FakeContext(node_count=30), page_length=12)
+        self._interrupt_at(iterator, 10)
+        self.assertEqual(iterator.total_index, 11)
+        self.assertEqual([os.path.splitext(name)[1] for name in os.listdir(self.dir)], ['.xz'])
+        resumed = make_iterator(FakeContext(node_count=30), page_length=12)
+        with self._resumable_iteration(resumed, compression='gz') as (is_resuming, start_index):
+            self.assertTrue(is_resuming)
+            self.assertEqual(start_index, 10)
+            self.assertEqual(list(resumed), list(range(10, 30)))
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_closes_iterator_left_early(self):
+        for enabled in (True, False):
+            with self.subTest(enabled=enabled):
+                iterator = make_iterator(FakeContext(node_count=100, prefetch_pages=2), page_length=12)
+                with self._resumable_iteration(iterator, enabled=enabled):
+                    for node in iterator:
+                        if node == 3:
+                            break
+                self.assertIsNone(iterator._prefetch_executor)
+                self.assertEqual(len(iterator._prefetched), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,327 @@
+"""Unit Tests for RateController, against a fake clock (offline)"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from contextlib import closing
+from unittest import mock
+
+import instaloader
+from instaloader import adaptiveratecontroller, instaloadercontext, sqliteratecontroller
+
+
+class FakeTime:
+    """Stands in for the time module of instaloadercontext; time only passes when slept."""
+
+    def __init__(self, start: float = 10000.0):
+        self.now = start
+        self._lock = threading.Lock()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float) -> None:
+        self.sleep_until(self.now + secs)
+
+    def sleep_until(self, wake_time: float) -> None:
+        with self._lock:
+            self.now = max(self.now, wake_time)
+
+
+class ConcurrentSleep:
+    """Stands in for RateController.sleep; lets the first sleep of each of `parties` threads overlap, as it would
+    with a real clock."""
+
+    def __init__(self, fake_time: FakeTime, parties: int):
+        self.fake_time = fake_time
+        self.barrier = threading.Barrier(parties)
+        self.sleeps = []
+
+    def __call__(self, secs: float) -> None:
+        wake_time = self.fake_time.now + secs
+        first_sleep = threading.current_thread() not in [thread for thread, _ in self.sleeps]
+        self.sleeps.append((threading.current_thread(), secs))
+        if first_sleep:
+            self.barrier.wait(timeout=5)
+        self.fake_time.sleep_until(wake_time)
+
+
+class CountingList(list):
+    """A list that counts how many of its elements are read, by index, slice or iteration."""
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self.reads = 0
+
+    def __getitem__(self, index):
+        item = super().__getitem__(index)
+        self.reads += len(item) if isinstance(index, slice) else 1
+        return item
+
+    def __iter__(self):
+        for item in super().__iter__():
+            self.reads += 1
+            yield item
+
+
+def run_concurrently(*calls):
+    threads = [threading.Thread(target=fn, args=args) for fn, *args in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return not any(thread.is_alive() for thread in threads)
+
+
+def graphql_window_counts(timestamps):
+    """Number of GraphQL queries within the 10 minutes sliding window ending at each query."""
+    return [sum(timestamp - 600 < t <= timestamp for t in timestamps[:i + 1]) for i, timestamp in enumerate(timestamps)]
+
+
+class RateControllerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fake_time = FakeTime()
+        for module in (adaptiveratecontroller, instaloadercontext, sqliteratecontroller):
+            patcher = mock.patch.object(module, 'time', self.fake_time)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.context = instaloader.InstaloaderContext(sleep=False, quiet=True)
+        self.addCleanup(self.context.close)
+
+    def make_controller(self) -> instaloader.RateController:
+        return instaloader.RateController(self.context)
+
+    def _fill_graphql_window(self, rate_controller):
+        limit = rate_controller.graphql_count_per_sliding_window()
+        for i in range(limit):
+            rate_controller.wait_before_query('doc_id_{}'.format(i % 2))
+            self.fake_time.sleep(1)
+        return limit
+
+
+class TestRateController(RateControllerTestCase):
+    # pylint:disable=protected-access
+
+    def test_no_wait_below_limits(self):
+        rate_controller = self.make_controller()
+        rate_controller.sleep = mock.Mock()
+        for _ in range(10):
+            rate_controller.wait_before_query('other')
+        rate_controller.sleep.assert_not_called()
+        self.assertEqual(len(rate_controller._query_timestamps['other']), 10)
+        self.assertEqual(rate_controller._graphql_timestamps, [])
+
+    def test_per_type_limit(self):
+        rate_controller = self.make_controller()
+        start = self.fake_time.now
+        for _ in range(rate_controller.count_per_sliding_window('other') + 1):
+            rate_controller.wait_before_query('other')
+        # the query beyond the limit waits until the oldest one has left the 11 minutes window
+        self.assertEqual(self.fake_time.now, start + 660 + 6)
+
+    def test_accumulated_graphql_limit(self):
+        rate_controller = self.make_controller()
+        limit = self._fill_graphql_window(rate_controller)
+        rate_controller.wait_before_query('doc_id_2')
+        self.assertLessEqual(max(graphql_window_counts(rate_controller._graphql_timestamps)), limit)
+        self.assertEqual(len(rate_controller._graphql_timestamps), limit + 1)
+
+    def test_accumulated_graphql_limit_across_threads(self):
+        rate_controller = self.make_controller()
+        limit = self._fill_graphql_window(rate_controller)
+        rate_controller.sleep = ConcurrentSleep(self.fake_time, parties=2)
+        self.assertTrue(run_concurrently((rate_controller.wait_before_query, 'doc_id_a'),
+                                         (rate_controller.wait_before_query, 'doc_id_b')))
+        # both slept until the oldest query left the window, but only one of them may take its place
+        self.assertEqual(len(rate_controller._graphql_timestamps), limit + 2)
+        self.assertLessEqual(max(graphql_window_counts(rate_controller._graphql_timestamps)), limit)
+        self.assertEqual(len(rate_controller.sleep.sleeps), 3)
+
+
+class TestRateControllerState(RateControllerTestCase):
+    # pylint:disable=protected-access
+
+    def test_state_roundtrip(self):
+        rate_controller = self.make_controller()
+        for query_type in ('other', 'iphone', 'doc_id_a', 'doc_id_a'):
+            rate_controller.wait_before_query(query_type)
+            self.fake_time.sleep(1)
+        restored = self.make_controller()
+        restored.set_state(rate_controller.get_state())
+        self.assertEqual(restored._query_timestamps, rate_controller._query_timestamps)
+        self.assertEqual(restored._graphql_timestamps, rate_controller._graphql_timestamps)
+
+    def test_state_skips_queries_older_than_an_hour(self):
+        rate_controller = self.make_controller()
+        rate_controller.wait_before_query('doc_id_a')
+        state = rate_controller.get_state()
+        self.fake_time.sleep(60 * 60 + 1)
+        restored = self.make_controller()
+        restored.set_state(state)
+        self.assertEqual(restored._query_timestamps, {})
+        self.assertEqual(restored._graphql_timestamps, [])
+
+
+class TestRateControllerComplexity(RateControllerTestCase):
+    """query_waittime bisects the sorted timestamp lists, so the timestamps it reads do not grow with the history."""
+    # pylint:disable=protected-access
+
+    def _reads_per_query(self, history: int) -> int:
+        rate_controller = self.make_controller()
+        query_types = ['doc_id_{}'.format(i) for i in range(10)]
+        # an hour of history, evenly spread over the query types
+        timestamps = [self.fake_time.now - 3600 + 3600 * (i + 1) / history for i in range(history)]
+        rate_controller._query_timestamps = {query_type: CountingList(timestamps[i::len(query_types)])
+                                             for i, query_type in enumerate(query_types)}
+        rate_controller._graphql_timestamps = CountingList(timestamps)
+        rate_controller.query_waittime('doc_id_0', self.fake_time.now)
+        rate_controller._record_query('doc_id_0')
+        lists = list(rate_controller._query_timestamps.values()) + [rate_controller._graphql_timestamps]
+        return sum(timestamps.reads for timestamps in lists)
+
+    def test_query_waittime_reads_logarithmic_number_of_timestamps(self):
+        small, large = self._reads_per_query(1000), self._reads_per_query(100000)
+        # a linear scan would read each of the 100000 timestamps at least once
+        self.assertLess(large, 200)
+        # 100 times the history takes log2(100) < 7 more reads per bisection
+        self.assertLessEqual(large - small, 8 * 7)
+
+
+class TestSQLiteRateController(TestRateController):
+    """The RateController tests, run against SQLiteRateController, plus ones for controllers sharing a database."""
+    # pylint:disable=protected-access
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'rate.sqlite3')
+
+    def make_controller(self, account=None) -> instaloader.SQLiteRateController:
+        rate_controller = instaloader.SQLiteRateController(self.context, self.path, account)
+        self.addCleanup(rate_controller.close)
+        return rate_controller
+
+    def test_controllers_share_budget(self):
+        first, second = self.make_controller(), self.make_controller()
+        second.sleep = mock.Mock()
+        for _ in range(first.count_per_sliding_window('other')):
+            first.wait_before_query('other')
+        self.assertEqual(second.query_waittime('other', self.fake_time.monotonic()), 660 + 6)
+        self.assertEqual(len(second._query_timestamps['other']), first.count_per_sliding_window('other'))
+
+    def test_accounts_have_separate_budgets(self):
+        first = self.make_controller()
+        other_account = self.make_controller(account='someone')
+        for _ in range(first.count_per_sliding_window('other')):
+            first.wait_before_query('other')
+        self.assertEqual(other_account.query_waittime('other', self.fake_time.monotonic()), 0.0)
+
+    def test_accumulated_graphql_limit_across_processes(self):
+        first, second = self.make_controller(), self.make_controller()
+        limit = self._fill_graphql_window(first)
+        concurrent_sleep = ConcurrentSleep(self.fake_time, parties=2)
+        first.sleep = second.sleep = concurrent_sleep
+        self.assertTrue(run_concurrently((first.wait_before_query, 'doc_id_a'),
+                                         (second.wait_before_query, 'doc_id_b')))
+        with closing(sqlite3.connect(self.path)) as conn:
+            timestamps = [ts for ts, in conn.execute('SELECT ts FROM rate_queries WHERE graphql = 1 ORDER BY ts')]
+        # both slept until the oldest query left the window, and each re-checked within its transaction
+        self.assertEqual(len(timestamps), limit + 2)
+        self.assertLessEqual(max(graphql_window_counts(timestamps)), limit)
+        self.assertEqual(len(concurrent_sleep.sleeps), 3)
+
+    def test_close(self):
+        rate_controller = instaloader.SQLiteRateController(self.context, self.path)
+        rate_controller.close()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            rate_controller.wait_before_query('other')
+
+
+class TestAdaptiveRateController(RateControllerTestCase):
+    # pylint:disable=protected-access
+
+    def make_controller(self, **kwargs) -> instaloader.AdaptiveRateController:
+        return instaloader.AdaptiveRateController(self.context, **kwargs)
+
+    @staticmethod
+    def _handle_429(rate_controller, query_type):
+        # handle_429 without its sleep, which would let the fake clock pass the decrease holdoff
+        rate_controller._after_429_waittime(query_type)
+
+    def test_increase_only_when_budget_nearly_used(self):
+        rate_controller = self.make_controller()
+        # 90% of the 75 'other' queries per sliding window
+        for _ in range(67):
+            rate_controller.wait_before_query('other')
+        self.assertEqual(rate_controller.budgets(), {'other': 75.0})
+        rate_controller.wait_before_query('other')
+        self.assertAlmostEqual(rate_controller.budgets()['other'], 75.0 + 1.0 / 75)
+        self.assertEqual(rate_controller.count_per_sliding_window('other'), 75)
+
+    def test_graphql_budget_increase(self):
+        rate_controller = self.make_controller()
+        # 90% of the 275 GraphQL queries per sliding window, spread over query types far from their own budgets
+        for i in range(247):
+            rate_controller.wait_before_query('doc_id_{}'.format(i % 2))
+        self.assertEqual(rate_controller.budgets(), {'doc_id_0': 200.0, 'doc_id_1': 200.0, 'graphql': 275.0})
+        rate_controller.wait_before_query('doc_id_0')
+        self.assertAlmostEqual(rate_controller.budgets()['graphql'], 275.0 + 1.0 / 275)
+        self.assertEqual(rate_controller.budgets()['doc_id_0'], 200.0)
+
+    def test_decrease_and_holdoff(self):
+        rate_controller = self.make_controller(decrease=0.5, decrease_holdoff=60.0)
+        rate_controller.wait_before_query('doc_id_a')
+        self._handle_429(rate_controller, 'doc_id_a')
+        self.assertEqual(rate_controller.budgets(), {'doc_id_a': 100.0, 'graphql': 137.5})
+        # within the holdoff, further 429 responses do not cut the budgets again
+        self.fake_time.sleep(59)
+        self._handle_429(rate_controller, 'doc_id_a')
+        self.assertEqual(rate_controller.budgets(), {'doc_id_a': 100.0, 'graphql': 137.5})
+        self.fake_time.sleep(1)
+        self._handle_429(rate_controller, 'doc_id_a')
+        self.assertEqual(rate_controller.budgets(), {'doc_id_a': 50.0, 'graphql': 68.75})
+        # 'other' and 'iphone' queries leave the accumulated GraphQL budget alone
+        rate_controller.wait_before_query('other')
+        self._handle_429(rate_controller, 'other')
+        self.assertEqual(rate_controller.budgets(), {'doc_id_a': 50.0, 'graphql': 68.75, 'other': 37.5})
+
+    def test_budgets_clamped(self):
+        rate_controller = self.make_controller(decrease=0.1, min_factor=0.25, max_factor=2.0, decrease_holdoff=0)
+        rate_controller.wait_before_query('other')
+        for _ in range(3):
+            self._handle_429(rate_controller, 'other')
+        self.assertEqual(rate_controller.budgets()['other'], 75 * 0.25)
+        self.assertEqual(rate_controller.count_per_sliding_window('other'), 18)
+        rate_controller = self.make_controller(increase=10000.0, max_factor=2.0)
+        for _ in range(68):
+            rate_controller.wait_before_query('other')
+        self.assertEqual(rate_controller.budgets()['other'], 75 * 2.0)
+
+    def test_state_roundtrip(self):
+        rate_controller = self.make_controller()
+        rate_controller.wait_before_query('doc_id_a')
+        self._handle_429(rate_controller, 'doc_id_a')
+        rate_controller.wait_before_query('other')
+        restored = self.make_controller()
+        restored.set_state(rate_controller.get_state())
+        self.assertEqual(restored.budgets(), rate_controller.budgets())
+        self.assertEqual(restored.count_per_sliding_window('doc_id_a'), 100)
+        self.assertEqual(restored.graphql_count_per_sliding_window(), 137)
+        # budgets restored from a state are clamped like learned ones
+        state = rate_controller.get_state()
+        state['budgets'] = {'other': 1000.0, 'iphone': 1.0}
+        restored.set_state(state)
+        self.assertEqual(restored.budgets()['other'], 150.0)
+        self.assertEqual(restored.budgets()['iphone'], 50.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+"""Unit Tests for the ResponseCache of the web API service (offline)"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    from instaloader.services import response_cache
+    from instaloader.services.response_cache import ResponseCache, SQLiteCacheBackend
+except ImportError:
+    response_cache = None
+
+
+class FakeTime:
+    """Stands in for the time module of response_cache."""
+
+    def __init__(self, start: float = 1700000000.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+
+class Fetcher:
+    """Counts its calls, and returns a distinct value for each of them."""
+
+    def __init__(self, release: asyncio.Event = None, error: BaseException = None):
+        self.calls = 0
+        self.release = release
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {'call': self.calls}
+
+
+@unittest.skipIf(response_cache is None, "the web API dependencies are not installed")
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    # pylint:disable=protected-access
+
+    def setUp(self):
+        self.fake_time = FakeTime()
+        patcher = mock.patch.object(response_cache, 'time', self.fake_time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_hit_and_expiry(self):
+        cache = ResponseCache(ttl=60)
+        fetch = Fetcher()
+        self.assertEqual(await cache.get_or_fetch('a', fetch), {'call': 1})
+        self.fake_time.now += 59
+        self.assertEqual(await cache.get_or_fetch('a', fetch), {'call': 1})
+        self.fake_time.now += 1
+        self.assertEqual(await cache.get_or_fetch('a', fetch), {'call': 2})
+        self.assertEqual(fetch.calls, 2)
+
+    async def test_disabled(self):
+        cache = ResponseCache(ttl=0)
+        fetch = Fetcher()
+        await cache.get_or_fetch('a', fetch)
+        await cache.get_or_fetch('a', fetch)
+        self.assertEqual(fetch.calls, 2)
+
+    async def test_expires_at_callback_within_ttl(self):
+        cache = ResponseCache(ttl=60)
+        fetch = Fetcher()
+        await cache.get_or_fetch('short', fetch, expires_at=lambda value: self.fake_time.now + 10)
+        await cache.get_or_fetch('long', fetch, expires_at=lambda value: self.fake_time.now + 3600)
+        self.fake_time.now += 10
+        await cache.get_or_fetch('short', fetch)
+        self.assertEqual(fetch.calls, 3)
+        self.fake_time.now += 50
+        await cache.get_or_fetch('long', fetch)
+        self.assertEqual(fetch.calls, 4)
+
+    async def test_lru_by_entry_count(self):
+        cache = ResponseCache(ttl=60, max_entries=2)
+        await cache.put('a', 1)
+        await cache.put('b', 2)
+        await cache.get_or_fetch('a', Fetcher())
+        await cache.put('c', 3)
+        fetch = Fetcher()
+        self.assertEqual(await cache.get_or_fetch('a', fetch), 1)
+        self.assertEqual(await cache.get_or_fetch('c', fetch), 3)
+        self.assertEqual(await cache.get_or_fetch('b', fetch), {'call': 1})
+
+    async def test_lru_by_size(self):
+        cache = ResponseCache(ttl=60, max_bytes=25)
+        await cache.put('a', 'x' * 10)
+        await cache.put('b', 'y' * 10)
+        # 12 bytes each, as JSON
+        self.assertEqual(cache._bytes, 24)
+        await cache.put('c', 'z' * 10)
+        self.assertEqual(list(cache._entries), ['b', 'c'])
+        await cache.put('d', 'w' * 100)
+        self.assertNotIn('d', cache._entries)
+        self.assertEqual(cache._bytes, 24)
+
+    async def test_invalidate(self):
+        cache = ResponseCache(ttl=60)
+        fetch = Fetcher()
+        await cache.get_or_fetch('a', fetch)
+        await cache.invalidate('a')
+        await cache.get_or_fetch('a', fetch)
+        self.assertEqual(fetch.calls, 2)
+
+    async def test_single_flight(self):
+        cache = ResponseCache(ttl=60)
+        release = asyncio.Event()
+        fetch = Fetcher(release)
+        tasks = [asyncio.create_task(cache.get_or_fetch('a', fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await asyncio.gather(*tasks), [{'call': 1}] * 5)
+        self.assertEqual(fetch.calls, 1)
+
+    async def test_single_flight_error_is_shared_and_not_cached(self):
+        cache = ResponseCache(ttl=60)
+        release = asyncio.Event()
+        fetch = Fetcher(release, error=ValueError('upstream failed'))
+        tasks = [asyncio.create_task(cache.get_or_fetch('a', fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(fetch.calls, 1)
+        fetch.error = None
+        self.assertEqual(await cache.get_or_fetch('a', fetch), {'call': 2})
+
+    async def test_waiter_fetches_itself_if_fetching_request_is_cancelled(self):
+        cache = ResponseCache(ttl=60)
+        release = asyncio.Event()
+        fetch = Fetcher(release)
+        first = asyncio.create_task(cache.get_or_fetch('a', fetch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_fetch('a', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await second, {'call': 2})
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+
+@unittest.skipIf(response_cache is None, "the web API dependencies are not installed")
+class TestSQLiteCacheBackend(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'cache.sqlite3')
+
+    def _cache(self, ttl=60):
+        cache = ResponseCache(ttl=ttl, backend=SQLiteCacheBackend(self.path))
+        self.addCleanup(cache.close)
+        return cache
+
+    async def test_survives_restart(self):
+        await self._cache().put('a', {'x': 1})
+        fetch = Fetcher()
+        self.assertEqual(await self._cache().get_or_fetch('a', fetch), {'x': 1})
+        self.assertEqual(fetch.calls, 0)
+
+    async def test_expired_not_served(self):
+        fake_time = FakeTime()
+        with mock.patch.object(response_cache, 'time', fake_time):
+            await self._cache().put('a', {'x': 1})
+            fake_time.now += 61
+            fetch = Fetcher()
+            self.assertEqual(await self._cache().get_or_fetch('a', fetch), {'call': 1})
+
+    async def test_invalidate_deletes_from_backend(self):
+        cache = self._cache()
+        await cache.put('a', {'x': 1})
+        await cache.invalidate('a')
+        fetch = Fetcher()
+        self.assertEqual(await self._cache().get_or_fetch('a', fetch), {'call': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
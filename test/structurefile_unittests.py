@@ -0,0 +1,93 @@
+"""Unit Tests for saving and loading structures to and from (compressed) JSON files (offline)"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from lzma import LZMAError
+from unittest import mock
+
+import instaloader
+from instaloader import structures
+
+FROZEN = instaloader.FrozenNodeIterator(
+    query_hash=None, query_variables={'id': '123'}, query_referer=None, context_username=None, total_index=7,
+    best_before=1700000000.0, remaining_data={'edges': [{'node': {'id': 'ä' * 100}}] * 20}, first_node=None,
+    doc_id='1234567890')
+
+MAGIC = {'json': b'{', 'xz': b'\xfd7zXZ\x00', 'gz': b'\x1f\x8b', 'zst': b'\x28\xb5\x2f\xfd'}
+
+
+class TestStructureFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.context = instaloader.InstaloaderContext(sleep=False, quiet=True)
+        self.addCleanup(self.context.close)
+
+    def _path(self, extension):
+        return os.path.join(self.dir, 'structure.' + extension)
+
+    def _read(self, path):
+        with open(path, 'rb') as fp:
+            return fp.read()
+
+    def test_roundtrip(self):
+        for compression in ('json',) + structures.JSON_COMPRESSIONS:
+            with self.subTest(compression=compression):
+                path = self._path('json' if compression == 'json' else 'json.' + compression)
+                instaloader.save_structure_to_file(FROZEN, path)
+                self.assertTrue(self._read(path).startswith(MAGIC[compression]))
+                self.assertEqual(instaloader.load_structure_from_file(self.context, path), FROZEN)
+
+    def test_compression_detected_by_magic(self):
+        for compression in structures.JSON_COMPRESSIONS:
+            with self.subTest(compression=compression):
+                path = self._path('json.' + compression)
+                instaloader.save_structure_to_file(FROZEN, path)
+                renamed = self._path('json')
+                os.replace(path, renamed)
+                self.assertEqual(instaloader.load_structure_from_file(self.context, renamed), FROZEN)
+
+    def test_zst_without_zstandard(self):
+        path = self._path('json.zst')
+        # as if imported without zstandard
+        with mock.patch.object(structures, 'zstandard', None), \
+                mock.patch.object(structures, 'JSON_COMPRESSIONS', ('xz', 'gz')):
+            with self.assertRaises(instaloader.InvalidArgumentException):
+                instaloader.save_structure_to_file(FROZEN, path)
+        self.assertFalse(os.path.exists(path))
+
+    @unittest.skipIf(structures.zstandard is None, "zstandard is not installed")
+    def test_load_zst_without_zstandard(self):
+        path = self._path('json.zst')
+        instaloader.save_structure_to_file(FROZEN, path)
+        with mock.patch.object(structures, 'zstandard', None):
+            with self.assertRaises(instaloader.InvalidArgumentException):
+                instaloader.load_structure_from_file(self.context, path)
+
+    def test_corrupt_file(self):
+        for compression in structures.JSON_COMPRESSIONS:
+            with self.subTest(compression=compression):
+                path = self._path('json.' + compression)
+                instaloader.save_structure_to_file(FROZEN, path)
+                data = self._read(path)
+                with open(path, 'wb') as fp:
+                    fp.write(data[:len(data) // 2])
+                # the errors for which resumable_iteration does not resume from a file
+                with self.assertRaises((instaloader.InvalidArgumentException, LZMAError, json.JSONDecodeError,
+                                        EOFError)):
+                    instaloader.load_structure_from_file(self.context, path)
+
+    def test_instaloader_rejects_unavailable_compression(self):
+        with self.assertRaises(instaloader.InvalidArgumentException):
+            instaloader.Instaloader(json_compression='bz2')
+        with mock.patch('instaloader.instaloader.JSON_COMPRESSIONS', ('xz', 'gz')):
+            with self.assertRaises(instaloader.InvalidArgumentException):
+                instaloader.Instaloader(json_compression='zst')
+
+
+if __name__ == '__main__':
+    unittest.main()